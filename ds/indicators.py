@@ -5,18 +5,9 @@ from typing import Any, Dict
 
 import numpy as np
 from config import *
-from mathy import (
-    _atr_talib,
-    _bollinger_talib,
-    _donchian_talib,
-    _lag1,
-    _macd,
-    _mfi_talib,
-    _rsi,
-    _stochastic_talib,
-    _vwap_session_daily,
-    _vwap_talib,
-)
+from mathy import _lag1, _vwap_session_daily, _vwap_talib
+
+import ta_kernels
 
 
 class Indicator(ABC):
@@ -47,7 +38,7 @@ class StochasticIndicators(Indicator):
         self, high: np.ndarray, low: np.ndarray, close: np.ndarray, _volume: np.ndarray
     ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         # T * n_coins
-        k, d = _stochastic_talib(high, low, close, self.k, self.d)
+        k, d = ta_kernels.stoch(high, low, close, self.k, self.d)
 
         k_minus_d = k - d
         k_delta = np.diff(k, prepend=np.nan) if self.include_delta else None
@@ -76,7 +67,7 @@ class MACDHistogramIndicators(Indicator):
         _volume: np.ndarray,
     ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """returns macd_hist, macd_hist_delta, macd_hist_lag1"""
-        _, _, macd_hist = _macd(close, self.fast, self.slow, self.signal)
+        _, _, macd_hist = ta_kernels.macd(close, self.fast, self.slow, self.signal)
         macd_hist_delta = (
             np.diff(macd_hist, prepend=np.nan) if self.include_hist_delta else None
         )
@@ -98,7 +89,7 @@ class RSIIndicators(Indicator):
         _volume: np.ndarray,
     ) -> tuple[np.ndarray, np.ndarray]:
         """returns rsi, rsi_delta"""
-        rsi = _rsi(close, self.rsi_window)
+        rsi = ta_kernels.rsi(close, self.rsi_window)
         rsi_delta = np.diff(rsi, prepend=np.nan) if self.include_delta else None
         return rsi, rsi_delta
 
@@ -120,7 +111,7 @@ class BollingerIndicators(Indicator):
         _volume: np.ndarray,
     ) -> tuple[np.ndarray, np.ndarray]:
         """returns bollinger_band, bollinger_band_z"""
-        upper, middle, lower = _bollinger_talib(
+        upper, middle, lower = ta_kernels.bbands(
             close,
             self.bb_window,
             self.std_dev,
@@ -151,7 +142,7 @@ class MFIIndicators(Indicator):
         self, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray
     ) -> tuple[np.ndarray, np.ndarray]:
         """returns mfi, mfi_delta - requires OHLCV data"""
-        mfi = _mfi_talib(high, low, close, volume, self.mfi_window)
+        mfi = ta_kernels.mfi(high, low, close, volume, self.mfi_window)
         mfi_delta = np.diff(mfi, prepend=np.nan) if self.include_delta else None
         return mfi, mfi_delta
 
@@ -198,7 +189,7 @@ class DonchianIndicators(Indicator):
         _volume: np.ndarray,
     ) -> tuple[np.ndarray, np.ndarray]:
         """returns donchian_band_width, donchian_price_position"""
-        upper, middle, lower = _donchian_talib(high, low, self.donchian_window)
+        upper, middle, lower = ta_kernels.donchian(high, low, self.donchian_window)
 
         middle = np.where(middle == 0, np.nan, middle)
         donchian_band_width = (upper - lower) / middle
@@ -226,7 +217,7 @@ class ATRIndicators(Indicator):
         _volume: np.ndarray,
     ) -> tuple[np.ndarray, np.ndarray]:
         """returns atr, atr_normalized_price"""
-        atr = _atr_talib(high, low, close, self.atr_window)
+        atr = ta_kernels.atr(high, low, close, self.atr_window)
 
         close = np.where(close == 0, np.nan, close)
         atr_normalized_price = atr / close
@@ -1,12 +1,17 @@
-from datetime import timedelta
+import pickle
+from datetime import date
+from typing import List, Optional, Tuple
 
 import pandas as pd
 from tqdm import tqdm
 
+from backtesting.cache import BacktestCache, scenario_fingerprint
+from backtesting.chunked import ChunkedRun
 from backtesting.scenarios import Scenario
 from portfolio.analytics import AdvancedPortfolioAnalytics, PortfolioAnalytics
 from reporting.report_generating import ReportGenerator
-from strategies.strategy import vote_batch, vote_single_date
+from strategies.fused import IndicatorState, SignalWorkspace, generate_signal_events
+from strategies.strategy import vote_events, vote_single_date
 
 
 class Backtest:
@@ -14,6 +19,7 @@ class Backtest:
         self,
         scenario: Scenario,
         verbose: bool = False,
+        cache: Optional[BacktestCache] = None,
     ):
         if scenario.get_strategies() is None:
             raise ValueError("Strategies are not set in scenario")
@@ -26,6 +32,9 @@ class Backtest:
         self.contains_filters = scenario.contains_filters
         self.verbose = verbose
         self.scenario = scenario
+        self.cache = cache
+        self.trade_disabled = False
+        self.indicator_state = None  # where the last batch run's indicators left off
 
     def run(self):
         actual_trading_dates = []
@@ -41,8 +50,7 @@ class Backtest:
 
         # get data
         universe = self.portfolio.get_universe()
-        max_lookback = max(strategy.min_window for strategy in self.strategies)
-        data_start_date = self.start_date - timedelta(days=max_lookback)
+        data_start_date = self.get_data_start_date()
 
         for date in tqdm(
             self.trading_dates,
@@ -67,6 +75,7 @@ class Backtest:
             actual_trading_dates.append(date)
             if trade_disabled:
                 print(f"Hit max drawdown on {date}")
+                self.trade_disabled = True
                 break
         if self.verbose:
             print("Ding ding ding! Backtest completed!")
@@ -82,44 +91,252 @@ class Backtest:
                 f"Starting in {self.start_date}\n"
                 f"Ending in {self.end_date}"
             )
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.get_key(self.scenario)
+            if self._load_from_cache(cache_key):
+                if verbose:
+                    print("Backtest loaded from cache!")
+                return
+
+        trade_disabled, actual_trading_dates = self._run_batch_from(
+            self.start_date, verbose
+        )
+        self.trade_disabled = trade_disabled
+
+        if verbose:
+            print("Backtest completed!")
+
+        self.scenario.set_actual_trading_dates(actual_trading_dates)
+        if cache_key is not None:
+            self._save_to_cache(cache_key, trade_disabled)
+
+    def run_chunked(
+        self, output_dir: str, chunk_size: int = 252, verbose: bool = True
+    ) -> ChunkedRun:
+        """run_batch over windows of chunk_size trading dates, see backtesting.chunked
+        prices still come from the scenario's MarketData, a window bounds the signal
+        matrices (its lookback plus its own rows) and the portfolio history kept in
+        memory, the rest is on disk in the returned ChunkedRun. each window continues
+        the indicators from where the previous one left off, like extend, so the run
+        gives exactly run_batch's signals and trades"""
+        chunked_run = ChunkedRun(output_dir)
+        chunked_run.reset()
+        self.indicator_state = None
+        actual_trading_dates = []
+        trade_disabled = False
+        trading_dates = list(self.trading_dates)
+        for window, i in enumerate(range(0, len(trading_dates), chunk_size)):
+            window_dates = trading_dates[i : i + chunk_size]
+            window_start = self.start_date if i == 0 else window_dates[0]
+            indicator_state, data_start_date = self._get_resume_window(window_start)
+            if indicator_state is None:
+                data_start_date = self.scenario.get_warmup_start(window_start)
+            trade_disabled, traded_dates = self._run_batch_from(
+                window_start,
+                verbose,
+                end_date=window_dates[-1],
+                data_start_date=data_start_date,
+                indicator_state=indicator_state,
+            )
+            chunked_run.write_window(
+                window, traded_dates, self.portfolio.drain_history()
+            )
+            actual_trading_dates.extend(traded_dates)
+            if verbose:
+                print(f"Window {window}: {window_dates[0]} to {window_dates[-1]} done")
+            if trade_disabled:
+                break
+        self.trade_disabled = trade_disabled
+        chunked_run.write_final(self.portfolio.snapshot(), trade_disabled)
+        self.scenario.set_actual_trading_dates(actual_trading_dates)
+        return chunked_run
+
+    def get_data_start_date(self) -> date:
+        """first date of price history fed to the strategies (indicator warmup)"""
+        return self.scenario.get_data_start_date()
+
+    def _run_batch_from(
+        self,
+        run_start_date: date,
+        verbose: bool = True,
+        end_date: Optional[date] = None,
+        data_start_date: Optional[date] = None,
+        indicator_state: Optional[IndicatorState] = None,
+    ) -> Tuple[bool, List[date]]:
+        """signals are computed on history starting at the warmup date, or continue from
+        indicator_state on history starting lookback rows before its date, so that a run
+        extended from a snapshot sees exactly the same indicator values"""
         universe = self.portfolio.get_universe()
         price_type = "close"  # Use close price for all strategies in batch mode
-
-        # Generate signals for all dates
-        max_lookback = max(strategy.min_window for strategy in self.strategies)
-        data_start_date = self.start_date - timedelta(days=max_lookback)
+        if end_date is None:
+            end_date = self.end_date
+        if data_start_date is None:
+            data_start_date = self.get_data_start_date()
 
         # price include today's price, make sure to exclude it in signal generation
         prices = self.portfolio.get_prices(
-            price_type, start_date=data_start_date, end_date=self.end_date
+            price_type, start_date=data_start_date, end_date=end_date
         )[universe]
 
-        run_start_date = prices.loc[self.start_date :, :].index[
+        if prices.loc[run_start_date:, :].empty:
+            return False, []
+        run_start_date = prices.loc[run_start_date:, :].index[
             0
         ]  # start date may fall on a weekend, we find the closest biz date that has price data as run start date
         data_r = prices.reset_index()
         run_start_index = data_r[data_r["Date"] == run_start_date].index[0]
         del data_r
 
-        signals = []
-        for strategy in tqdm(
-            self.strategies,
-            desc="Backtesting by strategy",
-            unit="strategy",
-            disable=not verbose,
-        ):
-            signal = strategy.generate_signals_batch(prices, run_start_index)
-            signals.append(signal)
-        trading_plan = vote_batch(signals, self.contains_filters)
+        # one fused pass over the price matrix for all strategies, kept as sparse events
+        precision = self.scenario.get_precision()
+        resume_row = 0
+        if indicator_state is not None:
+            resume_row = prices.index.get_loc(indicator_state.date)
+        workspace = SignalWorkspace(
+            prices.to_numpy(dtype=precision), precision, indicator_state, resume_row
+        )
+        signal_events = generate_signal_events(
+            self.strategies, prices, run_start_index, precision, workspace
+        )
+        self.indicator_state = workspace.get_state(prices.index, prices.columns)
+        del workspace
+        trading_plan = vote_events(signal_events, self.contains_filters)
 
         trade_disabled, actual_trading_dates = self.portfolio.trade_batch(trading_plan)
         if trade_disabled:
-            print(f"Hit max drawdown on {self.trading_dates[-1]}")
+            print(f"Hit max drawdown on {actual_trading_dates[-1]}")
+        return trade_disabled, actual_trading_dates
 
+    def snapshot(self) -> dict:
+        """portfolio state at the end of the run plus what's needed to resume it"""
+        actual_trading_dates = list(self.scenario.get_actual_trading_dates())
+        if not actual_trading_dates:
+            raise ValueError("Backtest has not been run yet, nothing to snapshot")
+        return {
+            "fingerprint": scenario_fingerprint(self.scenario, include_end_date=False),
+            "warmup_start_date": self.get_data_start_date(),
+            "last_date": actual_trading_dates[-1],
+            "actual_trading_dates": actual_trading_dates,
+            "trade_disabled": self.trade_disabled,
+            "indicator_state": self.indicator_state,
+            "portfolio": self.portfolio.snapshot(),
+        }
+
+    def save_snapshot(self, filename: str) -> None:
+        with open(filename, "wb") as f:
+            pickle.dump(self.snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load_snapshot(filename: str) -> dict:
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+
+    def restore(self, snapshot: dict) -> None:
+        if snapshot["fingerprint"] != scenario_fingerprint(
+            self.scenario, include_end_date=False
+        ):
+            raise ValueError("Snapshot was taken from a different scenario")
+        if snapshot["warmup_start_date"] != self.get_data_start_date():
+            raise ValueError("Snapshot was taken with a different warmup period")
+        self.portfolio.restore(snapshot["portfolio"])
+        self.scenario.set_actual_trading_dates(list(snapshot["actual_trading_dates"]))
+        self.trade_disabled = snapshot["trade_disabled"]
+        self.indicator_state = snapshot.get("indicator_state")
+
+    def extend(self, end_date: str, snapshot: dict = None, verbose: bool = True):
+        """simulate only the days after the last traded date up to the new end date"""
+        if snapshot is not None:
+            self.restore(snapshot)
+
+        actual_trading_dates = list(self.scenario.get_actual_trading_dates())
+        if not actual_trading_dates:
+            raise ValueError("Nothing to extend, run or restore the backtest first")
+        if self.trade_disabled:
+            print(
+                f"Trading was disabled on {actual_trading_dates[-1]}, nothing to extend"
+            )
+            return
+
+        self.scenario.set_end_date(end_date)
+        self.end_date = self.scenario.end_date
+        self.trading_dates = self.scenario.get_trading_dates()
+
+        run_start_date = self.scenario.get_next_date(actual_trading_dates[-1])
+        if run_start_date > self.end_date:
+            return
         if verbose:
-            print("Backtest completed!")
+            print(f"Extending backtest from {run_start_date} to {self.end_date}")
 
-        self.scenario.set_actual_trading_dates(actual_trading_dates)
+        indicator_state, data_start_date = self._get_resume_window(run_start_date)
+        if indicator_state is None and verbose:
+            print("No indicator state to resume, recomputing signals from the warmup")
+        trade_disabled, new_trading_dates = self._run_batch_from(
+            run_start_date,
+            verbose,
+            data_start_date=data_start_date,
+            indicator_state=indicator_state,
+        )
+        self.trade_disabled = trade_disabled
+
+        if verbose:
+            print(f"Backtest extended by {len(new_trading_dates)} days!")
+        self.scenario.set_actual_trading_dates(actual_trading_dates + new_trading_dates)
+
+    def _get_resume_window(
+        self, run_start_date: date
+    ) -> Tuple[Optional[IndicatorState], Optional[date]]:
+        """indicator state to continue the signals from and the first date of the prices
+        it needs (lookback rows before the state's date), (None, None) to recompute the
+        signals on the whole warmup history instead"""
+        state = self.indicator_state
+        close_prices = self.portfolio.get_prices("close")
+        if (
+            state is None
+            or state.tickers != tuple(self.portfolio.get_universe())
+            or state.date not in close_prices.index
+            or not state.date < run_start_date
+        ):
+            return None, None
+        lookback = self.portfolio.get_prices(
+            "close", end_date=state.date, lookback_window=self.scenario.get_lookback()
+        )
+        if lookback.empty:
+            return state, state.date
+        # never before the warmup start, columns starting from scratch see the same data
+        return state, max(lookback.index[0], self.get_data_start_date())
+
+    def _load_from_cache(self, cache_key: str) -> bool:
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return False
+        self.portfolio.set_state(entry["state"])
+        self.scenario.set_actual_trading_dates(entry["actual_trading_dates"])
+        self.trade_disabled = entry["trade_disabled"]
+        self.indicator_state = entry.get("indicator_state")
+        return True
+
+    def _save_to_cache(self, cache_key: str, trade_disabled: bool) -> None:
+        metrics = self.generate_analytics().headline_metrics()
+        self.cache.put(
+            cache_key,
+            {
+                "state": self.portfolio.get_state(),
+                "actual_trading_dates": self.scenario.get_actual_trading_dates(),
+                "trade_disabled": trade_disabled,
+                "indicator_state": self.indicator_state,
+                "metrics": {  # headline numbers only, series are rebuilt from state
+                    k: metrics[k]
+                    for k in [
+                        "total_return",
+                        "annualized_return",
+                        "annualized_sharpe",
+                        "annualized_ir",
+                    ]
+                },
+            },
+        )
 
     def generate_analytics(self, rf=0.04, bmk_returns=0.1):
         return PortfolioAnalytics(
@@ -127,6 +344,7 @@ class Backtest:
             rf=rf,
             bmk_returns=bmk_returns,
             actual_trading_dates=self.scenario.get_actual_trading_dates(),
+            periods_per_year=self.scenario.get_periods_per_year(),
         )
 
     def generate_advanced_analytics(
@@ -137,15 +355,18 @@ class Backtest:
             rf=rf,
             bmk_returns=bmk_returns,
             actual_trading_dates=actual_trading_dates,
+            periods_per_year=self.scenario.get_periods_per_year(),
         )
 
-    def generate_report(self, rf=0.04, bmk_returns=0.1, filename=None):
+    def generate_report(
+        self, rf=0.04, bmk_returns=0.1, filename=None, chart_cache=None
+    ):
         analytics = self.generate_advanced_analytics(
             rf=rf,
             bmk_returns=bmk_returns,
             actual_trading_dates=self.scenario.get_actual_trading_dates(),
         )
-        report = ReportGenerator(analytics, dpi=300)
+        report = ReportGenerator(analytics, dpi=300, chart_cache=chart_cache)
         return report.generate_report(filename=filename)
 
     def get_portfolio(self):
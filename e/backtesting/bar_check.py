@@ -0,0 +1,126 @@
+"""intraday run on synthetic minute bars where some minutes have no trades (zero volume,
+see MarketData.load_bars): fills on those bars have to keep capital and the portfolio
+value finite. python -m backtesting.bar_check (from e/), needs no price data"""
+
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from backtesting.backtest import Backtest
+from backtesting.scenarios import BarScenario
+from data.bar_data import BAR_BENCHMARK, BAR_SECONDS, to_timestamp
+from data.data import DEFAULT_PRODUCT_ATTRIBUTES
+from data.market_data import MarketData
+from portfolio.constraints import ConstraintsConfig
+from portfolio.portfolio import PortfolioConfig
+from strategies.strategy import StrategyTypes
+
+
+def synthetic_bars(
+    pairs: List[str],
+    start_date: int,
+    end_date: int,
+    zero_volume_share: float = 0.3,
+    seed: int = 0,
+) -> MarketData:
+    """random walk minute bars from start_date to end_date (epoch seconds), about
+    zero_volume_share of them without volume and closing at the previous close"""
+    rng = np.random.default_rng(seed)
+    dates = np.arange(start_date, end_date + 1, BAR_SECONDS, dtype=np.int64)
+    shape = (len(dates), len(pairs))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, shape), axis=0))
+    volume = rng.integers(1, 1_000, shape).astype(np.float64)
+    no_trades = rng.random(shape) < zero_volume_share
+    no_trades[0] = False
+    volume[no_trades] = 0
+    for i in np.nonzero(no_trades.any(axis=1))[0]:
+        close[i, no_trades[i]] = close[i - 1, no_trades[i]]
+    open_ = np.vstack([close[:1], close[:-1]])
+
+    frames = []
+    for values in (open_, close, volume):
+        frame = pd.DataFrame(values, columns=pairs)
+        frame.insert(0, "Date", dates)
+        frame.set_index(frame.Date, inplace=True)
+        frames.append(frame)
+    open_prices, close_prices, volumes = frames
+    return MarketData(
+        benchmark=f"{BAR_BENCHMARK}:{','.join(pairs)}",
+        universe=list(pairs),
+        product_data=pd.DataFrame(
+            {"ticker": pairs}, columns=["ticker"] + DEFAULT_PRODUCT_ATTRIBUTES
+        ).assign(sector="Crypto"),
+        open_prices=open_prices,
+        close_prices=close_prices,
+        volumes=volumes,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+if __name__ == "__main__":
+    pairs = ["BTC-USD", "ETH-USD", "SOL-USD"]
+    start_date, end_date = to_timestamp("2024-01-01"), to_timestamp("2024-01-08")
+    market_data = synthetic_bars(pairs, start_date - 86_400, end_date)
+    scenario = BarScenario(
+        "zero_volume_bars",
+        start_date,
+        end_date,
+        ConstraintsConfig(max_drawdown_limit=1.0),
+        PortfolioConfig(),
+        pairs,
+        market_data=market_data,
+    )
+    scenario.set_strategies(
+        {StrategyTypes.BOLLINGER_BANDS: False, StrategyTypes.RSI_CROSSOVER: True}
+    )
+    backtest = Backtest(scenario)
+    start = time.time()
+    backtest.run_batch(verbose=False)
+    elapsed = time.time() - start
+
+    portfolio = backtest.get_portfolio()
+    state = portfolio.get_state()
+    fills = state.ledger.to_frame()
+    volume_at_fill = [
+        market_data.volumes.at[date, ticker]
+        for date, ticker in zip(fills["date"], fills["ticker"])
+    ]
+    zero_volume_fills = int(np.sum(np.array(volume_at_fill) == 0))
+    bars = len(scenario.get_actual_trading_dates())
+    print(f"{bars} bars in {elapsed:.1f}s ({1e6 * elapsed / bars:.0f}us per bar)")
+    print(f"{len(fills)} fills, {zero_volume_fills} on zero volume bars")
+    print(
+        f"final capital {portfolio.capital:.2f}, value {portfolio.portfolio_value:.2f}"
+    )
+
+    assert zero_volume_fills > 0, "no fill landed on a zero volume bar"
+    assert np.isfinite(fills["cost"]).all(), "infinite transaction costs"
+    for name in ("capital_curve", "portfolio_value_curve"):
+        curve = np.array(list(getattr(state, name).values()), dtype=np.float64)
+        assert np.isfinite(curve).all(), f"{name} is not finite"
+    print("capital and portfolio value stay finite")
+
+    # analytics read the epoch second keys as timestamps and annualize per bar
+    analytics = backtest.generate_analytics()
+    metrics = analytics.performance_metrics()
+    years = (
+        len(metrics["portfolio_value_curve"]) - 1
+    ) / scenario.get_periods_per_year()
+    expected = (1 + metrics["total_return"]) ** (1 / years) - 1
+    print(
+        f"total return {metrics['total_return']:.2%}, "
+        f"annualized {metrics['annualized_return']:.2%} over {years:.4f} years"
+    )
+    assert np.isclose(metrics["annualized_return"], expected), "bars annualized as days"
+    headline = analytics.headline_metrics()
+    assert np.isclose(headline["annualized_return"], expected), "headline annualized"
+    assert np.isclose(headline["annualized_sharpe"], metrics["annualized_sharpe"])
+    first, last = metrics["portfolio_value_curve"].index[[0, -1]]
+    assert first == pd.Timestamp(start_date, unit="s"), f"curve starts {first}"
+    assert last <= pd.Timestamp(end_date, unit="s"), f"curve ends {last}"
+    episodes = analytics.drawdown_metrics()["episodes"]
+    assert (episodes["peak_date"] >= first).all(), "drawdown dates before the run"
+    print("analytics on bar timestamps")
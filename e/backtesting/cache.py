@@ -0,0 +1,128 @@
+"""disk cache for full backtest results so identical scenarios don't get re-simulated"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from portfolio.utils import make_json_serializable
+
+DEFAULT_MAX_SIZE_BYTES = 2 * 1024**3  # 2GB
+
+
+def strategy_fingerprint(strategy) -> Dict[str, Any]:
+    """every attribute of the strategy (name, periods, thresholds, is_positive...)"""
+    return make_json_serializable(dict(vars(strategy)))
+
+
+def scenario_fingerprint(scenario, include_end_date: bool = True) -> str:
+    """deterministic hash of everything that drives a backtest except the market data
+    strategies are sorted bc both voting methods are order independent
+    include_end_date=False identifies a run that can be extended forward"""
+    strategies = sorted(
+        (strategy_fingerprint(strategy) for strategy in scenario.get_strategies()),
+        key=lambda x: json.dumps(x, sort_keys=True, default=str),
+    )
+    payload = {
+        "start_date": str(scenario.start_date),
+        "end_date": str(scenario.end_date) if include_end_date else None,
+        "benchmark": scenario.get_portfolio().benchmark,
+        "portfolio_config": make_json_serializable(scenario.get_portfolio_config()),
+        "constraints": make_json_serializable(scenario.get_constraints()),
+        "strategies": strategies,
+        "contains_filters": scenario.contains_filters,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def data_version(portfolio) -> str:
+    """hash of the universe and the price/volume frames the portfolio trades on"""
+    return portfolio.market_data.version
+
+
+class BacktestCache:
+    """one pickle per scenario under cache_dir, file mtime doubles as the LRU clock
+    so several grid search processes can share the same directory"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        verbose: bool = False,
+    ):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(__file__), "backtest_cache")
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.verbose = verbose
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, scenario) -> str:
+        fingerprint = scenario_fingerprint(scenario)
+        version = data_version(scenario.get_portfolio())
+        return hashlib.sha256(f"{fingerprint}:{version}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def is_cached(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(path)  # touch for LRU
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading backtest cache {key}: {e}")
+            return None
+
+    def put(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)  # atomic, other processes never see half a file
+        except Exception as e:
+            print(f"Error saving backtest cache {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """drop least recently used entries until the directory fits max_size_bytes"""
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            if not file.endswith(".pkl"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, file))
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, file in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, file))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if self.verbose:
+                print(f"Evicted backtest cache entry {file}")
+
+    def clear(self) -> None:
+        for file in os.listdir(self.cache_dir):
+            if file.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, file))
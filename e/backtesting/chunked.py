@@ -0,0 +1,107 @@
+"""out of core runs: Backtest.run_chunked simulates the date range in windows. prices
+are shared (the scenario's MarketData), but the signal matrices of a window only span
+its rows plus the strategies' lookback and the portfolio history is streamed to disk
+after every window, so the rest of peak memory is bounded by the window size
+
+output_dir/
+    history_00000.pkl ...  {"dates": [...], "history": {field: {date: ...}}}
+    ledger_00000.parquet   the window's fills (TradeLedger.to_parquet), if it had any
+    curves.csv             Date, portfolio_value, capital, appended per window
+    final.pkl              trading state at the end of the run"""
+
+import os
+import pickle
+from glob import glob
+from typing import Any, Dict, Iterator, List
+
+import pandas as pd
+
+from portfolio.ledger import TradeLedger
+from portfolio.portfolio import HISTORY_FIELDS, PortfolioState
+
+
+class ChunkedRun:
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.curves_path = os.path.join(output_dir, "curves.csv")
+        self.final_path = os.path.join(output_dir, "final.pkl")
+
+    def reset(self) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = self.history_paths() + self.ledger_paths()
+        for path in paths + [self.curves_path, self.final_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def history_paths(self) -> List[str]:
+        return sorted(glob(os.path.join(self.output_dir, "history_*.pkl")))
+
+    def ledger_paths(self) -> List[str]:
+        return sorted(glob(os.path.join(self.output_dir, "ledger_*.parquet")))
+
+    def write_window(self, window: int, dates: list, history: Dict[str, Any]) -> None:
+        """history as handed over by Portfolio.drain_history"""
+        ledger = history["ledger"]
+        if len(ledger) > 0:
+            ledger.to_parquet(
+                os.path.join(self.output_dir, f"ledger_{window:05d}.parquet")
+            )
+        path = os.path.join(self.output_dir, f"history_{window:05d}.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(
+                {
+                    "dates": dates,
+                    "history": {name: history[name] for name in HISTORY_FIELDS},
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        curves = pd.DataFrame(
+            {
+                "portfolio_value": pd.Series(history["portfolio_value_curve"]),
+                "capital": pd.Series(history["capital_curve"]),
+            }
+        ).rename_axis("Date")
+        curves.to_csv(
+            self.curves_path, mode="a", header=not os.path.exists(self.curves_path)
+        )
+
+    def write_final(self, state: PortfolioState, trade_disabled: bool) -> None:
+        with open(self.final_path, "wb") as f:
+            pickle.dump(
+                {"state": state, "trade_disabled": trade_disabled},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    def iter_windows(self) -> Iterator[dict]:
+        """one window at a time, for consumers that don't want the whole history"""
+        for path in self.history_paths():
+            with open(path, "rb") as f:
+                yield pickle.load(f)
+
+    def read_curves(self) -> pd.DataFrame:
+        return pd.read_csv(self.curves_path, index_col="Date")
+
+    def get_actual_trading_dates(self) -> list:
+        return [d for window in self.iter_windows() for d in window["dates"]]
+
+    def load_state(self) -> PortfolioState:
+        """the whole run as one PortfolioState, e.g. to hand to the analytics"""
+        with open(self.final_path, "rb") as f:
+            state = pickle.load(f)["state"]
+        history = {name: {} for name in HISTORY_FIELDS}
+        for window in self.iter_windows():
+            for name in HISTORY_FIELDS:
+                history[name].update(window["history"][name])
+        for name in HISTORY_FIELDS:
+            setattr(state, name, history[name])
+        state.ledger = self.read_ledger(state.ledger.next_lot_id)
+        return state
+
+    def read_ledger(self, next_lot_id: int = 0) -> TradeLedger:
+        """every window's fills back in one TradeLedger"""
+        frames = [pd.read_parquet(path) for path in self.ledger_paths()]
+        if not frames:  # no fills at all
+            frames = [TradeLedger().to_frame()]
+        return TradeLedger.from_frame(pd.concat(frames, ignore_index=True), next_lot_id)
@@ -0,0 +1,55 @@
+"""run_chunked against run_batch when the max drawdown exit falls on the first date of a
+window, right after the history was drained to disk. python -m backtesting.chunked_check
+(from e/), reads the price data cache"""
+
+import tempfile
+
+from backtesting.backtest import Backtest
+from backtesting.scenarios import Scenario
+from data.data import Benchmarks
+from portfolio.constraints import ConstraintsConfig
+from portfolio.portfolio import HISTORY_FIELDS, PortfolioConfig
+from strategies.strategy import StrategyTypes
+
+MAX_DRAWDOWN_LIMIT = 0.005
+
+
+def _scenario(start_date: str, end_date: str) -> Scenario:
+    scenario = Scenario(
+        "chunked_drawdown",
+        start_date,
+        end_date,
+        ConstraintsConfig(max_drawdown_limit=MAX_DRAWDOWN_LIMIT),
+        PortfolioConfig(),
+        Benchmarks.SP500,
+    )
+    scenario.set_strategies({strategy: True for strategy in StrategyTypes})
+    return scenario
+
+
+if __name__ == "__main__":
+    start_date, end_date = "2020-01-01", "2020-12-31"
+    batch = Backtest(_scenario(start_date, end_date))
+    batch.run_batch(verbose=False)
+    assert batch.trade_disabled, f"no {MAX_DRAWDOWN_LIMIT:.0%} drawdown to exit on"
+    exit_date = batch.scenario.get_actual_trading_dates()[-1]
+    # window 1 starts on the exit date
+    chunk_size = list(batch.trading_dates).index(exit_date)
+    assert chunk_size > 0, "the exit falls on the first trading date"
+    print(f"max drawdown exit on {exit_date}, windows of {chunk_size} dates")
+
+    chunked = Backtest(_scenario(start_date, end_date))
+    with tempfile.TemporaryDirectory() as output_dir:
+        chunked_run = chunked.run_chunked(output_dir, chunk_size, verbose=False)
+        state = chunked_run.load_state()
+        dates = chunked_run.get_actual_trading_dates()
+
+    expected = batch.get_portfolio().get_state()
+    assert chunked.trade_disabled, "run_chunked missed the drawdown exit"
+    assert dates == batch.scenario.get_actual_trading_dates(), "trading dates differ"
+    for name in HISTORY_FIELDS:
+        assert getattr(state, name) == getattr(expected, name), f"{name} differs"
+    assert chunked.get_portfolio().get_state().ledger.size == 0, "ledger not drained"
+    assert state.ledger.to_frame().equals(expected.ledger.to_frame()), "ledger differs"
+    assert state.ledger.next_lot_id == expected.ledger.next_lot_id, "lot ids differ"
+    print("run_chunked matches run_batch")
@@ -12,7 +12,10 @@ import pandas as pd
 from tqdm import tqdm
 
 from backtesting.backtest import Backtest
+from backtesting.cache import BacktestCache
 from backtesting.scenarios import Scenario
+from portfolio.batch_analytics import BatchAnalytics
+from portfolio.significance import grid_significance
 from strategies.strategy import StrategyTypes
 
 
@@ -22,9 +25,11 @@ class GridSearch:
         base_scenario: Scenario,
         max_workers: Optional[int] = None,
         verbose: bool = False,
+        cache: Optional[BacktestCache] = None,
     ):
         self.base_scenario = base_scenario
         self.max_workers = max_workers
+        self.cache = cache
         self.grid_params = None
         self.results = []
         self.verbose = verbose
@@ -111,14 +116,14 @@ class GridSearch:
 
     def _run_single_backtest(self, scenario: Scenario) -> dict:
         try:
-            backtest = Backtest(scenario)
+            backtest = Backtest(scenario, cache=self.cache)
             backtest.run_batch(verbose=False)
             analytics = backtest.generate_analytics(
                 rf=0.04,
                 bmk_returns=0.1,
             )
 
-            performance_metrics = analytics.performance_metrics()
+            performance_metrics = analytics.headline_metrics()
             _, capital_curve, holdings_curve = analytics.get_curves()
             average_holding_period = np.mean(list(holdings_curve.values()))
             max_holding_amount = max(holdings_curve.values())
@@ -132,6 +137,9 @@ class GridSearch:
                 "average_holding_period": average_holding_period,
                 "max_holding_amount": max_holding_amount,
                 "remaining_capital": capital_curve[list(capital_curve.keys())[-1]],
+                "portfolio_value_curve": dict(analytics.portfolio_value_curve),
+                "capital_curve": dict(capital_curve),
+                "capital_flows": dict(backtest.get_portfolio().capital_flow_history),
             }
         except Exception as e:
             print(traceback.format_exc())
@@ -171,6 +179,33 @@ class GridSearch:
     def get_results(self) -> dict:
         return self.results
 
+    def get_batch_analytics(self, rf=0.04, bmk_returns=0.1) -> BatchAnalytics:
+        """every result's curves side by side, to compare or rank them in one go"""
+        if not self.results:
+            raise ValueError("No grid search results, run the grid search first")
+        return BatchAnalytics.from_curves(
+            {k: v["portfolio_value_curve"] for k, v in self.results.items()},
+            {k: v["capital_curve"] for k, v in self.results.items()},
+            rf=rf,
+            bmk_returns=bmk_returns,
+            capital_flows={k: v["capital_flows"] for k, v in self.results.items()},
+        )
+
+    def get_significance(
+        self, rf=0.04, n_resamples: int = 1000, block_size: int = 21, **kwargs
+    ) -> pd.DataFrame:
+        """bootstrap intervals and deflated sharpe of every result, the winner of a
+        large grid should still look good once it's discounted for the search"""
+        returns = self.get_batch_analytics(rf=rf).daily_returns()
+        return grid_significance(
+            returns,
+            rf=rf,
+            n_resamples=n_resamples,
+            block_size=block_size,
+            max_workers=self.max_workers,
+            **kwargs,
+        ).join(self.results_to_dataframe().set_index("grid_num")[["param_name"]])
+
     def get_grid_search_schedule(self) -> pd.DataFrame:
         return pd.DataFrame(
             [
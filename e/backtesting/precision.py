@@ -0,0 +1,123 @@
+"""float32 vs float64 on the same scenario, checks the bounds stated in Precision
+python -m backtesting.precision (from e/), reads the price data cache"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+from backtesting.backtest import Backtest
+from backtesting.scenarios import Scenario
+from data.data import Benchmarks
+from portfolio.constraints import ConstraintsConfig
+from portfolio.portfolio import PortfolioConfig, Precision
+from strategies.fused import SignalWorkspace
+from strategies.strategy import Strategy, StrategyTypes
+
+# max |float32 - float64| relative to the largest float64 magnitude of the column
+INDICATOR_BOUNDS = {
+    "sma": 1e-5,
+    "stddev": 1e-4,
+    "rsi": 1e-5,
+    "macd_hist": 1e-4,
+    "momentum": 1e-5,
+    "returns_stddev": 1e-5,
+}
+SIGNAL_FLIP_BOUND = 1e-3  # share of float64 signals that flip in float32
+CURVE_BOUND = 1e-6  # max relative difference of the value and capital curves
+
+
+def _indicators(workspace: SignalWorkspace) -> Dict[str, np.ndarray]:
+    return {
+        "sma": workspace.sma(20),
+        "stddev": workspace.stddev(20),
+        "rsi": workspace.rsi(14),
+        "macd_hist": workspace.macd_hist(12, 26, 9),
+        "momentum": workspace.momentum(20),
+        "returns_stddev": workspace.returns_stddev(20),
+    }
+
+
+def check_indicators(prices: np.ndarray) -> Tuple[Dict[str, float], float]:
+    """per indicator error (inf if the nan patterns differ) and the share of flipped
+    signals over every strategy type, prices is dates x tickers"""
+    w64 = SignalWorkspace(prices, np.float64)
+    w32 = SignalWorkspace(prices, np.float32)
+    errors = {}
+    for (name, a), b in zip(_indicators(w64).items(), _indicators(w32).values()):
+        if b.dtype != np.float32 or not np.array_equal(np.isnan(a), np.isnan(b)):
+            errors[name] = np.inf
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.nanmax(np.abs(a), axis=0)
+            error = np.abs(a - b) / np.where(scale > 0, scale, 1.0)
+        errors[name] = float(np.nanmax(error)) if (~np.isnan(error)).any() else 0.0
+
+    flips, total = 0, 0
+    for strategy_type in StrategyTypes:
+        strategy = Strategy.create(strategy_type)
+        if not hasattr(strategy, "generate_signals_fused"):
+            continue
+        a = strategy.generate_signals_fused(w64)
+        flips += int((a != strategy.generate_signals_fused(w32)).sum())
+        total += int((a != 0).sum())
+    return errors, flips / max(total, 1)
+
+
+def check_curves(scenarios: Dict[str, Scenario]) -> Dict[str, float]:
+    """max relative difference of the portfolio value / capital curves, scenarios is
+    keyed by precision"""
+    curves = {}
+    for precision, scenario in scenarios.items():
+        backtest = Backtest(scenario)
+        backtest.run_batch(verbose=False)
+        state = backtest.get_portfolio().get_state()
+        curves[precision] = {
+            "portfolio_value": np.array(list(state.portfolio_value_curve.values())),
+            "capital": np.array(list(state.capital_curve.values())),
+        }
+    a, b = curves[Precision.FLOAT64.value], curves[Precision.FLOAT32.value]
+    errors = {}
+    for name in a:
+        if a[name].shape != b[name].shape:
+            errors[name] = np.inf
+            continue
+        scale = np.maximum(np.abs(a[name]), 1.0)
+        errors[name] = float(np.max(np.abs(a[name] - b[name]) / scale, initial=0.0))
+    return errors
+
+
+def _scenario(precision: str, start_date: str, end_date: str) -> Scenario:
+    scenario = Scenario(
+        f"precision_{precision}",
+        start_date,
+        end_date,
+        ConstraintsConfig(),
+        PortfolioConfig(precision=precision),
+        Benchmarks.SP500,
+    )
+    scenario.set_strategies({strategy: True for strategy in StrategyTypes})
+    return scenario
+
+
+if __name__ == "__main__":
+    scenarios = {
+        precision.value: _scenario(precision.value, "2020-01-01", "2020-12-31")
+        for precision in Precision
+    }
+    portfolio = scenarios[Precision.FLOAT64.value].get_portfolio()
+    prices = portfolio.close_prices[portfolio.get_universe()].to_numpy(np.float64)
+
+    indicator_errors, flipped = check_indicators(prices)
+    curve_errors = check_curves(scenarios)
+    for name, error in indicator_errors.items():
+        print(f"{name:<16} {error:.2e} (bound {INDICATOR_BOUNDS[name]:.0e})")
+    print(f"{'signal flips':<16} {flipped:.2e} (bound {SIGNAL_FLIP_BOUND:.0e})")
+    for name, error in curve_errors.items():
+        print(f"{name:<16} {error:.2e} (bound {CURVE_BOUND:.0e})")
+
+    for name, error in indicator_errors.items():
+        assert error <= INDICATOR_BOUNDS[name], f"{name} float32 error {error:.2e}"
+    assert flipped <= SIGNAL_FLIP_BOUND, f"{flipped:.2e} of the signals flipped"
+    for name, error in curve_errors.items():
+        assert error <= CURVE_BOUND, f"{name} curve float32 error {error:.2e}"
+    print("float32 within bounds")
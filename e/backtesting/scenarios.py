@@ -1,15 +1,21 @@
 import json
-from datetime import date
+from datetime import date, timedelta
 from typing import Optional
 
 import numpy as np
 import pandas as pd
 
-from data.data import Benchmarks
+from data.bar_data import BAR_SECONDS, to_timestamp
+from data.data import Benchmarks, get_date_slice
+from data.market_data import MarketData
 from portfolio.constraints import ConstraintsConfig
+from portfolio.metrics_calculator import PERIODS_PER_YEAR
 from portfolio.portfolio import Portfolio, PortfolioConfig
 from strategies.strategy import Strategy, StrategyTypes
 
+# warmup loaded before strategies are set, enough for any default strategy (macd)
+DEFAULT_LOOKBACK = max(Strategy.create(t).min_window for t in StrategyTypes)
+
 
 class Scenario:
     def __init__(
@@ -22,18 +28,25 @@ class Scenario:
         benchmark: Benchmarks,
         portfolio_name: Optional[str] = None,
         verbose: bool = False,
+        market_data: Optional[MarketData] = None,
     ):
         self.name = name
+        self.benchmark = benchmark
         self.strategies = None
-        self.start_date = pd.to_datetime(start_date).date()
-        self.end_date = pd.to_datetime(end_date).date()
+        self.start_date = self._to_date(start_date)
+        self.end_date = self._to_date(end_date)
         self.scenario_description = ""
+        if market_data is None:
+            market_data = self._load_market_data(
+                portfolio_config.to_dict(), self.get_data_start_date(), self.end_date
+            )
         self.portfolio = Portfolio(
             name=portfolio_name,
-            benchmark=benchmark.value,
+            benchmark=market_data.benchmark,
             constraints=constraints.to_dict(),
             setup=portfolio_config.to_dict(),
             verbose=verbose,
+            market_data=market_data,
         )
         self.trading_dates = self.get_trading_dates()
         self.contains_filters = False
@@ -52,9 +65,15 @@ class Scenario:
     def get_portfolio(self) -> Portfolio:
         return self.portfolio
 
+    def get_market_data(self) -> MarketData:
+        return self.portfolio.market_data
+
     def get_portfolio_config(self) -> dict:
         return self.portfolio.setup
 
+    def get_precision(self) -> np.dtype:
+        return np.dtype(self.portfolio.setup.get("precision", "float64"))
+
     def get_constraints(self) -> dict:
         return self.portfolio.constraints.get_constraints()
 
@@ -64,6 +83,11 @@ class Scenario:
     def set_name(self, name):
         self.name = name
 
+    def set_end_date(self, end_date: str):
+        self.end_date = self._to_date(end_date)
+        self._ensure_price_window()
+        self.trading_dates = self.get_trading_dates()
+
     def set_scenario_description(self, scenario_description):
         self.scenario_description = scenario_description
 
@@ -83,6 +107,48 @@ class Scenario:
 
         self.strategies = strategies
         self.contains_filters = any(strategy.is_positive for strategy in strategies)
+        self._ensure_price_window()
+
+    def get_lookback(self) -> int:
+        if not self.strategies:
+            return DEFAULT_LOOKBACK
+        return max(strategy.min_window for strategy in self.strategies)
+
+    def get_data_start_date(self) -> date:
+        """first date of price history fed to the strategies (indicator warmup)"""
+        return self.get_warmup_start(self.start_date)
+
+    def get_warmup_start(self, d: date) -> date:
+        return d - timedelta(days=self.get_lookback())
+
+    def get_next_date(self, d: date) -> date:
+        return d + timedelta(days=1)
+
+    def get_periods_per_year(self) -> float:
+        """trading dates per year, annualizes the analytics"""
+        return PERIODS_PER_YEAR
+
+    @staticmethod
+    def _to_date(d) -> date:
+        return pd.to_datetime(d).date()
+
+    def _load_market_data(self, setup: dict, start_date, end_date) -> MarketData:
+        return MarketData.load(self.benchmark.value, setup, start_date, end_date)
+
+    def _ensure_price_window(self):
+        """prices are only loaded for the warmup + scenario window, reload a wider one
+        when longer lookbacks or a later end date need it"""
+        start_date, end_date = self.get_data_start_date(), self.end_date
+        market_data = self.get_market_data()
+        if market_data.covers(start_date, end_date):
+            return
+        self.portfolio.set_market_data(
+            self._load_market_data(
+                self.portfolio.setup,
+                min(start_date, market_data.start_date or start_date),
+                max(end_date, market_data.end_date or end_date),
+            )
+        )
 
     def set_actual_trading_dates(self, actual_trading_dates: list[date]):
         self.actual_trading_dates = actual_trading_dates
@@ -97,3 +163,59 @@ class Scenario:
                 pd.date_range(self.start_date, self.end_date),
             )
         ).date
+
+
+class BarScenario(Scenario):
+    """intraday scenario on coinbase bars (see data.bar_data). dates are int64 epoch
+    seconds (utc) everywhere: start/end, trading dates, portfolio history keys and
+    snapshots. strategy periods and min_window count bars instead of days"""
+
+    def __init__(
+        self,
+        name: str,
+        start_date: str | int,
+        end_date: str | int,
+        constraints: ConstraintsConfig,
+        portfolio_config: PortfolioConfig,
+        trading_pairs: list[str],
+        bar_seconds: int = BAR_SECONDS,
+        portfolio_name: Optional[str] = None,
+        verbose: bool = False,
+        market_data: Optional[MarketData] = None,
+    ):
+        self.trading_pairs = list(trading_pairs)
+        self.bar_seconds = bar_seconds
+        super().__init__(
+            name=name,
+            start_date=start_date,
+            end_date=end_date,
+            constraints=constraints,
+            portfolio_config=portfolio_config,
+            benchmark=None,
+            portfolio_name=portfolio_name,
+            verbose=verbose,
+            market_data=market_data,
+        )
+
+    def get_warmup_start(self, d: int) -> int:
+        return d - self.get_lookback() * self.bar_seconds
+
+    def get_next_date(self, d: int) -> int:
+        return d + self.bar_seconds
+
+    def get_periods_per_year(self) -> float:
+        """crypto trades around the clock"""
+        return 365 * 86_400 / self.bar_seconds
+
+    @staticmethod
+    def _to_date(d) -> int:
+        return to_timestamp(d)
+
+    def _load_market_data(self, setup: dict, start_date, end_date) -> MarketData:
+        return MarketData.load_bars(self.trading_pairs, setup, start_date, end_date)
+
+    def get_trading_dates(self) -> np.ndarray:
+        timestamps = self.portfolio.open_prices.index
+        return timestamps[
+            get_date_slice(timestamps, self.start_date, self.end_date)
+        ].to_numpy()
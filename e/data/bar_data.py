@@ -0,0 +1,174 @@
+"""intraday bars from the coinbase ohlcv tables (historical.historical_coinbase_<pair>),
+the same tables ds/ds_utils.get_historical_data reads. bars are keyed by int64 epoch
+seconds (utc) and fetched in chunks so a few years of minute candles never sit in one
+query result"""
+
+import json
+import os
+from datetime import date, datetime, timezone
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from data.data import PRICE_FIELDS, PriceCube, get_date_slice
+
+BAR_SECONDS = 60
+CHUNK_SECONDS = 7 * 24 * 60 * 60  # a week of minute bars (~10k rows) per query
+BAR_BENCHMARK = "coinbase"
+
+
+def to_timestamp(d) -> int:
+    """date / 'YYYY-MM-DD' / epoch seconds -> epoch seconds (utc midnight for dates)"""
+    if isinstance(d, (int, np.integer)):
+        return int(d)
+    return int(pd.Timestamp(d, tz="UTC").timestamp())
+
+
+def to_day(timestamp: int) -> date:
+    """utc calendar day of an epoch seconds bar"""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).date()
+
+
+class BarCube(PriceCube):
+    """timestamps x trading pairs x PRICE_FIELDS, the daily cube's memory mapped layout
+    with int64 epoch seconds in place of the dates"""
+
+    @classmethod
+    def build(
+        cls, bars: Dict[str, np.ndarray], prefix: str, date_range: dict
+    ) -> "BarCube":
+        """bars: {pair: n x 6 [timestamp, open, high, low, close, volume]}, pairs are
+        aligned on the union of their timestamps and missing bars are nan"""
+        pairs = [pair for pair, rows in bars.items() if len(rows)]
+        timestamps = (
+            np.unique(np.concatenate([bars[pair][:, 0] for pair in pairs])).astype(
+                np.int64
+            )
+            if pairs
+            else np.array([], dtype=np.int64)
+        )
+
+        def fill(values):
+            for j, pair in enumerate(pairs):
+                rows = np.searchsorted(timestamps, bars[pair][:, 0].astype(np.int64))
+                values[rows, j, :] = bars[pair][:, 1:]
+
+        cube = cls._write(prefix, timestamps, pairs, date_range, fill)
+        print(f"Built bar cube: {len(timestamps)} bars x {len(pairs)} pairs")
+        return cube
+
+    def get_rows(self, start_date=None, end_date=None) -> slice:
+        """rows of start <= timestamp <= end, None leaves that side open"""
+        to_ts = lambda d: None if d is None else to_timestamp(d)
+        return get_date_slice(pd.Index(self.dates), to_ts(start_date), to_ts(end_date))
+
+    def get_frame(
+        self, field: str, tickers: list, rows: slice = slice(None)
+    ) -> pd.DataFrame:
+        """pair columns plus an int64 Date (epoch seconds) column"""
+        tickers = [ticker for ticker in tickers if ticker in self._ticker_index]
+        return pd.DataFrame(self.field(field, tickers, rows), columns=tickers).assign(
+            Date=self.dates[rows]
+        )
+
+
+class BarData:
+    """per pair .npy of every bar fetched so far, extended at either end on demand, and
+    a bar cube over the pairs/range of the last request"""
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        chunk_seconds: int = CHUNK_SECONDS,
+        connection_env: str = "NEON_READ_ONLY",
+    ):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(__file__), "data_cache")
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cube_prefix = os.path.join(cache_dir, "bar_cube")
+        self.chunk_seconds = chunk_seconds
+        self.connection_env = connection_env
+
+    def get_cube(self, trading_pairs: list, start_date, end_date) -> BarCube:
+        start, end = to_timestamp(start_date), to_timestamp(end_date)
+        cube = BarCube.open(self.cube_prefix)
+        if (
+            cube is not None
+            and cube.has_tickers(trading_pairs)
+            and cube.date_range.get("start", np.inf) <= start
+            and cube.date_range.get("end", -np.inf) >= end
+        ):
+            return cube
+        bars = {pair: self.get_bars(pair, start, end) for pair in trading_pairs}
+        return BarCube.build(bars, self.cube_prefix, {"start": start, "end": end})
+
+    def get_bars(self, trading_pair: str, start: int, end: int) -> np.ndarray:
+        """n x 6 [timestamp, open, high, low, close, volume] with start <= ts <= end,
+        only the part of the range not cached yet goes to the database"""
+        bars, cached = self._load(trading_pair)
+        if cached is None:
+            bars, cached = self._fetch(trading_pair, start, end + 1), [start, end + 1]
+            self._save(trading_pair, bars, cached)
+        elif start < cached[0] or end + 1 > cached[1]:
+            head = self._fetch(trading_pair, start, cached[0])
+            tail = self._fetch(trading_pair, cached[1], end + 1)
+            bars = np.concatenate([head, bars, tail])
+            cached = [min(start, cached[0]), max(end + 1, cached[1])]
+            self._save(trading_pair, bars, cached)
+        return bars[get_date_slice(pd.Index(bars[:, 0]), start, end)]
+
+    def _paths(self, trading_pair: str):
+        prefix = os.path.join(self.cache_dir, f"bars_{trading_pair}")
+        return f"{prefix}.npy", f"{prefix}_meta.json"
+
+    def _load(self, trading_pair: str):
+        bars_path, meta_path = self._paths(trading_pair)
+        try:
+            with open(meta_path) as f:
+                cached = json.load(f)["range"]
+            return np.load(bars_path, mmap_mode="r"), cached
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _save(self, trading_pair: str, bars: np.ndarray, cached: list) -> None:
+        bars_path, meta_path = self._paths(trading_pair)
+        tmp = f".{os.getpid()}.tmp"
+        with open(bars_path + tmp, "wb") as f:
+            np.save(f, bars)
+        with open(meta_path + tmp, "w") as f:
+            json.dump({"range": cached}, f)
+        for path in (meta_path, bars_path):
+            os.replace(path + tmp, path)
+
+    def _fetch(self, trading_pair: str, start: int, end: int) -> np.ndarray:
+        """bars with start <= ts < end, one query per chunk_seconds window"""
+        if start >= end:
+            return np.empty((0, len(PRICE_FIELDS) + 1))
+        # only needed to download, cached bars load without them
+        import psycopg
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        connection_string = os.getenv(self.connection_env)
+        if not connection_string:
+            raise ValueError(f"{self.connection_env} environment variable not found")
+
+        table = f"historical.historical_coinbase_{trading_pair.replace('-', '_')}"
+        query = (
+            f"SELECT timestamp, {', '.join(PRICE_FIELDS)} FROM {table} "
+            "WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp ASC"
+        )
+        chunks = []
+        with psycopg.connect(connection_string) as conn, conn.cursor() as cursor:
+            for chunk_start in range(start, end, self.chunk_seconds):
+                chunk_end = min(chunk_start + self.chunk_seconds, end)
+                cursor.execute(query, (str(chunk_start), str(chunk_end)))
+                rows = cursor.fetchall()
+                if rows:
+                    chunks.append(np.array(rows, dtype=np.float64))
+        print(f"Fetched {sum(map(len, chunks))} {trading_pair} bars")
+        if not chunks:
+            return np.empty((0, len(PRICE_FIELDS) + 1))
+        return np.concatenate(chunks)
@@ -4,10 +4,12 @@ Everything probably has to be numpy arrays implicitly indexed by dates when data
 this is so complicated and why??
 """
 
+import json
 import os
 import pickle
 from datetime import date, datetime
 from enum import Enum
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -21,6 +23,9 @@ RATE_LIMITING_AVAILABLE = True
 # product attributes
 DEFAULT_PRODUCT_ATTRIBUTES = ["sector", "industry", "marketCap", "country"]
 
+# last axis of the price cube, yahoo keys are the capitalized names
+PRICE_FIELDS = ["open", "high", "low", "close", "volume"]
+
 
 class Sectors(Enum):
     """for yahoo finance"""
@@ -63,9 +68,19 @@ class DataCacher:
             cache_dir = os.path.join(os.path.dirname(__file__), "data_cache")
         self.cache_dir = cache_dir
         self.cache_file = os.path.join(cache_dir, cache_file)
-        self.cache = self.load_cache()
+        self._cache = None  # loaded on first use, the price cube doesn't need it
         os.makedirs(cache_dir, exist_ok=True)
 
+    @property
+    def cache(self) -> dict:
+        if self._cache is None:
+            self._cache = self.load_cache()
+        return self._cache
+
+    @cache.setter
+    def cache(self, value: dict) -> None:
+        self._cache = value
+
     def load_cache(self):
         try:
             if os.path.exists(self.cache_file):
@@ -170,16 +185,159 @@ class YFinance:
         return res
 
 
+class PriceCube:
+    """dates x tickers x PRICE_FIELDS float64 cube in a read only memory mapped .npy,
+    so processes share the same pages and only the slices touched get read from disk
+    sidecars: <name>_dates.npy (datetime64[D]) and <name>_meta.json (tickers, date range)
+    """
+
+    def __init__(
+        self, values: np.ndarray, dates: np.ndarray, tickers: list, date_range: dict
+    ):
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+        self.date_range = date_range
+        self._ticker_index = {ticker: i for i, ticker in enumerate(tickers)}
+
+    @staticmethod
+    def _paths(prefix: str) -> Tuple[str, str, str]:
+        return f"{prefix}.npy", f"{prefix}_dates.npy", f"{prefix}_meta.json"
+
+    @classmethod
+    def open(cls, prefix: str) -> Optional["PriceCube"]:
+        values_path, dates_path, meta_path = cls._paths(prefix)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            dates = np.load(dates_path)
+            values = np.load(values_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if values.shape != (len(dates), len(meta["tickers"]), len(PRICE_FIELDS)):
+            return None  # caught halfway through a rebuild by another process
+        return cls(values, dates, meta["tickers"], meta["date_range"])
+
+    @classmethod
+    def build(cls, cache: dict, prefix: str) -> "PriceCube":
+        """write every cached ticker into a fresh cube, tickers are aligned on the union
+        of their dates and missing cells are nan"""
+        tickers = [k for k, v in cache.items() if not k.startswith("_") and v]
+        ticker_dates = {
+            ticker: pd.to_datetime(cache[ticker]["Date"]).values.astype("datetime64[D]")
+            for ticker in tickers
+        }
+        dates = (
+            np.unique(np.concatenate(list(ticker_dates.values())))
+            if tickers
+            else np.array([], dtype="datetime64[D]")
+        )
+
+        def fill(values):
+            for j, ticker in enumerate(tickers):
+                rows = np.searchsorted(dates, ticker_dates[ticker])
+                for k, field in enumerate(PRICE_FIELDS):
+                    column = cache[ticker].get(field.capitalize())
+                    if column is not None:
+                        values[rows, j, k] = np.asarray(column, dtype=np.float64)
+
+        cube = cls._write(prefix, dates, tickers, cache.get("_date_range", {}), fill)
+        print(f"Built price cube: {len(dates)} dates x {len(tickers)} tickers")
+        return cube
+
+    @classmethod
+    def _write(
+        cls, prefix: str, dates: np.ndarray, tickers: list, date_range: dict, fill
+    ) -> "PriceCube":
+        """fill(values) writes into a fresh nan cube, files are swapped in atomically"""
+        values_path, dates_path, meta_path = cls._paths(prefix)
+        tmp = f".{os.getpid()}.tmp"
+        values = np.lib.format.open_memmap(
+            values_path + tmp,
+            mode="w+",
+            dtype=np.float64,
+            shape=(len(dates), len(tickers), len(PRICE_FIELDS)),
+        )
+        values[:] = np.nan
+        fill(values)
+        values.flush()
+        del values
+        with open(dates_path + tmp, "wb") as f:
+            np.save(f, dates)
+        with open(meta_path + tmp, "w") as f:
+            json.dump({"tickers": tickers, "date_range": date_range}, f)
+        for path in (meta_path, dates_path, values_path):
+            os.replace(path + tmp, path)
+        return cls.open(prefix)
+
+    def has_tickers(self, tickers: list) -> bool:
+        return all(ticker in self._ticker_index for ticker in tickers)
+
+    def get_rows(self, start_date=None, end_date=None) -> slice:
+        """rows of start_date <= date <= end_date, None leaves that side open"""
+        to_day = lambda d: None if d is None else np.datetime64(d, "D")
+        return get_date_slice(
+            pd.Index(self.dates), to_day(start_date), to_day(end_date)
+        )
+
+    def field(
+        self, field: str, tickers: list = None, rows: slice = slice(None)
+    ) -> np.ndarray:
+        """dates x tickers view for all tickers, a copy of just those columns otherwise
+        only the pages of the requested rows are read from disk"""
+        k = PRICE_FIELDS.index(field)
+        if tickers is None:
+            return self.values[rows, :, k]
+        return self.values[rows, [self._ticker_index[t] for t in tickers], k]
+
+    def get_frame(
+        self, field: str, tickers: list, rows: slice = slice(None)
+    ) -> pd.DataFrame:
+        """same layout as PriceData.get_data used to build: ticker columns plus Date"""
+        tickers = [ticker for ticker in tickers if ticker in self._ticker_index]
+        return pd.DataFrame(self.field(field, tickers, rows), columns=tickers).assign(
+            Date=self.dates[rows].astype(object)
+        )
+
+
 class PriceData(DataCacher):
     def __init__(self):
         super().__init__(cache_file="price_cache.pkl")
+        self.cube_prefix = os.path.join(self.cache_dir, "price_cube")
 
     def get_data(self, tickers, start_date=None, end_date=None) -> pd.DataFrame:
+        """{field: dates x tickers frame with a Date column}, read from the price cube"""
+        cube = self.get_cube(tickers, start_date, end_date)
+        return {field: cube.get_frame(field, tickers) for field in PRICE_FIELDS}
+
+    def get_cube(self, tickers=None, start_date=None, end_date=None) -> PriceCube:
+        """opens the memory mapped cube, only touches the pickle cache (and yahoo) when
+        the cube is missing, stale or doesn't cover the tickers / date range"""
         if not start_date:
             start_date = START_DATE
         if not end_date:
             end_date = END_DATE
-
+        tickers = tickers or []
+
+        cube = PriceCube.open(self.cube_prefix)
+        if (
+            cube is not None
+            and not self._is_cube_stale()
+            and cube.has_tickers(tickers)
+            and not self._is_date_range_invalid(start_date, end_date, cube.date_range)
+        ):
+            return cube
+
+        self._update_cache(tickers, start_date, end_date)
+        return PriceCube.build(self.cache, self.cube_prefix)
+
+    def _is_cube_stale(self) -> bool:
+        values_path, _, _ = PriceCube._paths(self.cube_prefix)
+        return os.path.exists(self.cache_file) and os.path.getmtime(
+            self.cache_file
+        ) > os.path.getmtime(values_path)
+
+    def _update_cache(self, tickers, start_date, end_date) -> None:
         cache_invalid = self._is_date_range_invalid(start_date, end_date)
 
         if cache_invalid:
@@ -203,22 +361,9 @@ class PriceData(DataCacher):
                 self.add_to_cache(data=price_data)
                 self.save_cache()
 
-        results_dict = self.get_from_cache(tickers)
-        dates = pd.to_datetime(results_dict[tickers[0]]["Date"]).date
-        return {
-            "open": pd.DataFrame(
-                {ticker: price["Open"] for ticker, price in results_dict.items()}
-            ).assign(Date=dates),
-            "close": pd.DataFrame(
-                {ticker: price["Close"] for ticker, price in results_dict.items()}
-            ).assign(Date=dates),
-            "volume": pd.DataFrame(
-                {ticker: price["Volume"] for ticker, price in results_dict.items()}
-            ).assign(Date=dates),
-        }
-
-    def _is_date_range_invalid(self, start_date, end_date):
-        cached_range = self.cache.get("_date_range")
+    def _is_date_range_invalid(self, start_date, end_date, cached_range=None):
+        if cached_range is None:
+            cached_range = self.cache.get("_date_range")
         if not cached_range:
             return True
 
@@ -264,9 +409,10 @@ class BenchmarkData(DataCacher):
     def __init__(self):
         super().__init__(cache_file="benchmark_cache.pkl")
 
-    def get_constituents(self, benchmark: str) -> list:
-        if self.is_cached(benchmark):
-            cached_data = self.get_from_cache(benchmark)
+    def get_constituents(self, benchmark: Benchmarks | str) -> list:
+        benchmark = Benchmarks(benchmark)  # accepts the enum or its value
+        if self.is_cached(benchmark.value):
+            cached_data = self.get_from_cache(benchmark.value)
             return cached_data.get("tickers", [])
 
         tickers = self._scrape_wikipedia_constituents(benchmark)
@@ -304,6 +450,20 @@ class BenchmarkData(DataCacher):
             return []
 
 
+def _check_sorted(dates: pd.Index) -> None:
+    if not dates.is_monotonic_increasing:  # cached by pandas after the first check
+        raise ValueError("Date index must be sorted to slice by dates")
+
+
+def get_date_slice(dates: pd.Index, start_date=None, end_date=None) -> slice:
+    """positions of start_date <= date <= end_date in a sorted date index, two binary
+    searches instead of masking the whole index. None leaves that side open"""
+    _check_sorted(dates)
+    start = 0 if start_date is None else dates.searchsorted(start_date, side="left")
+    end = len(dates) if end_date is None else dates.searchsorted(end_date, side="right")
+    return slice(int(start), int(end))
+
+
 def get_prices_by_dates(
     prices: pd.DataFrame,
     end_date: date = None,
@@ -311,12 +471,17 @@ def get_prices_by_dates(
     lookback_window: int = np.inf,
     lookahead_window: int = np.inf,
 ) -> pd.DataFrame:
+    """positional slices found by binary search, so every call is O(log T) and the
+    result is a view of prices rather than a masked copy"""
     # window is easier bc i don't have to get exchange open dates
     # exclude current day to avoid lookahead bias
     if lookback_window != np.inf or lookahead_window != np.inf:
+        _check_sorted(prices.index)
         if lookback_window != np.inf:
-            return prices[prices.index < end_date].iloc[-lookback_window:]
+            end = int(prices.index.searchsorted(end_date, side="left"))  # < end_date
+            return prices.iloc[max(end - lookback_window, 0) : end]
         elif lookahead_window != np.inf:
-            return prices[prices.index > start_date].iloc[:lookahead_window]
+            start = int(prices.index.searchsorted(start_date, side="right"))
+            return prices.iloc[start : start + lookahead_window]  # > start_date
         return prices
-    return prices[(prices.index >= start_date) & (prices.index <= end_date)]
+    return prices.iloc[get_date_slice(prices.index, start_date, end_date)]
@@ -0,0 +1,254 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from data.bar_data import BAR_BENCHMARK, BarData
+from data.data import DEFAULT_PRODUCT_ATTRIBUTES, BenchmarkData, PriceData, ProductData
+
+# (benchmark, universe filters, window) -> MarketData, so new scenarios don't reload data
+# least recently used first, only the last few windows stay in memory
+_MARKET_DATA_CACHE: "OrderedDict[str, MarketData]" = OrderedDict()
+MARKET_DATA_CACHE_SIZE = 4
+
+
+@dataclass(frozen=True, eq=False)
+class MarketData:
+    """read only universe, product and price data. Shared by reference between
+    portfolios/scenarios, copy() and deepcopy() hand back the same object
+    universe filters only need the product attributes, prices are then read from the
+    price cube for the surviving tickers and the start_date..end_date window (None = all)
+    """
+
+    benchmark: str
+    universe: List[str]
+    product_data: pd.DataFrame
+    open_prices: pd.DataFrame
+    close_prices: pd.DataFrame
+    volumes: pd.DataFrame
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+    @classmethod
+    def load(
+        cls,
+        benchmark: str,
+        setup: Dict[str, Any],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> "MarketData":
+        def load() -> "MarketData":
+            universe, product_data = cls._initialize_universe(benchmark, setup)
+            open_prices, close_prices, volumes = cls._initialize_price_data(
+                universe, setup.get("precision", "float64"), start_date, end_date
+            )
+            return cls(
+                benchmark=benchmark,
+                universe=universe,
+                product_data=product_data,
+                open_prices=open_prices,
+                close_prices=close_prices,
+                volumes=volumes,
+                start_date=start_date,
+                end_date=end_date,
+            )
+
+        return cls._get_cached(
+            cls._cache_key(benchmark, setup, start_date, end_date), load
+        )
+
+    @classmethod
+    def load_bars(
+        cls,
+        trading_pairs: List[str],
+        setup: Dict[str, Any],
+        start_date: int,
+        end_date: int,
+    ) -> "MarketData":
+        """intraday mode: coinbase bars for the trading pairs, frames are indexed by int64
+        epoch seconds. universe filters are equity attributes and don't apply to pairs
+        """
+        benchmark = f"{BAR_BENCHMARK}:{','.join(trading_pairs)}"
+
+        def load() -> "MarketData":
+            cube = BarData().get_cube(trading_pairs, start_date, end_date)
+            open_prices, close_prices, volumes = cls._get_frames(
+                cube,
+                trading_pairs,
+                cube.get_rows(start_date, end_date),
+                setup.get("precision", "float64"),
+            )
+            # a minute without trades has no candle, it opens and closes at the last
+            # close with no volume (interior nans would poison the indicators)
+            pairs = close_prices.columns.drop("Date")
+            close_prices[pairs] = close_prices[pairs].ffill()
+            open_prices[pairs] = open_prices[pairs].fillna(close_prices[pairs].shift(1))
+            volumes[pairs] = volumes[pairs].mask(
+                volumes[pairs].isna() & close_prices[pairs].notna(), 0
+            )
+            product_data = pd.DataFrame(
+                {"ticker": trading_pairs},
+                columns=["ticker"] + DEFAULT_PRODUCT_ATTRIBUTES,
+            ).assign(sector="Crypto")
+            return cls(
+                benchmark=benchmark,
+                universe=list(trading_pairs),
+                product_data=product_data,
+                open_prices=open_prices,
+                close_prices=close_prices,
+                volumes=volumes,
+                start_date=start_date,
+                end_date=end_date,
+            )
+
+        return cls._get_cached(
+            cls._cache_key(benchmark, setup, start_date, end_date), load
+        )
+
+    def covers(self, start_date: date, end_date: date) -> bool:
+        """whether the loaded price window contains start_date..end_date"""
+        return (self.start_date is None or start_date >= self.start_date) and (
+            self.end_date is None or end_date <= self.end_date
+        )
+
+    @staticmethod
+    def _get_cached(key: str, load: Callable[[], "MarketData"]) -> "MarketData":
+        if key in _MARKET_DATA_CACHE:
+            _MARKET_DATA_CACHE.move_to_end(key)
+            return _MARKET_DATA_CACHE[key]
+        market_data = load()
+        _MARKET_DATA_CACHE[key] = market_data
+        while len(_MARKET_DATA_CACHE) > MARKET_DATA_CACHE_SIZE:
+            _MARKET_DATA_CACHE.popitem(last=False)
+        return market_data
+
+    @staticmethod
+    def clear_cache() -> None:
+        _MARKET_DATA_CACHE.clear()
+
+    @staticmethod
+    def _cache_key(
+        benchmark: str,
+        setup: Dict[str, Any],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> str:
+        return json.dumps(
+            {
+                "benchmark": benchmark,
+                "start_date": start_date,
+                "end_date": end_date,
+                "excluded_sectors": sorted(
+                    s.value for s in setup.get("excluded_sectors", [])
+                ),
+                "included_countries": sorted(
+                    c.value for c in setup.get("included_countries", [])
+                ),
+                "min_market_cap": setup.get("min_market_cap"),
+                "max_market_cap": setup.get("max_market_cap"),
+                "precision": setup.get("precision", "float64"),
+            },
+            sort_keys=True,
+            default=str,
+        )
+
+    @staticmethod
+    def _initialize_universe(
+        benchmark: str, setup: Dict[str, Any]
+    ) -> Tuple[List[str], pd.DataFrame]:
+        tickers = BenchmarkData().get_constituents(benchmark)
+        if len(tickers) == 0:
+            raise ValueError(f"No tickers found for benchmark: {benchmark}")
+        product_data = ProductData().get_data(tickers)
+        if len(product_data) == 0:
+            raise ValueError(f"No product data found for any tickers")
+
+        filtered_data = MarketData._apply_universe_filters(product_data, setup)
+        universe = filtered_data.ticker.tolist()
+
+        return universe, filtered_data
+
+    @staticmethod
+    def _apply_universe_filters(
+        product_data: pd.DataFrame, setup: Dict[str, Any]
+    ) -> pd.DataFrame:
+        excluded_sectors = [
+            sector.value for sector in setup.get("excluded_sectors", [])
+        ]
+        included_countries = [
+            country.value for country in setup.get("included_countries", [])
+        ]
+
+        sector_filter = ~product_data.sector.isin(excluded_sectors)
+        market_cap_filter = (product_data.marketCap >= setup.get("min_market_cap")) & (
+            product_data.marketCap <= setup.get("max_market_cap")
+        )
+        country_filter = product_data.country.isin(included_countries)
+
+        combined_filter = sector_filter & market_cap_filter & country_filter
+        return product_data[combined_filter]
+
+    @staticmethod
+    def _initialize_price_data(
+        universe: List[str],
+        precision: str = "float64",
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        cube = PriceData().get_cube(universe)
+        return MarketData._get_frames(
+            cube, universe, cube.get_rows(start_date, end_date), precision
+        )
+
+    @staticmethod
+    def _get_frames(
+        cube, universe: List[str], rows: slice, precision: str
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        if len(cube.dates[rows]) == 0:
+            raise ValueError(f"No price data found for any tickers")
+
+        frames = []
+        for field in ("open", "close", "volume"):
+            frame = cube.get_frame(field, universe, rows)
+            tickers = frame.columns.drop("Date")
+            frame = frame.astype({ticker: precision for ticker in tickers})
+            frame.set_index(frame.Date, inplace=True)
+            frames.append(frame)
+        open_prices, close_prices, volumes = frames
+
+        return open_prices, close_prices, volumes
+
+    @cached_property
+    def version(self) -> str:
+        """hash of the universe and price/volume frames, computed once since data is immutable"""
+        hasher = hashlib.sha256()
+        hasher.update(json.dumps(list(self.universe)).encode())
+        for frame in (self.open_prices, self.close_prices, self.volumes):
+            hasher.update(
+                pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes()
+            )
+        return hasher.hexdigest()
+
+    def _shared_objects(self) -> list:
+        return [
+            self.universe,
+            self.product_data,
+            self.open_prices,
+            self.close_prices,
+            self.volumes,
+        ]
+
+    def __copy__(self) -> "MarketData":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "MarketData":
+        # register the frames too, so anything else holding them (e.g. Constraints)
+        # is pointed at the shared objects instead of copying them
+        for obj in self._shared_objects():
+            memo[id(obj)] = obj
+        return self
@@ -0,0 +1,100 @@
+"""prebuild the data caches for a benchmark universe so the first backtest doesn't block
+on wikipedia/yahoo. run from e/:
+    python -m data.warm_cache sp500 --start-date 2014-01-01 --end-date 2025-06-01"""
+
+import argparse
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from data.data import (
+    DEFAULT_PRODUCT_ATTRIBUTES,
+    END_DATE,
+    START_DATE,
+    BenchmarkData,
+    Benchmarks,
+    PriceData,
+    ProductData,
+    get_date_slice,
+)
+
+
+def warm_cache(
+    benchmark: Benchmarks,
+    start_date: str = START_DATE,
+    end_date: str = END_DATE,
+) -> pd.DataFrame:
+    """constituents -> product data -> price cube, returns per ticker coverage"""
+    tickers = BenchmarkData().get_constituents(benchmark)
+    if len(tickers) == 0:
+        raise ValueError(f"No tickers found for benchmark: {benchmark}")
+    print(f"{benchmark.name}: {len(tickers)} constituents")
+
+    product_data = ProductData().get_data(tickers).set_index("ticker")
+    cube = PriceData().get_cube(tickers, start_date, end_date)
+    return get_coverage(tickers, product_data, cube, start_date, end_date)
+
+
+def get_coverage(
+    tickers: list, product_data: pd.DataFrame, cube, start_date: str, end_date: str
+) -> pd.DataFrame:
+    rows = get_date_slice(
+        pd.Index(cube.dates),
+        np.datetime64(start_date, "D"),
+        np.datetime64(end_date, "D"),
+    )
+    dates = cube.dates[rows]
+    priced = [ticker for ticker in tickers if cube.has_tickers([ticker])]
+    close = pd.DataFrame(cube.field("close", priced)[rows], columns=priced)
+    valid = close.notna()
+
+    attributes = product_data.reindex(tickers)[DEFAULT_PRODUCT_ATTRIBUTES]
+    coverage = pd.DataFrame(index=pd.Index(tickers, name="ticker"))
+    coverage["has_product_data"] = attributes.notna().all(axis=1)
+    coverage["has_prices"] = coverage.index.isin(priced)
+    coverage["price_coverage"] = valid.mean().reindex(tickers).fillna(0.0)
+    first_valid = valid.to_numpy().argmax(axis=0)
+    coverage["first_date"] = pd.Series(
+        np.where(valid.any().to_numpy(), dates[first_valid], np.datetime64("NaT")),
+        index=priced,
+    ).reindex(tickers)
+    return coverage
+
+
+def print_coverage(coverage: pd.DataFrame, min_price_coverage: float = 0.95) -> None:
+    total = len(coverage)
+    print(
+        f"Product data: {coverage.has_product_data.sum()}/{total}\n"
+        f"Price data: {coverage.has_prices.sum()}/{total}\n"
+        f"Price coverage >= {min_price_coverage:.0%}: "
+        f"{(coverage.price_coverage >= min_price_coverage).sum()}/{total}"
+    )
+    missing = coverage.index[~(coverage.has_product_data & coverage.has_prices)]
+    if len(missing):
+        print(f"Missing data: {', '.join(missing)}")
+    partial = coverage[
+        coverage.has_prices & (coverage.price_coverage < min_price_coverage)
+    ]
+    if len(partial):
+        print("Partial price history (listed later or gaps):")
+        print(partial[["price_coverage", "first_date"]].to_string())
+
+
+def main(args: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=[b.value for b in Benchmarks])
+    parser.add_argument("--start-date", default=START_DATE)
+    parser.add_argument("--end-date", default=END_DATE)
+    parser.add_argument("--report", help="write the per ticker coverage to this csv")
+    args = parser.parse_args(args)
+
+    coverage = warm_cache(Benchmarks(args.benchmark), args.start_date, args.end_date)
+    print_coverage(coverage)
+    if args.report:
+        coverage.to_csv(args.report)
+        print(f"Coverage report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,81 @@
+import functools
+import weakref
 from collections import defaultdict
 
 import numpy as np
 import pandas as pd
 
-from portfolio.metrics_calculator import calculate_ir, calculate_sharpe, get_return
+from portfolio.attribution import PnLAttribution
+from portfolio.drawdown import (
+    get_drawdown_episodes,
+    get_longest_drawdown,
+    get_max_drawdown,
+    get_performance_curve,
+    get_underwater,
+)
+from portfolio.ledger import BUY, EXIT, TradeLedger
+from portfolio.metrics_calculator import (
+    PERIODS_PER_YEAR,
+    MetricsAccumulator,
+    calculate_ir,
+    calculate_sharpe,
+    get_return,
+    get_rolling_ratio,
+    rolling_ratios,
+    to_timestamps,
+)
 from portfolio.portfolio import TransactionType
 
+# {portfolio: (portfolio.version, {(method, *dependencies): result})}
+_results_cache = weakref.WeakKeyDictionary()
+
+
+def _freeze(value):
+    """hashable cache key part, e.g. the actual trading dates list"""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return tuple(value)
+
+
+def cached_metric(*depends_on: str):
+    """memoize an analytics method per portfolio version. the cache sits with the
+    portfolio, so every analytics object over it (report, grid search, notebooks) shares
+    the results until the portfolio trades again. depends_on names the analytics
+    attributes the result also depends on e.g. rf. results are shared, don't mutate them
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            version, results = _results_cache.get(self.portfolio, (None, None))
+            if version != self.portfolio.version:
+                results = {}
+                _results_cache[self.portfolio] = (self.portfolio.version, results)
+            key = (method.__qualname__,) + tuple(
+                _freeze(getattr(self, name)) for name in depends_on
+            )
+            if key not in results:
+                results[key] = method(self)
+            return results[key]
+
+        return wrapper
+
+    return decorator
+
 
 class PortfolioAnalytics:
+    """periods_per_year annualizes the returns, 252 trading days for daily runs and
+    Scenario.get_periods_per_year for bar runs"""
+
     def __init__(
         self,
         portfolio,
         rf=0.02,
         bmk_returns=0.1,  # we need to source a real bmk
         actual_trading_dates=None,
+        periods_per_year: float = PERIODS_PER_YEAR,
     ):
         self.portfolio = portfolio
 
@@ -21,6 +83,7 @@ class PortfolioAnalytics:
         self.rf = rf
         self.bmk_returns = bmk_returns
         self.actual_trading_dates = actual_trading_dates
+        self.periods_per_year = periods_per_year
         self.portfolio_value_curve, self.capital_curve, self.holdings_curve = (
             self.get_curves()
         )
@@ -33,15 +96,28 @@ class PortfolioAnalytics:
         }
         return portfolio_value_curve, capital_curve, holdings_curve
 
+    @cached_metric("rf", "bmk_returns", "periods_per_year")
     def performance_metrics(self):
         portfolio_value = pd.Series(self.portfolio.portfolio_value_curve)
-        portfolio_value.index = pd.to_datetime(portfolio_value.index)
+        portfolio_value.index = to_timestamps(portfolio_value.index)
         portfolio_value.sort_index(inplace=True)
 
-        total_return, annualized_return = get_return(portfolio_value, annualized=True)
+        total_return, annualized_return = get_return(
+            portfolio_value, annualized=True, periods_per_year=self.periods_per_year
+        )
         daily_returns = get_return(portfolio_value)
-        annualized_sharpe = calculate_sharpe(daily_returns, self.rf, annualized=True)
-        annualized_ir = calculate_ir(daily_returns, self.bmk_returns, annualized=True)
+        annualized_sharpe = calculate_sharpe(
+            daily_returns,
+            self.rf,
+            annualized=True,
+            periods_per_year=self.periods_per_year,
+        )
+        annualized_ir = calculate_ir(
+            daily_returns,
+            self.bmk_returns,
+            annualized=True,
+            periods_per_year=self.periods_per_year,
+        )
 
         return {
             "total_return": total_return,
@@ -52,21 +128,80 @@ class PortfolioAnalytics:
             "portfolio_value_curve": portfolio_value,
         }
 
+    @cached_metric()
+    def drawdown_metrics(self) -> dict:
+        """underwater curve and every drawdown episode, deepest first. taken on the
+        curve net of capital injections, a deposit is not a recovery"""
+        portfolio_value = pd.Series(self.portfolio.portfolio_value_curve)
+        flows = pd.Series(
+            self.portfolio.capital_flow_history,
+            index=portfolio_value.index,
+            dtype=np.float64,
+        ).fillna(0.0)
+        portfolio_value.index = flows.index = to_timestamps(portfolio_value.index)
+        portfolio_value.sort_index(inplace=True)
+        flows.sort_index(inplace=True)
+
+        values = get_performance_curve(
+            portfolio_value.to_numpy(dtype=np.float64), flows.to_numpy()
+        )
+        performance = pd.Series(values, index=portfolio_value.index)
+        return {
+            "underwater_curve": pd.Series(
+                get_underwater(values), index=portfolio_value.index
+            ),
+            "episodes": get_drawdown_episodes(performance, top_n=None),
+            "max_drawdown": get_max_drawdown(values),
+            "longest_drawdown": get_longest_drawdown(values),
+        }
+
+    def headline_metrics(self) -> dict:
+        """returns, sharpe, ir, max drawdown and win/loss stats straight from the
+        accumulator the portfolio updates while trading, no series rebuilt. states saved
+        before it existed (or only partly tracked) are replayed from the curve once"""
+        metrics = getattr(self.portfolio.state, "metrics", None)
+        if metrics is None or metrics.count < len(self.portfolio.portfolio_value_curve):
+            metrics = MetricsAccumulator.from_values(
+                self.portfolio.portfolio_value_curve,
+                self.portfolio.capital_flow_history,
+            )
+            self.portfolio.state.metrics = metrics
+        return metrics.summary(self.rf, self.bmk_returns, self.periods_per_year)
 
-class AdvancedPortfolioAnalytics(PortfolioAnalytics):
-    def __init__(self, portfolio, rf=0.02, bmk_returns=0.1, actual_trading_dates=None):
-        super().__init__(portfolio, rf, bmk_returns, actual_trading_dates)
 
-        self.cashflow_stats_ts, self.ticker_level_records_ts, self.daily_pnl_ts = (
-            self._process_trades_data()
+class AdvancedPortfolioAnalytics(PortfolioAnalytics):
+    def __init__(
+        self,
+        portfolio,
+        rf=0.02,
+        bmk_returns=0.1,
+        actual_trading_dates=None,
+        periods_per_year: float = PERIODS_PER_YEAR,
+    ):
+        super().__init__(
+            portfolio, rf, bmk_returns, actual_trading_dates, periods_per_year
         )
 
+    @property
+    def cashflow_stats_ts(self) -> dict:
+        return self._process_trades_data()[0]
+
+    @property
+    def ticker_level_records_ts(self) -> dict:
+        return self._process_trades_data()[1]
+
+    @property
+    def daily_pnl_ts(self) -> dict:
+        return self._process_trades_data()[2]
+
+    @cached_metric()
     def signal_metrics_ts(self):
         signal_counts = defaultdict(int)
         for date, signals in self.portfolio.signals_history.items():
             executed_trading_plan = self.portfolio.executed_plan_history[date]
 
-            executed_arr = np.array(list(executed_trading_plan.values()))
+            # executed plan can also hold stop loss tickers that had no signal
+            executed_arr = np.array([executed_trading_plan[t] for t in signals])
             signal_arr = np.array(list(signals.values()))
 
             total_signal = (signal_arr != 0).sum()
@@ -76,7 +211,8 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
             no_sell = (executed_arr == "No short sell (or stop loss triggered)").sum()
             insufficient_capital = (executed_arr == "Insufficient capital").sum()
             max_drawdown = (executed_arr == "max_drawdown").sum()
-            no_signal = (signal_arr == 0).sum()
+            # plans from SignalEvents only list tickers with a signal
+            no_signal = len(self.portfolio.universe) - total_signal
             signal_counts[date] = {
                 "total_signal": total_signal,
                 "executed": executed,
@@ -87,8 +223,9 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
             }
         return signal_counts
 
+    @cached_metric("rf", "bmk_returns", "periods_per_year")
     def performance_metrics(self):
-        result = super().performance_metrics()
+        result = dict(super().performance_metrics())
 
         daily_returns = result["daily_returns"]
 
@@ -96,15 +233,23 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
         quarterly_returns = get_return(result["portfolio_value_curve"], freq="QE")
         annual_returns = get_return(result["portfolio_value_curve"], freq="YE")
 
-        monthly_sharpe = calculate_sharpe(
-            daily_returns, freq="ME", rf=self.rf
-        )  # min 10 days per month
-        quarterly_sharpe = calculate_sharpe(daily_returns, freq="QE", rf=self.rf)
-
-        monthly_ir = calculate_ir(
-            daily_returns, self.bmk_returns, freq="ME"
-        )  # min 10 days per month
-        quarterly_ir = calculate_ir(daily_returns, self.bmk_returns, freq="QE")
+        # every rolling ratio from one pass over the returns
+        sharpe = rolling_ratios(
+            daily_returns,
+            self.rf / self.periods_per_year,
+            freqs=("ME", "QE"),
+            periods_per_year=self.periods_per_year,
+        )
+        ir = rolling_ratios(
+            daily_returns,
+            self.bmk_returns,
+            freqs=("ME", "QE"),
+            periods_per_year=self.periods_per_year,
+        )
+        monthly_sharpe = get_rolling_ratio(sharpe, "ME")
+        quarterly_sharpe = get_rolling_ratio(sharpe, "QE")
+        monthly_ir = get_rolling_ratio(ir, "ME")
+        quarterly_ir = get_rolling_ratio(ir, "QE")
 
         # Win Rate metrics
         positive_days = (daily_returns > 0).sum()
@@ -141,6 +286,7 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
 
         return result
 
+    @cached_metric("actual_trading_dates")
     def trading_metrics(self):
         trades_ts = {}
         for date, trades in self.portfolio.executed_plan_history.items():
@@ -186,7 +332,7 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
         trades_by_ticker = pd.DataFrame(ticker_metrics)
         no_signal_days = sum(
             [
-                (np.array(signals.values()) == 0).all()
+                all(signal == 0 for signal in signals.values())
                 for signals in self.portfolio.signals_history.values()
             ]
         )
@@ -200,25 +346,31 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
             "max_drawdown_trades_metrics": max_drawdown_trades_metrics,
         }
 
+    @cached_metric("actual_trading_dates")
     def sector_metrics(self):
         trades_by_ticker = self.trading_metrics()["trades_by_ticker"]
         prd_data = trades_by_ticker.merge(self.product_data, on="ticker", how="left")
         prd_data.set_index("ticker", inplace=True)
 
-        # Sector
-        sector_ts = []
+        # Sector, number of tickers held per date of the sectors traded
         sectors = prd_data.sector.unique()
-        for holdings in self.portfolio.holdings_history.values():
-            prd = prd_data.loc[holdings.keys()]
-            sector_counts = prd.groupby("sector").size()
-            sectors_dict = {sector: sector_counts.get(sector, 0) for sector in sectors}
-            sector_ts.append(sectors_dict)
+        sector_ts = (
+            self.attribution_metrics()["sector_holdings"]
+            .reindex(columns=sectors, fill_value=0)
+            .to_dict(orient="records")
+        )
 
         return {
             "sector_ts": sector_ts,
             "sector_trading_data": prd_data,
         }
 
+    @cached_metric()
+    def attribution_metrics(self) -> dict:
+        """daily p&l and exposure per ticker and per sector, see PnLAttribution"""
+        return PnLAttribution(self.portfolio).get_attribution()
+
+    @cached_metric("actual_trading_dates")
     def get_cashflow_curve(self) -> dict:
         transaction_costs_ts = {
             d: k["costs"] for d, k in self.cashflow_stats_ts.items()
@@ -235,6 +387,7 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
             "sell_proceeds_ts": sell_proceeds_ts,
         }
 
+    @cached_metric("actual_trading_dates")
     def get_pnl_curve(self) -> dict:
         realized_gain_sell_ts = {
             d: k["realized_gain_sell"] for d, k in self.daily_pnl_ts.items()
@@ -272,233 +425,308 @@ class AdvancedPortfolioAnalytics(PortfolioAnalytics):
             "realized_return_net_of_cost_pct_ts": realized_return_net_of_cost_pct_ts,
         }
 
-    def _process_trades_data(self):
-        all_positions = []
-        all_transactions = []
-
-        # first flatten the data structure for positions and transactions
-        # a position represents a single long event, whereas transaction represents a single
-        # sell event that may have sell more than one positions e.g. a ticker is bought twice then sold all
-        for date in self.actual_trading_dates:
-            for ticker, sell_record in self.portfolio.sell_history.get(
-                date, {}
-            ).items():
-                closed_positions = self.portfolio.closed_positions.get(date, {}).get(
-                    ticker
-                )
-                if not closed_positions:
-                    raise ValueError(
-                        f"Ticker {ticker} has no closed positions on date {date} but has sell record"
-                    )
-
-                # Count number of positions closed in this sell event
-                total_positions_closed = len(closed_positions)
-
-                for pos in closed_positions:
-                    position_data = {
-                        "date": pd.to_datetime(date),
-                        "ticker": ticker,
-                        "entry_date": pd.to_datetime(pos.entry_date),
-                        "entry_price": pos.entry_price,
-                        "entry_shares": pos.entry_shares,
-                        "exit_date": pd.to_datetime(pos.exit_date),
-                        "exit_price": pos.exit_price,
-                        "exit_shares": pos.exit_shares,
-                        "exit_reason": pos.exit_reason.value,
-                        "total_positions_in_cycle": total_positions_closed,  # Add this to track positions per cycle
-                    }
-                    # Calculate holding period for each position individually
-                    position_data["holding_period"] = (
-                        position_data["exit_date"] - position_data["entry_date"]
-                    ).days
-                    all_positions.append(position_data)
-
-                stop_loss_sell = self.portfolio.stop_loss_history.get(date, {}).get(
-                    ticker
-                )
-                if stop_loss_sell:
-                    all_transactions.append(
-                        {
-                            "date": pd.to_datetime(date),
-                            "ticker": ticker,
-                            "costs": stop_loss_sell.get("costs"),
-                            "proceeds": stop_loss_sell.get("proceeds"),
-                            "type": TransactionType.STOP_LOSS.value,
-                        }
-                    )
-                all_transactions.append(
-                    {
-                        "date": pd.to_datetime(date),
-                        "ticker": ticker,
-                        "costs": sell_record.get("costs"),
-                        "proceeds": sell_record.get("proceeds"),
-                        "type": TransactionType.SELL.value,
-                    }
-                )
-
-            for ticker, buy_record in self.portfolio.buy_history.get(date, {}).items():
-                all_transactions.append(
-                    {
-                        "date": pd.to_datetime(date),
-                        "ticker": ticker,
-                        "costs": buy_record["costs"],
-                        "proceeds": buy_record["proceeds"],
-                        "type": TransactionType.BUY.value,
-                    }
-                )
+    def get_fills(self) -> pd.DataFrame:
+        """the portfolio's TradeLedger, one row per fill"""
+        ledger = getattr(self.portfolio.state, "ledger", None)
+        if ledger is None:  # state saved before the ledger existed
+            ledger = TradeLedger.from_state(self.portfolio.state)
+        return ledger.to_frame()
+
+    def _get_trade_ledger(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """group-bys over the fills: one row per closed position and one per buy / sell
+        / stop loss transaction. a position represents a single long event, whereas a
+        transaction is a single sell event that may close more than one position e.g. a
+        ticker is bought twice then sold all. reports what the per date histories always
+        did: exits only count for tickers sold on the day, and the proceeds of a sell or
+        stop loss are the running total of that day's closes of the same kind"""
+        fills = self.get_fills()
+        fills["row"] = np.arange(len(fills))
+        entries = fills.loc[
+            fills.side == BUY, ["lot_id", "date", "price", "shares"]
+        ].rename(
+            columns={
+                "date": "entry_date",
+                "price": "entry_price",
+                "shares": "entry_shares",
+            }
+        )
+        fills = fills[fills["date"].isin(set(self.actual_trading_dates))]
+        exits = fills[fills.side == EXIT]
+
+        # tickers sold on the day, in the order they were sold
+        sold = (
+            exits.loc[exits.reason == TransactionType.SELL.value, ["date", "ticker"]]
+            .drop_duplicates()
+            .assign(sell_order=lambda df: np.arange(len(df)))
+        )
 
-        positions_df = pd.DataFrame(all_positions)
-        transactions_df = pd.DataFrame(all_transactions)
+        positions_df = (
+            exits.merge(sold, on=["date", "ticker"])
+            .sort_values(by=["sell_order", "row"], kind="stable")
+            .merge(entries, on="lot_id", how="left")
+        )
+        positions_df = pd.DataFrame(
+            {
+                "date": positions_df["date"],
+                "ticker": positions_df["ticker"],
+                "entry_date": positions_df["entry_date"],
+                "entry_price": positions_df["entry_price"],
+                "entry_shares": positions_df["entry_shares"],
+                "exit_date": positions_df["date"],
+                "exit_price": positions_df["price"],
+                "exit_shares": positions_df["shares"],
+                "exit_reason": positions_df["reason"],
+                # number of positions closed in this sell event
+                "total_positions_in_cycle": positions_df.groupby(
+                    ["date", "ticker"], sort=False
+                )["lot_id"].transform("size"),
+            }
+        )
 
-        if not positions_df.empty:
-            positions_df["realized_return"] = (
-                positions_df["exit_price"] - positions_df["entry_price"]
-            ) * positions_df["exit_shares"]
-            positions_df["realized_return_pct"] = (
-                positions_df["exit_price"] - positions_df["entry_price"]
-            ) / positions_df["entry_price"]
-
-            def categorize_pnl(row):
-                pnl = row["realized_return"]
-                if row["exit_reason"] == TransactionType.SELL.value:
-                    return max(pnl, 0), min(pnl, 0), 0, 0
-                elif row["exit_reason"] == TransactionType.STOP_LOSS.value:
-                    return 0, 0, max(pnl, 0), min(pnl, 0)
-                return 0, 0, 0, 0
-
-            pnl_categories = positions_df.apply(
-                categorize_pnl, axis=1, result_type="expand"
+        exit_transactions = (
+            exits.groupby(["date", "reason", "ticker"], sort=False)
+            .agg(
+                row=("row", "first"),
+                price=("price", "first"),
+                shares=("shares", "sum"),
+                costs=("cost", "sum"),
             )
-            pnl_categories.columns = [
-                "realized_gain_sell",
-                "realized_loss_sell",
-                "realized_gain_stop_loss",
-                "realized_loss_stop_loss",
-            ]
-            positions_df = pd.concat([positions_df, pnl_categories], axis=1)
-
-            grouped = (
-                positions_df.groupby(["date", "ticker", "exit_reason"])
-                .agg(
+            .reset_index()
+            .sort_values(by="row")
+        )
+        exit_transactions["proceeds"] = (
+            exit_transactions["price"] * exit_transactions["shares"]
+            - exit_transactions["costs"]
+        )
+        exit_transactions["proceeds"] = exit_transactions.groupby(
+            ["date", "reason"], sort=False
+        )["proceeds"].cumsum()
+        exit_transactions = exit_transactions[
+            exit_transactions.reason.isin(
+                [TransactionType.STOP_LOSS.value, TransactionType.SELL.value]
+            )
+        ].merge(sold, on=["date", "ticker"])
+        # stop loss before the sell of the same ticker
+        exit_transactions["order"] = exit_transactions.reason.eq(
+            TransactionType.SELL.value
+        )
+        buys = fills[fills.side == BUY]
+        transactions_df = pd.concat(
+            [
+                exit_transactions.sort_values(
+                    by=["sell_order", "order"], kind="stable"
+                ),
+                pd.DataFrame(
                     {
-                        "entry_date": "min",
-                        "exit_date": "max",
-                        "exit_shares": "sum",
-                        "realized_return": "sum",
-                        "realized_return_pct": lambda x: (
-                            x * positions_df.loc[x.index, "exit_shares"]
-                        ).sum()
-                        / positions_df.loc[x.index, "exit_shares"].sum(),
-                        "entry_price": lambda x: (
-                            x * positions_df.loc[x.index, "entry_shares"]
-                        ).sum()
-                        / positions_df.loc[x.index, "entry_shares"].sum(),
-                        "realized_gain_sell": "sum",
-                        "realized_loss_sell": "sum",
-                        "realized_gain_stop_loss": "sum",
-                        "realized_loss_stop_loss": "sum",
-                        "holding_period": "mean",  # Average holding period for multiple positions
-                        "total_positions_in_cycle": "first",  # Just take the first since they're all the same for a cycle
+                        "date": buys["date"],
+                        "ticker": buys["ticker"],
+                        "costs": buys["cost"],
+                        "proceeds": buys["shares"] * buys["price"] - buys["cost"],
+                        "reason": buys["reason"],
+                        "row": buys["row"],
                     }
-                )
-                .reset_index()
-            )
-
-            # Merge costs for transaction costs calculation
-            costs_df = (
-                transactions_df[transactions_df.type == TransactionType.BUY.value]
-                .merge(
-                    grouped[["ticker", "entry_date", "exit_date"]],
-                    right_on=["entry_date", "ticker"],
-                    left_on=["date", "ticker"],
-                    how="left",
-                )
-                .groupby(["ticker", "exit_date"])
-                .agg({"costs": "sum"})
-                .reset_index()
-            ).merge(
-                transactions_df[transactions_df.type != TransactionType.BUY.value],
-                left_on=["ticker", "exit_date"],
-                right_on=["ticker", "date"],
-                how="inner",
+                ),
+            ]
+        )
+        date_order = {date: i for i, date in enumerate(self.actual_trading_dates)}
+        transactions_df = (
+            transactions_df.assign(
+                date_order=transactions_df["date"].map(date_order),
+                is_buy=transactions_df.reason.eq(TransactionType.BUY.value),
             )
-            costs_df["costs"] = costs_df.apply(lambda x: x.costs_x + x.costs_y, axis=1)
+            .sort_values(by=["date_order", "is_buy"], kind="stable")
+            .rename(columns={"reason": "type"})[
+                ["date", "ticker", "costs", "proceeds", "type"]
+            ]
+            .reset_index(drop=True)
+        )
 
-            grouped_costs = grouped.merge(
-                costs_df[["ticker", "exit_date", "costs"]],
-                left_on=["ticker", "exit_date"],
-                right_on=["ticker", "exit_date"],
-                how="left",
-            )
+        for df, columns in (
+            (positions_df, ["date", "entry_date", "exit_date"]),
+            (transactions_df, ["date"]),
+        ):
+            for column in columns:
+                if column in df:
+                    df[column] = to_timestamps(df[column])
+        if not positions_df.empty:
+            positions_df["holding_period"] = (
+                positions_df["exit_date"] - positions_df["entry_date"]
+            ).dt.days
+        return positions_df, transactions_df
 
-            grouped_costs["realized_return_net_of_cost"] = (
-                grouped_costs["realized_return"] - grouped_costs["costs"]
-            )
-            grouped_costs["realized_return_net_of_cost_pct"] = grouped_costs[
-                "realized_return_net_of_cost"
-            ] / (grouped_costs["entry_price"] * grouped_costs["exit_shares"])
+    @cached_metric("actual_trading_dates")
+    def _process_trades_data(self):
+        positions_df, transactions_df = self._get_trade_ledger()
+        cashflow_stats_ts = self._get_cashflow_stats(transactions_df)
+        if positions_df.empty:
+            return cashflow_stats_ts, defaultdict(dict), {}
+
+        pnl = positions_df["exit_price"] - positions_df["entry_price"]
+        positions_df["realized_return"] = pnl * positions_df["exit_shares"]
+        positions_df["realized_return_pct"] = pnl / positions_df["entry_price"]
+
+        realized = positions_df["realized_return"]
+        is_sell = positions_df["exit_reason"] == TransactionType.SELL.value
+        is_stop_loss = positions_df["exit_reason"] == TransactionType.STOP_LOSS.value
+        positions_df["realized_gain_sell"] = realized.clip(lower=0).where(is_sell, 0)
+        positions_df["realized_loss_sell"] = realized.clip(upper=0).where(is_sell, 0)
+        positions_df["realized_gain_stop_loss"] = realized.clip(lower=0).where(
+            is_stop_loss, 0
+        )
+        positions_df["realized_loss_stop_loss"] = realized.clip(upper=0).where(
+            is_stop_loss, 0
+        )
+        # share weighted averages as sum(x * w) / sum(w), so the groupby stays builtin
+        positions_df["_return_x_shares"] = (
+            positions_df["realized_return_pct"] * positions_df["exit_shares"]
+        )
+        positions_df["_price_x_shares"] = (
+            positions_df["entry_price"] * positions_df["entry_shares"]
+        )
 
-            daily_pnl = grouped_costs.groupby("date").agg(
+        grouped = (
+            positions_df.groupby(["date", "ticker", "exit_reason"])
+            .agg(
                 {
+                    "entry_date": "min",
+                    "exit_date": "max",
+                    "exit_shares": "sum",
+                    "entry_shares": "sum",
+                    "_return_x_shares": "sum",
+                    "_price_x_shares": "sum",
+                    "realized_return": "sum",
                     "realized_gain_sell": "sum",
                     "realized_loss_sell": "sum",
                     "realized_gain_stop_loss": "sum",
                     "realized_loss_stop_loss": "sum",
-                    "realized_return": "sum",
-                    "realized_return_net_of_cost": "sum",
-                    "realized_return_pct": "mean",
-                    "realized_return_net_of_cost_pct": "mean",
+                    "holding_period": "mean",  # Average holding period for multiple positions
+                    "total_positions_in_cycle": "first",  # Just take the first since they're all the same for a cycle
                 }
             )
+            .reset_index()
+        )
+        grouped["realized_return_pct"] = (
+            grouped.pop("_return_x_shares") / grouped["exit_shares"]
+        )
+        grouped["entry_price"] = grouped.pop("_price_x_shares") / grouped.pop(
+            "entry_shares"
+        )
 
-            ticker_level_records_ts = defaultdict(dict)
-            for _, row in grouped_costs.iterrows():
-                ticker_level_records_ts[row["ticker"]][row["date"]] = {
-                    "holding_start_date": row["entry_date"],
-                    "holding_end_date": row["exit_date"],
-                    "holding_period": row["holding_period"],
-                    "cost_basis": row["entry_price"],
-                    "total_long_trades": row[
-                        "total_positions_in_cycle"
-                    ],  # Use the count of positions closed in this cycle
-                    "profit": row["realized_return"],
-                    "return": row["realized_return_pct"],
-                    "profit_net_of_cost": row["realized_return_net_of_cost"],
-                    "return_net_of_cost": row["realized_return_net_of_cost_pct"],
-                    "transaction_costs": row["costs"],
-                    "exit_reason": row["exit_reason"],
-                }
+        # buy costs of the positions in a cycle plus the costs of its exit transactions
+        costs_df = (
+            transactions_df[transactions_df.type == TransactionType.BUY.value]
+            .merge(
+                grouped[["ticker", "entry_date", "exit_date"]],
+                right_on=["entry_date", "ticker"],
+                left_on=["date", "ticker"],
+                how="left",
+            )
+            .groupby(["ticker", "exit_date"])
+            .agg({"costs": "sum"})
+            .reset_index()
+        ).merge(
+            transactions_df[transactions_df.type != TransactionType.BUY.value],
+            left_on=["ticker", "exit_date"],
+            right_on=["ticker", "date"],
+            how="inner",
+        )
+        costs_df["costs"] = costs_df["costs_x"] + costs_df["costs_y"]
 
-            daily_pnl_ts = daily_pnl.to_dict(orient="index")
-
-            if not transactions_df.empty:
-                cashflow_stats = (
-                    transactions_df.groupby(["date", "type"])
-                    .agg({"costs": "sum", "proceeds": "sum"})
-                    .reset_index()
-                    .to_dict(orient="records")
-                )
-                cashflow_stats_ts = defaultdict(
-                    lambda: {
-                        "costs": 0,
-                        "sell_proceeds": 0,
-                        "buy_proceeds": 0,
-                    }
-                )
+        grouped_costs = grouped.merge(
+            costs_df[["ticker", "exit_date", "costs"]],
+            left_on=["ticker", "exit_date"],
+            right_on=["ticker", "exit_date"],
+            how="left",
+        )
 
-                for entry in cashflow_stats:
-                    if entry["type"] == TransactionType.BUY.value:
-                        cashflow_stats_ts[entry["date"]]["buy_proceeds"] = entry[
-                            "proceeds"
-                        ]
-                    elif entry["type"] == TransactionType.SELL.value:
-                        cashflow_stats_ts[entry["date"]]["sell_proceeds"] = entry[
-                            "proceeds"
-                        ]
-                    cashflow_stats_ts[entry["date"]]["costs"] = entry["costs"]
+        grouped_costs["realized_return_net_of_cost"] = (
+            grouped_costs["realized_return"] - grouped_costs["costs"]
+        )
+        grouped_costs["realized_return_net_of_cost_pct"] = grouped_costs[
+            "realized_return_net_of_cost"
+        ] / (grouped_costs["entry_price"] * grouped_costs["exit_shares"])
 
-            return cashflow_stats_ts, ticker_level_records_ts, daily_pnl_ts
+        daily_pnl = grouped_costs.groupby("date").agg(
+            {
+                "realized_gain_sell": "sum",
+                "realized_loss_sell": "sum",
+                "realized_gain_stop_loss": "sum",
+                "realized_loss_stop_loss": "sum",
+                "realized_return": "sum",
+                "realized_return_net_of_cost": "sum",
+                "realized_return_pct": "mean",
+                "realized_return_net_of_cost_pct": "mean",
+            }
+        )
+
+        records = grouped_costs.rename(
+            columns={
+                "entry_date": "holding_start_date",
+                "exit_date": "holding_end_date",
+                "entry_price": "cost_basis",
+                "total_positions_in_cycle": "total_long_trades",
+                "realized_return": "profit",
+                "realized_return_pct": "return",
+                "realized_return_net_of_cost": "profit_net_of_cost",
+                "realized_return_net_of_cost_pct": "return_net_of_cost",
+                "costs": "transaction_costs",
+            }
+        )[
+            [
+                "ticker",
+                "date",
+                "holding_start_date",
+                "holding_end_date",
+                "holding_period",
+                "cost_basis",
+                "total_long_trades",
+                "profit",
+                "return",
+                "profit_net_of_cost",
+                "return_net_of_cost",
+                "transaction_costs",
+                "exit_reason",
+            ]
+        ].to_dict(
+            orient="records"
+        )
+        ticker_level_records_ts = defaultdict(dict)
+        for record in records:
+            ticker_level_records_ts[record.pop("ticker")][record.pop("date")] = record
+
+        return (
+            cashflow_stats_ts,
+            ticker_level_records_ts,
+            daily_pnl.to_dict(orient="index"),
+        )
+
+    @staticmethod
+    def _get_cashflow_stats(transactions_df: pd.DataFrame) -> dict:
+        """{date: {costs, sell_proceeds, buy_proceeds}}, costs are the ones of the last
+        transaction type of the day (buy < sell < stop_loss) as they always were"""
+        cashflow_stats_ts = defaultdict(
+            lambda: {
+                "costs": 0,
+                "sell_proceeds": 0,
+                "buy_proceeds": 0,
+            }
+        )
+        if transactions_df.empty:
+            return cashflow_stats_ts
+        totals = transactions_df.groupby(["date", "type"])[["costs", "proceeds"]].sum()
+        costs = totals["costs"].unstack("type")
+        proceeds = totals["proceeds"].unstack("type")
+        cashflow = pd.DataFrame(
+            {
+                "costs": costs.ffill(axis=1).iloc[:, -1],
+                "sell_proceeds": proceeds.get(TransactionType.SELL.value, 0),
+                "buy_proceeds": proceeds.get(TransactionType.BUY.value, 0),
+            }
+        ).fillna(0)
+        cashflow_stats_ts.update(cashflow.to_dict(orient="index"))
+        return cashflow_stats_ts
 
+    @cached_metric()
     def contribution_metrics(self):
         """Analyze capital injections and trading activity contributions"""
         # Get the capital curve which includes injections
@@ -0,0 +1,93 @@
+"""daily p&l and exposure by ticker and sector from matrices instead of per date loops.
+trades fill at the open, so a day's mark to market p&l splits exactly in an overnight
+leg on the previous close's holdings and an intraday leg on the holdings after trading:
+    pnl[t] = H[t - 1] * (open[t] - close[t - 1]) + H[t] * (close[t] - open[t])
+sector numbers are the ticker ones times a ticker x sector one hot matrix. transaction
+costs and capital injections are not p&l here, see the cashflow curves"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def get_holdings_matrix(holdings_history: Dict, tickers: list) -> np.ndarray:
+    """dates x tickers shares held at the close, 0 when not held"""
+    column = {ticker: j for j, ticker in enumerate(tickers)}
+    holdings = np.zeros((len(holdings_history), len(tickers)))
+    for i, held in enumerate(holdings_history.values()):
+        if held:
+            holdings[i, [column[ticker] for ticker in held]] = list(held.values())
+    return holdings
+
+
+def get_sector_matrix(
+    tickers: list, product_data: pd.DataFrame
+) -> Tuple[pd.Index, np.ndarray]:
+    """sectors and the tickers x sectors one hot matrix, tickers without a sector have
+    an all zero row"""
+    sectors = product_data.drop_duplicates("ticker").set_index("ticker")["sector"]
+    one_hot = pd.get_dummies(sectors.reindex(tickers), dtype=np.int64)
+    return one_hot.columns, one_hot.to_numpy()
+
+
+class PnLAttribution:
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+        self.dates = list(portfolio.holdings_history.keys())
+        # only tickers held at some point, the rest would be all zero columns
+        self.tickers = list(
+            dict.fromkeys(
+                ticker
+                for held in portfolio.holdings_history.values()
+                for ticker in held
+            )
+        )
+        self.holdings = get_holdings_matrix(portfolio.holdings_history, self.tickers)
+        self.sectors, self.sector_matrix = get_sector_matrix(
+            self.tickers, portfolio.product_data
+        )
+
+    def _prices(self, prices: pd.DataFrame) -> np.ndarray:
+        return prices.reindex(index=self.dates, columns=self.tickers).to_numpy(
+            dtype=np.float64
+        )
+
+    def ticker_pnl(self) -> np.ndarray:
+        held = self.holdings
+        held_before = np.vstack([np.zeros((1, held.shape[1])), held[:-1]])
+        open_prices = self._prices(self.portfolio.open_prices)
+        close_prices = self._prices(self.portfolio.close_prices)
+        previous_close = np.vstack([close_prices[:1], close_prices[:-1]])
+        with np.errstate(invalid="ignore"):
+            overnight = held_before * (open_prices - previous_close)
+            intraday = held * (close_prices - open_prices)
+        # 0 * nan for tickers not held on a day without a price
+        return np.where(held_before != 0, overnight, 0) + np.where(
+            held != 0, intraday, 0
+        )
+
+    def ticker_exposure(self) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            exposure = self.holdings * self._prices(self.portfolio.close_prices)
+        return np.where(self.holdings != 0, exposure, 0)
+
+    def sector_holdings(self) -> pd.DataFrame:
+        """dates x sectors number of tickers held"""
+        counts = (self.holdings != 0).astype(np.int64) @ self.sector_matrix
+        return pd.DataFrame(counts, index=self.dates, columns=self.sectors)
+
+    def get_attribution(self) -> Dict[str, pd.DataFrame]:
+        """dates x tickers and dates x sectors p&l / market value frames"""
+        pnl, exposure = self.ticker_pnl(), self.ticker_exposure()
+
+        def frame(values, columns):
+            return pd.DataFrame(values, index=self.dates, columns=columns)
+
+        return {
+            "ticker_pnl": frame(pnl, self.tickers),
+            "sector_pnl": frame(pnl @ self.sector_matrix, self.sectors),
+            "ticker_exposure": frame(exposure, self.tickers),
+            "sector_exposure": frame(exposure @ self.sector_matrix, self.sectors),
+            "sector_holdings": self.sector_holdings(),
+        }
@@ -0,0 +1,173 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from portfolio.drawdown import (
+    get_longest_drawdown,
+    get_max_drawdown,
+    get_performance_curve,
+)
+from portfolio.metrics_calculator import PERIODS_PER_YEAR, to_timestamps
+
+
+class BatchAnalytics:
+    """PortfolioAnalytics headline numbers for many runs at once, e.g. to rank the
+    results of a grid search. curves are S x T frames (one row per scenario, one column
+    per date), runs that stopped early (max drawdown) are nan padded at the end.
+    periods_per_year annualizes like PortfolioAnalytics. capital_flows (same shape, nan
+    or 0 where none) keeps capital injections out of the drawdowns"""
+
+    def __init__(
+        self,
+        portfolio_values: pd.DataFrame,
+        capital: Optional[pd.DataFrame] = None,
+        rf=0.02,
+        bmk_returns=0.1,
+        periods_per_year: float = PERIODS_PER_YEAR,
+        capital_flows: Optional[pd.DataFrame] = None,
+    ):
+        if portfolio_values.shape[1] < 2:
+            raise ValueError("Need at least two dates per curve")
+        self.portfolio_values = portfolio_values
+        self.capital = capital
+        self.rf = rf
+        self.bmk_returns = bmk_returns
+        self.periods_per_year = periods_per_year
+        self.capital_flows = capital_flows
+
+    @classmethod
+    def from_curves(
+        cls,
+        portfolio_value_curves: Dict[str, dict],
+        capital_curves: Optional[Dict[str, dict]] = None,
+        rf=0.02,
+        bmk_returns=0.1,
+        periods_per_year: float = PERIODS_PER_YEAR,
+        capital_flows: Optional[Dict[str, dict]] = None,
+    ) -> "BatchAnalytics":
+        """{scenario: {date: value}} as kept by the portfolios, capital_flows as their
+        capital_flow_history"""
+        portfolio_values = stack_curves(portfolio_value_curves)
+        if capital_flows is not None:
+            capital_flows = stack_curves(capital_flows).reindex(
+                index=portfolio_values.index, columns=portfolio_values.columns
+            )
+        return cls(
+            portfolio_values,
+            stack_curves(capital_curves) if capital_curves is not None else None,
+            rf=rf,
+            bmk_returns=bmk_returns,
+            periods_per_year=periods_per_year,
+            capital_flows=capital_flows,
+        )
+
+    def performance_metrics(self) -> pd.DataFrame:
+        """one row per scenario, same definitions as performance_metrics and
+        headline_metrics of a single portfolio"""
+        values = self.portfolio_values.to_numpy(dtype=np.float64)
+        rows = np.arange(len(values))
+        counts = (~np.isnan(values)).sum(axis=1)
+
+        # total return skips day one, see get_return
+        start = values[:, 1]
+        end = values[rows, np.maximum(counts - 1, 0)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            total_return = np.where(start != 0, (end - start) / start, 0.0)
+            years = (counts - 1) / self.periods_per_year
+            annualized_return = np.where(
+                years > 0, (1 + total_return) ** (1 / years) - 1, 0.0
+            )
+
+            returns = values[:, 1:] / values[:, :-1] - 1
+        valid = ~np.isnan(returns)
+        returns_count = valid.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns_mean = np.nansum(returns, axis=1) / returns_count
+            returns_std = np.sqrt(
+                np.nansum((returns - returns_mean[:, None]) ** 2, axis=1)
+                / (returns_count - 1)
+            )
+        periods_per_year = self.periods_per_year
+        performance = get_performance_curve(
+            values,
+            (
+                self.capital_flows.to_numpy(dtype=np.float64)
+                if self.capital_flows is not None
+                else None
+            ),
+        )
+        annualized_vol = returns_std * np.sqrt(periods_per_year)
+
+        def annualized_ratio(excess_mean: np.ndarray) -> np.ndarray:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(
+                    annualized_vol != 0,
+                    excess_mean * periods_per_year / annualized_vol,
+                    0.0,
+                )
+
+        gains = np.where(valid & (returns > 0), returns, 0.0)
+        losses = np.where(valid & (returns < 0), -returns, 0.0)
+        wins, defeats = (gains > 0).sum(axis=1), (losses > 0).sum(axis=1)
+        total_gains, total_losses = gains.sum(axis=1), losses.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metrics = pd.DataFrame(
+                {
+                    "total_return": total_return,
+                    "annualized_return": annualized_return,
+                    "annualized_sharpe": annualized_ratio(
+                        returns_mean - self.rf / periods_per_year
+                    ),
+                    "annualized_ir": annualized_ratio(returns_mean - self.bmk_returns),
+                    "max_drawdown": get_max_drawdown(performance),
+                    "longest_drawdown": get_longest_drawdown(performance),
+                    "win_rate": np.where(returns_count > 0, wins / returns_count, 0.0),
+                    "avg_win": np.where(wins > 0, total_gains / wins, 0.0),
+                    "avg_loss": np.where(defeats > 0, total_losses / defeats, 0.0),
+                    "profit_factor": np.where(
+                        total_losses != 0, total_gains / total_losses, np.inf
+                    ),
+                },
+                index=self.portfolio_values.index,
+            )
+        if self.capital is not None:
+            metrics["remaining_capital"] = self.capital.ffill(axis=1).iloc[:, -1]
+        return metrics
+
+    def daily_returns(self) -> pd.DataFrame:
+        """S x T - 1 pct changes, nan after a run stopped"""
+        values = self.portfolio_values.to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = values[:, 1:] / values[:, :-1] - 1
+        return pd.DataFrame(
+            returns,
+            index=self.portfolio_values.index,
+            columns=self.portfolio_values.columns[1:],
+        )
+
+    def period_returns(self, freq: str = "ME") -> pd.DataFrame:
+        """scenario x period returns, same as get_return(curve, freq=freq) per row"""
+        if freq not in ["ME", "QE", "YE"]:
+            raise ValueError(f"Invalid frequency: {freq}")
+        curves = self.portfolio_values.T
+        curves.index = to_timestamps(curves.index)
+        means = curves.resample(freq).mean()
+        if freq == "ME":  # avoid day one
+            means = means.iloc[1:]
+        return means.pct_change().dropna(how="all").T
+
+    def monthly_returns(self) -> pd.DataFrame:
+        return self.period_returns("ME")
+
+    def quarterly_returns(self) -> pd.DataFrame:
+        return self.period_returns("QE")
+
+    def rank(self, by: str = "annualized_sharpe", ascending=False) -> pd.DataFrame:
+        return self.performance_metrics().sort_values(by=by, ascending=ascending)
+
+
+def stack_curves(curves: Dict[str, dict]) -> pd.DataFrame:
+    """{scenario: {date: value}} -> S x T frame over the union of the dates"""
+    frame = pd.DataFrame({name: pd.Series(curve) for name, curve in curves.items()}).T
+    return frame.reindex(columns=sorted(frame.columns))
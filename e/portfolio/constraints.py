@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from itertools import islice
 from typing import Any, Callable, Dict, List
 
 import numpy as np
@@ -46,25 +47,50 @@ class Constraints:
         self.trailing_stop_loss_pct = trailing_stop_loss_pct
         self.constraints = constraints
         self.product_data = product_data
+        self._curve, self._curve_len, self._curve_min = None, 0, np.inf
 
     def get_constraints(self) -> dict:
         return self.constraints
 
     def trigger_max_drawdown(
-        self, portfolio_value: float, portfolio_value_curve: dict
+        self,
+        portfolio_value: float,
+        portfolio_value_curve: dict,
+        drained_min: float = np.inf,
     ) -> bool:
-        """good!"""
+        """drained_min is the min of the curve values already streamed out (see
+        Portfolio.drain_history), so the first date after a drain is checked too"""
         if self.constraints is None or len(self.constraints) == 0:
             return False
-        if portfolio_value_curve is None or len(portfolio_value_curve) == 0:
+        min_value = min(self._get_curve_min(portfolio_value_curve or {}), drained_min)
+        if min_value == np.inf:  # nothing traded yet
             return False
-        min_value = min(list(portfolio_value_curve.values()))
 
         max_drawdown = (min_value - portfolio_value) / min_value
         if max_drawdown > self.constraints["max_drawdown_limit"]:
             return True
         return False
 
+    def _get_curve_min(self, portfolio_value_curve: dict) -> float:
+        """running min, the curve only gets appended to so just the values added since
+        the last call are scanned (minute bars make a full scan per bar quadratic)"""
+        if portfolio_value_curve is not self._curve or (
+            len(portfolio_value_curve) < self._curve_len
+        ):
+            self._curve, self._curve_len, self._curve_min = (
+                portfolio_value_curve,
+                0,
+                np.inf,
+            )
+        new_values = len(portfolio_value_curve) - self._curve_len
+        if new_values:
+            self._curve_min = min(
+                self._curve_min,
+                min(islice(reversed(portfolio_value_curve.values()), new_values)),
+            )
+            self._curve_len = len(portfolio_value_curve)
+        return self._curve_min
+
     def check_stop_loss(self, active_positions: dict, price: pd.Series) -> dict:
         """since we are implementing trailing stop loss, whenever a the stop price is
         triggered, all positions are closed for the ticker. But the logic here assumes a fixed
@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+ZERO_VOLUME_PARTICIPATION_RATE = 1.0  # as if the fill took the whole bar
+
 
 class TransactionCost:
     def __init__(
@@ -35,16 +37,22 @@ class TransactionCost:
 
     def get_cost_multiple(
         self,
-        volume: pd.DataFrame,
+        volume: pd.Series,
         shares: dict[str, float],  # tickers: shares
         execution_time_days: float = 1.0,
     ) -> dict[str, float]:
-        if len(volume) != len(shares):
-            volume = volume[shares.keys()]
-        participation_rate = np.array(list(shares.values())) / volume
-        liquidity_factor = volume.apply(self.get_liquidity_factor)
+        tickers = list(shares.keys())
+        volume = np.array([volume[ticker] for ticker in tickers], dtype=np.float64)
+        shares = np.abs(np.array(list(shares.values()), dtype=np.float64))
+        # a bar without volume (a minute without trades) is charged a fixed participation
+        # instead of an infinite one
+        with np.errstate(divide="ignore", invalid="ignore"):
+            participation_rate = np.where(
+                volume > 0, shares / volume, ZERO_VOLUME_PARTICIPATION_RATE
+            )
+        liquidity_factor = np.array([self.get_liquidity_factor(v) for v in volume])
         temporary_impact = (
-            (participation_rate.abs() / execution_time_days) ** self.beta
+            (participation_rate / execution_time_days) ** self.beta
         ) * self.eta
 
         timing_cost = 0.5 * np.sqrt(execution_time_days)
@@ -52,7 +60,7 @@ class TransactionCost:
         total_cost_multiple = (
             liquidity_factor + temporary_impact + timing_cost
         ) * self.base_volatility
-        return total_cost_multiple.to_dict()
+        return dict(zip(tickers, total_cost_multiple.tolist()))
 
     def get_liquidity_factor(self, volume):
         volume_liquidity_map = {
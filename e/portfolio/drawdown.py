@@ -0,0 +1,86 @@
+"""drawdowns of value curves in O(T): the underwater curve is each value against its
+running peak, and an episode is a run of days below the peak, found from the changes of
+the underwater sign. 1d arrays are one curve, 2d arrays one curve per row (S x T, e.g.
+the curves of a grid search). pass portfolio values through get_performance_curve first
+so capital injections don't count as recoveries"""
+
+import numpy as np
+import pandas as pd
+
+
+def get_performance_curve(
+    values: np.ndarray, flows: np.ndarray | None = None
+) -> np.ndarray:
+    """values compounded from their returns net of capital flows, (value - flow) over the
+    previous value, starting at the first value. flows are the money added on each
+    period (already in its value, 0 if none), without flows this is the values"""
+    values = np.asarray(values, dtype=np.float64)
+    if flows is None:
+        return values
+    flows = np.nan_to_num(np.asarray(flows, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = (values[..., 1:] - flows[..., 1:]) / values[..., :-1]
+    # same order of products as MetricsAccumulator, nan (a run that stopped) stays nan
+    performance = np.nancumprod(
+        np.concatenate([values[..., :1], returns], axis=-1), axis=-1
+    )
+    return np.where(np.isnan(values), np.nan, performance)
+
+
+def get_underwater(values: np.ndarray) -> np.ndarray:
+    """value / running peak - 1 along the last axis, 0 at a new peak, nan stays nan"""
+    values = np.asarray(values, dtype=np.float64)
+    peak = np.fmax.accumulate(values, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            peak > 0, values / peak - 1, np.where(np.isnan(values), np.nan, 0)
+        )
+
+
+def get_max_drawdown(values: np.ndarray) -> np.ndarray | float:
+    """deepest drop from a peak as a positive fraction, per row for 2d"""
+    return -np.nanmin(get_underwater(values), axis=-1, initial=0)
+
+
+def get_longest_drawdown(values: np.ndarray) -> np.ndarray | int:
+    """most consecutive periods spent below a previous peak, per row for 2d"""
+    below = get_underwater(values) < 0
+    periods = np.arange(below.shape[-1])
+    last_at_peak = np.maximum.accumulate(np.where(below, -1, periods), axis=-1)
+    return (periods - last_at_peak).max(axis=-1, initial=0)
+
+
+def get_drawdown_episodes(curve: pd.Series, top_n: int | None = 5) -> pd.DataFrame:
+    """deepest drawdowns of one curve, one row per episode: the peak it fell from, its
+    trough, the date it got back to the peak (NaT while still under water), the depth
+    and the periods spent going down, coming back and under water in total"""
+    underwater = get_underwater(curve.to_numpy(dtype=np.float64))
+    below = np.concatenate([[False], underwater < 0, [False]])
+    change = np.diff(below.astype(np.int8))
+    starts = np.flatnonzero(change == 1)  # first period under water
+    ends = np.flatnonzero(change == -1)  # back at the peak, len(curve) if not yet
+
+    troughs = np.array(
+        [start + np.argmin(underwater[start:end]) for start, end in zip(starts, ends)],
+        dtype=np.int64,
+    )
+    recovered = ends < len(curve)
+    dates = curve.index
+    episodes = pd.DataFrame(
+        {
+            "peak_date": dates[starts - 1] if len(starts) else dates[:0],
+            "trough_date": dates[troughs],
+            "recovery_date": pd.Series(
+                dates[np.minimum(ends, len(curve) - 1)] if len(ends) else dates[:0]
+            ).where(recovered),
+            "drawdown": -underwater[troughs],
+            "peak_to_trough": troughs - starts + 1,
+            "trough_to_recovery": np.where(recovered, ends - troughs, np.nan),
+            "duration": ends - starts,
+            "recovered": recovered,
+        }
+    )
+    episodes = episodes.sort_values(by="drawdown", ascending=False, kind="stable")
+    if top_n is not None:
+        episodes = episodes.head(top_n)
+    return episodes.reset_index(drop=True)
@@ -0,0 +1,242 @@
+"""every fill of a run in one columnar table: preallocated numpy columns that double when
+full, dates and tickers stored once and referenced by index. a buy opens a lot, an exit
+fill closes one lot, so a sell of a ticker held through several buys is one row per lot.
+the cost of a fill covering several lots is booked on its first lot
+
+    date_idx, ticker_idx   indices into TradeLedger.dates / TradeLedger.tickers
+    side                   1 buy, -1 exit
+    reason                 index into REASONS
+    shares, price, cost    per lot, price is the fill (open) price
+    lot_id                 id of the lot opened / closed"""
+
+from typing import Dict, Hashable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# TransactionType values, as codes
+REASONS = ("sell", "stop_loss", "max_drawdown", "buy")
+REASON_CODES = {reason: code for code, reason in enumerate(REASONS)}
+BUY, EXIT = 1, -1
+
+COLUMNS = {
+    "date_idx": np.int32,
+    "ticker_idx": np.int32,
+    "side": np.int8,
+    "reason": np.int8,
+    "shares": np.float64,
+    "price": np.float64,
+    "cost": np.float64,
+    "lot_id": np.int64,
+}
+
+
+class TradeLedger:
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.columns = {
+            name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS.items()
+        }
+        self.dates: List[Hashable] = []
+        self.tickers: List[str] = []
+        self._date_index: Dict[Hashable, int] = {}
+        self._ticker_index: Dict[str, int] = {}
+        self.next_lot_id = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def new_lot_id(self) -> int:
+        self.next_lot_id += 1
+        return self.next_lot_id - 1
+
+    def append(
+        self,
+        date,
+        ticker: str,
+        side: int,
+        reason: str,
+        shares: float,
+        price: float,
+        cost: float,
+        lot_id: int,
+    ) -> None:
+        if self.size == len(self.columns["side"]):
+            self._grow()
+        if date not in self._date_index:
+            self._date_index[date] = len(self.dates)
+            self.dates.append(date)
+        if ticker not in self._ticker_index:
+            self._ticker_index[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+
+        i = self.size
+        self.columns["date_idx"][i] = self._date_index[date]
+        self.columns["ticker_idx"][i] = self._ticker_index[ticker]
+        self.columns["side"][i] = side
+        self.columns["reason"][i] = REASON_CODES[reason]
+        self.columns["shares"][i] = shares
+        self.columns["price"][i] = price
+        self.columns["cost"][i] = cost
+        self.columns["lot_id"][i] = lot_id
+        self.size += 1
+
+    def _grow(self) -> None:
+        for name, values in self.columns.items():
+            grown = np.empty(max(2 * len(values), 1), dtype=values.dtype)
+            grown[: self.size] = values[: self.size]
+            self.columns[name] = grown
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name][: self.size]
+
+    def to_frame(self) -> pd.DataFrame:
+        """one row per fill with the dates, tickers and reasons decoded"""
+        return pd.DataFrame(
+            {
+                "date": pd.Series(self.dates, dtype=object)
+                .take(self.column("date_idx"))
+                .to_numpy(),
+                "ticker": np.array(self.tickers, dtype=object)[
+                    self.column("ticker_idx")
+                ],
+                "side": self.column("side"),
+                "reason": np.array(REASONS, dtype=object)[self.column("reason")],
+                "shares": self.column("shares"),
+                "price": self.column("price"),
+                "cost": self.column("cost"),
+                "lot_id": self.column("lot_id"),
+            }
+        )
+
+    def to_arrow(self):
+        """pyarrow table, tickers and reasons dictionary encoded on the ledger's codes"""
+        import pyarrow as pa
+
+        def dictionary(indices, values):
+            return pa.DictionaryArray.from_arrays(
+                pa.array(indices, type=pa.int32()), pa.array(list(values))
+            )
+
+        dates = pd.Series(self.dates, dtype=object).take(self.column("date_idx"))
+        return pa.table(
+            {
+                # date32, timestamps or int64 epoch seconds for intraday bars
+                "date": pa.array(dates.tolist()),
+                "ticker": dictionary(self.column("ticker_idx"), self.tickers),
+                "side": pa.array(self.column("side")),
+                "reason": dictionary(self.column("reason"), REASONS),
+                "shares": pa.array(self.column("shares")),
+                "price": pa.array(self.column("price")),
+                "cost": pa.array(self.column("cost")),
+                "lot_id": pa.array(self.column("lot_id")),
+            }
+        )
+
+    def to_parquet(self, path: str) -> None:
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, next_lot_id: int = 0) -> "TradeLedger":
+        """inverse of to_frame, e.g. on the ledger_*.parquet of a chunked run read back
+        and concatenated. lot ids continue from next_lot_id or after the last lot"""
+        ledger = cls(capacity=max(len(frame), 1))
+        date_idx, dates = pd.factorize(frame["date"].to_numpy(dtype=object))
+        ticker_idx, tickers = pd.factorize(frame["ticker"].to_numpy(dtype=object))
+        reason = frame["reason"].to_numpy(dtype=object)
+        values = {
+            "date_idx": date_idx,
+            "ticker_idx": ticker_idx,
+            "side": frame["side"].to_numpy(),
+            "reason": np.array([REASON_CODES[r] for r in reason], dtype=np.int8),
+            "shares": frame["shares"].to_numpy(),
+            "price": frame["price"].to_numpy(),
+            "cost": frame["cost"].to_numpy(),
+            "lot_id": frame["lot_id"].to_numpy(),
+        }
+        for name, column in values.items():
+            ledger.columns[name][: len(frame)] = column
+        ledger.size = len(frame)
+        ledger.dates, ledger.tickers = list(dates), list(tickers)
+        ledger._date_index = {date: i for i, date in enumerate(ledger.dates)}
+        ledger._ticker_index = {ticker: i for i, ticker in enumerate(ledger.tickers)}
+        last_lot_id = int(ledger.column("lot_id").max(initial=-1))
+        ledger.next_lot_id = max(next_lot_id, last_lot_id + 1)
+        return ledger
+
+    def restarted(self) -> "TradeLedger":
+        """empty ledger that keeps numbering lots where this one stopped"""
+        ledger = TradeLedger()
+        ledger.next_lot_id = self.next_lot_id
+        return ledger
+
+    @staticmethod
+    def _lot_ids(state) -> Dict[Tuple[str, Hashable], int]:
+        """(ticker, entry date) -> lot id of every lot in the state, numbered in the
+        order from_state books them"""
+        lot_ids = {}
+        for date in sorted(set(state.closed_positions) | set(state.buy_history)):
+            for ticker, positions in state.closed_positions.get(date, {}).items():
+                for position in positions:
+                    lot_ids.setdefault((ticker, position.entry_date), len(lot_ids))
+            for ticker in state.buy_history.get(date, {}):
+                lot_ids.setdefault((ticker, date), len(lot_ids))
+        for ticker, positions in state.active_positions.items():
+            for entry_date in positions:
+                lot_ids.setdefault((ticker, entry_date), len(lot_ids))
+        return lot_ids
+
+    @classmethod
+    def from_state(cls, state) -> "TradeLedger":
+        """rebuilt from the per date histories, for states saved before the ledger
+        existed. costs of max drawdown exits weren't recorded, they're 0. the state's
+        positions are left alone, see set_lot_ids"""
+        ledger = cls()
+        lot_ids = cls._lot_ids(state)
+        ledger.next_lot_id = len(lot_ids)
+
+        histories = {"stop_loss": state.stop_loss_history, "sell": state.sell_history}
+        for date in sorted(set(state.closed_positions) | set(state.buy_history)):
+            for ticker, positions in state.closed_positions.get(date, {}).items():
+                booked = set()
+                for position in positions:
+                    reason = position.exit_reason.value
+                    record = histories.get(reason, {}).get(date, {}).get(ticker, {})
+                    ledger.append(
+                        date,
+                        ticker,
+                        EXIT,
+                        reason,
+                        position.exit_shares,
+                        position.exit_price,
+                        record.get("costs", 0) if reason not in booked else 0,
+                        lot_ids[ticker, position.entry_date],
+                    )
+                    booked.add(reason)
+            for ticker, record in state.buy_history.get(date, {}).items():
+                ledger.append(
+                    date,
+                    ticker,
+                    BUY,
+                    "buy",
+                    record["shares"],
+                    record["price"],
+                    record["costs"],
+                    lot_ids[ticker, date],
+                )
+        return ledger
+
+    @classmethod
+    def set_lot_ids(cls, state) -> None:
+        """point the lot_id of the state's open and closed positions at the lots
+        from_state books for them, so later exits close the right lot"""
+        lot_ids = cls._lot_ids(state)
+        for positions_by_ticker in state.closed_positions.values():
+            for ticker, positions in positions_by_ticker.items():
+                for position in positions:
+                    position.lot_id = lot_ids[ticker, position.entry_date]
+        for ticker, positions in state.active_positions.items():
+            for entry_date, position in positions.items():
+                position.lot_id = lot_ids[ticker, entry_date]
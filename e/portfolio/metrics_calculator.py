@@ -1,6 +1,11 @@
+from dataclasses import dataclass
+
 import numpy as np
 import pandas as pd
 
+PERIODS_PER_YEAR = 252  # trading days, daily runs
+
+# trading days per period, scaled by periods_per_year / PERIODS_PER_YEAR for bar runs
 annualization_factor = {
     "YE": 252,
     "ME": 21,
@@ -9,41 +14,146 @@ annualization_factor = {
 }
 
 
-def calculate_sharpe(returns, rf, freq="D", annualized=False) -> float | pd.Series:
-    daily_excess_return = returns - rf / 252  # assuming rf is 10yrs treasury
+ROLLING_WINDOW = 15  # days of returns behind the rolling volatility
+
+
+def to_timestamps(dates):
+    """history dates (index, series or list) as pandas timestamps, int dates are the
+    epoch seconds of bar runs (see BarScenario), not nanoseconds"""
+    if pd.api.types.infer_dtype(dates, skipna=True) == "integer":
+        return pd.to_datetime(dates, unit="s")
+    return pd.to_datetime(dates)
+
+
+def rolling_mean_std(values: np.ndarray, windows=(ROLLING_WINDOW,)):
+    """T x len(windows) rolling means and sample stds (ddof 1) from one pass of cumulative
+    sums, nan until a window is full of valid values like rolling(w, min_periods=w). the
+    values are centered first so the sums don't cancel, and windows without any change
+    get an exact 0 std"""
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    centered = np.where(valid, values - np.nanmean(values) if valid.any() else 0, 0.0)
+
+    def cumsum(x):
+        return np.concatenate([[0], np.cumsum(x)])
+
+    sums, squares, counts = cumsum(centered), cumsum(centered**2), cumsum(valid)
+    # integer counts of changes, exact, to spot constant windows
+    changes = cumsum(np.concatenate([[0], values[1:] != values[:-1]]))
+
+    T = len(values)
+    means = np.full((T, len(windows)), np.nan)
+    stds = np.full((T, len(windows)), np.nan)
+    for j, window in enumerate(windows):
+        if window > T:
+            continue
+        end = np.arange(window, T + 1)
+        full = counts[end] - counts[end - window] == window
+        total = sums[end] - sums[end - window]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance = (squares[end] - squares[end - window] - total**2 / window) / (
+                window - 1
+            )
+        variance = np.maximum(variance, 0)
+        variance[changes[end] - changes[end - window + 1] == 0] = 0
+        means[window - 1 :, j] = np.where(full, total / window, np.nan)
+        stds[window - 1 :, j] = np.where(full, np.sqrt(variance), np.nan)
+    if valid.any():
+        means += np.nanmean(values)
+    return means, stds
+
+
+def rolling_ratios(
+    returns: pd.Series,
+    hurdle: float,
+    windows=(ROLLING_WINDOW,),
+    freqs=("D", "ME", "QE", "YE"),
+    periods_per_year: float = PERIODS_PER_YEAR,
+) -> pd.DataFrame:
+    """(returns - hurdle) over their rolling volatility, scaled per frequency and
+    sampled at the end of each period, for every window and frequency from one rolling
+    pass. tidy: freq, window, Date, ratio. hurdle is a per period rate, e.g. rf / 252"""
+    _, stds = rolling_mean_std(returns.to_numpy(dtype=np.float64), windows)
+    stds[stds == 0] = np.nan  # avoid division by zero
+    ratio = (returns.to_numpy(dtype=np.float64) - hurdle)[:, None] / stds
+    ratio = pd.DataFrame(ratio, index=returns.index, columns=list(windows))
+
+    tables = []
+    for freq in freqs:
+        # excess * factor / (vol * sqrt(factor))
+        periods = annualization_factor[freq] * periods_per_year / PERIODS_PER_YEAR
+        sampled = (ratio * np.sqrt(periods)).resample(freq).last()
+        tables.append(
+            sampled.rename_axis("Date")
+            .reset_index()
+            .melt(id_vars="Date", var_name="window", value_name="ratio")
+            .assign(freq=freq)
+        )
+    return pd.concat(tables, ignore_index=True)[["freq", "window", "Date", "ratio"]]
+
+
+def get_rolling_ratio(table: pd.DataFrame, freq: str, window=ROLLING_WINDOW):
+    """one freq / window of a rolling_ratios table as a date indexed series"""
+    rows = (table["freq"] == freq) & (table["window"] == window)
+    return table.loc[rows].set_index("Date")["ratio"].rename(None)
+
+
+def calculate_sharpe(
+    returns,
+    rf,
+    freq="D",
+    annualized=False,
+    window=ROLLING_WINDOW,
+    periods_per_year: float = PERIODS_PER_YEAR,
+) -> float | pd.Series:
+    # assuming rf is 10yrs treasury
+    daily_excess_return = returns - rf / periods_per_year
     if annualized:
-        annualized_return = daily_excess_return.mean() * 252
-        annualized_vol = returns.std() * np.sqrt(252)
+        annualized_return = daily_excess_return.mean() * periods_per_year
+        annualized_vol = returns.std() * np.sqrt(periods_per_year)
 
         return annualized_return / annualized_vol if annualized_vol != 0 else 0
 
-    daily_vol = returns.rolling(window=15, min_periods=15).std()
-    daily_vol[daily_vol == 0] = pd.NA  # avoid division by zero
-
-    excess_return = daily_excess_return * annualization_factor[freq]
-    volatility = daily_vol * np.sqrt(annualization_factor[freq])
-    return (excess_return / volatility).resample(freq).last()
+    table = rolling_ratios(
+        returns,
+        rf / periods_per_year,
+        windows=(window,),
+        freqs=(freq,),
+        periods_per_year=periods_per_year,
+    )
+    return get_rolling_ratio(table, freq, window)
 
 
 def calculate_ir(
-    daily_returns, bmk_returns, freq="D", annualized=False
+    daily_returns,
+    bmk_returns,
+    freq="D",
+    annualized=False,
+    window=ROLLING_WINDOW,
+    periods_per_year: float = PERIODS_PER_YEAR,
 ) -> float | pd.Series:
     daily_excess_return = daily_returns - bmk_returns
     if annualized:
-        annualized_return = daily_excess_return.mean() * 252
-        annualized_vol = daily_excess_return.std() * np.sqrt(252)
+        annualized_return = daily_excess_return.mean() * periods_per_year
+        annualized_vol = daily_excess_return.std() * np.sqrt(periods_per_year)
         return annualized_return / annualized_vol if annualized_vol != 0 else 0
 
-    tracking_error = daily_excess_return.rolling(window=15, min_periods=15).std()
-    tracking_error[tracking_error == 0] = pd.NA  # avoid division by zero
-
-    excess_return = daily_excess_return * annualization_factor[freq]
-    volatility = tracking_error * np.sqrt(annualization_factor[freq])
-    return (excess_return / volatility).resample(freq).last()
+    # the tracking error of a constant benchmark is the volatility of the returns
+    table = rolling_ratios(
+        daily_returns,
+        bmk_returns,
+        windows=(window,),
+        freqs=(freq,),
+        periods_per_year=periods_per_year,
+    )
+    return get_rolling_ratio(table, freq, window)
 
 
 def get_return(
-    data: pd.Series, annualized=False, freq="D"
+    data: pd.Series,
+    annualized=False,
+    freq="D",
+    periods_per_year: float = PERIODS_PER_YEAR,
 ) -> tuple[float, float] | pd.Series:
     if annualized:
         # Use the actual data values, skipping day one
@@ -56,9 +166,9 @@ def get_return(
             (end_value - start_value) / start_value if start_value != 0 else 0
         )
 
-        # Use trading days for annualization (standard in finance)
+        # Use trading days for annualization (standard in finance), bars for bar runs
         trading_days = end_idx - start_idx + 1
-        years = trading_days / 252  # 252 trading days per year
+        years = trading_days / periods_per_year
 
         annualized_return = (1 + total_return) ** (1 / years) - 1 if years > 0 else 0
         return total_return, annualized_return
@@ -70,3 +180,122 @@ def get_return(
         return data.resample(freq).mean().pct_change().dropna()
     else:
         raise ValueError(f"Invalid frequency: {freq}")
+
+
+@dataclass
+class MetricsAccumulator:
+    """headline metrics of a value curve updated one value at a time, so they're O(1)
+    at the end of a run. same definitions as get_return / calculate_sharpe / calculate_ir
+    on the curve: daily returns are the pct changes, day one is skipped for the total
+        return, returns moments are kept with welford's algorithm. the drawdown follows the
+    curve net of capital flows, see get_performance_curve"""
+
+    count: int = 0  # values seen
+    start_value: float = np.nan  # day two, see get_return
+    last_value: float = np.nan
+    returns_count: int = 0
+    returns_mean: float = 0.0
+    returns_m2: float = 0.0
+    performance: float = np.nan  # get_performance_curve, last value
+    peak: float = -np.inf
+    max_drawdown: float = 0.0
+    wins: int = 0
+    losses: int = 0
+    total_gains: float = 0.0
+    total_losses: float = 0.0
+
+    @classmethod
+    def from_values(cls, values, flows=None) -> "MetricsAccumulator":
+        """flows: {date: capital added} of the dates the values are keyed on"""
+        accumulator = cls()
+        if flows is None:
+            for value in values:
+                accumulator.update(value)
+        else:
+            for date, value in values.items():
+                accumulator.update(value, flows.get(date, 0.0))
+        return accumulator
+
+    def update(self, value: float, flow: float = 0.0) -> None:
+        """flow: capital added this period, already in value"""
+        if self.count > 0:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                daily_return = np.float64(value) / self.last_value - 1
+                net_return = (np.float64(value) - flow) / self.last_value
+            if not np.isnan(daily_return):
+                self._add_return(float(daily_return))
+            if not np.isnan(net_return):
+                self.performance = float(self.performance * net_return)
+        if np.isnan(self.performance):  # first value, or saved before it was tracked
+            self.performance = value
+        if self.count == 1:
+            self.start_value = value
+        self.last_value = value
+        self.count += 1
+
+        if self.performance > self.peak:
+            self.peak = self.performance
+        elif self.peak > 0:
+            self.max_drawdown = max(
+                self.max_drawdown, (self.peak - self.performance) / self.peak
+            )
+
+    def _add_return(self, daily_return: float) -> None:
+        self.returns_count += 1
+        delta = daily_return - self.returns_mean
+        self.returns_mean += delta / self.returns_count
+        self.returns_m2 += delta * (daily_return - self.returns_mean)
+        if daily_return > 0:
+            self.wins += 1
+            self.total_gains += daily_return
+        elif daily_return < 0:
+            self.losses += 1
+            self.total_losses -= daily_return
+
+    def summary(
+        self,
+        rf: float,
+        bmk_returns: float,
+        periods_per_year: float = PERIODS_PER_YEAR,
+    ) -> dict:
+        if self.count < 2:
+            total_return, annualized_return = 0, 0
+        else:
+            total_return = (
+                (self.last_value - self.start_value) / self.start_value
+                if self.start_value != 0
+                else 0
+            )
+            years = (self.count - 1) / periods_per_year
+            annualized_return = (1 + total_return) ** (1 / years) - 1
+        returns_std = (
+            np.sqrt(self.returns_m2 / (self.returns_count - 1))
+            if self.returns_count > 1
+            else np.nan
+        )
+        annualized_vol = returns_std * np.sqrt(periods_per_year)
+
+        def annualized_ratio(excess_mean: float) -> float:
+            if annualized_vol == 0:
+                return 0
+            return excess_mean * periods_per_year / annualized_vol
+
+        return {
+            "total_return": total_return,
+            "annualized_return": annualized_return,
+            "annualized_sharpe": annualized_ratio(
+                self.returns_mean - rf / periods_per_year
+            ),
+            "annualized_ir": annualized_ratio(self.returns_mean - bmk_returns),
+            "max_drawdown": self.max_drawdown,
+            "win_rate": (
+                self.wins / self.returns_count if self.returns_count > 0 else 0
+            ),
+            "avg_win": self.total_gains / self.wins if self.wins > 0 else 0,
+            "avg_loss": self.total_losses / self.losses if self.losses > 0 else 0,
+            "profit_factor": (
+                self.total_gains / self.total_losses
+                if self.total_losses != 0
+                else np.inf
+            ),
+        }
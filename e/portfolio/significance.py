@@ -0,0 +1,201 @@
+"""how much of a grid search winner is luck: circular block bootstrap confidence
+intervals of the sharpe ratio and annualized return of every scenario, and the deflated
+sharpe ratio (bailey & lopez de prado) which discounts the best sharpe for the number of
+scenarios tried. returns are S x T daily returns, nan padded for runs that stopped early
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+EULER_GAMMA = 0.5772156649015329
+RESAMPLES_PER_TASK = 100
+
+
+def sharpe_and_return(returns: np.ndarray, rf: float) -> tuple[np.ndarray, np.ndarray]:
+    """annualized sharpe and compounded annualized return per row, nan days are
+    skipped"""
+    return _from_sums(_sums(returns).sum(axis=-1), np.nanmean(returns, axis=1), rf)
+
+
+def _sums(returns: np.ndarray) -> np.ndarray:
+    """4 x S x T per day terms: centered return, its square, log growth, valid day"""
+    valid = ~np.isnan(returns)
+    with np.errstate(invalid="ignore"):
+        centered = np.where(valid, returns - np.nanmean(returns, axis=1)[:, None], 0)
+        log_growth = np.where(valid, np.log1p(returns), 0)
+    return np.stack([centered, centered**2, log_growth, valid])
+
+
+def _from_sums(sums: np.ndarray, means: np.ndarray, rf: float):
+    centered, squares, log_growth, counts = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = means + centered / counts
+        variance = np.maximum(squares - centered**2 / counts, 0) / (counts - 1)
+        annualized_vol = np.sqrt(variance) * np.sqrt(252)
+        sharpe = np.where(
+            annualized_vol != 0, (mean - rf / 252) * 252 / annualized_vol, 0.0
+        )
+        annualized_return = np.exp(log_growth) ** (252 / counts) - 1
+    return sharpe, annualized_return
+
+
+def _bootstrap(
+    returns: np.ndarray, rf: float, block_size: int, n_resamples: int, seed
+) -> tuple[np.ndarray, np.ndarray]:
+    """circular block bootstrap: blocks of block_size consecutive days starting
+    anywhere and wrapping around the end, so autocorrelation inside a block survives.
+    a resample only needs the sums of its blocks, taken from cumulative sums of the
+    circularly extended returns, so it costs T / block_size per scenario, not T"""
+    rng = np.random.default_rng(seed)
+    S, T = returns.shape
+    block_size = min(block_size, T)
+    n_blocks = -(-T // block_size)
+    lengths = np.full(n_blocks, block_size)
+    lengths[-1] = T - (n_blocks - 1) * block_size
+
+    means = np.nanmean(returns, axis=1)
+    sums = _sums(returns)
+    cumulative = np.zeros(sums.shape[:2] + (T + block_size + 1,))
+    np.cumsum(
+        np.concatenate([sums, sums[..., :block_size]], axis=-1),
+        axis=-1,
+        out=cumulative[..., 1:],
+    )
+
+    sharpes = np.empty((n_resamples, S))
+    annualized_returns = np.empty((n_resamples, S))
+    for i in range(n_resamples):
+        starts = rng.integers(0, T, n_blocks)
+        resampled = (cumulative[..., starts + lengths] - cumulative[..., starts]).sum(
+            axis=-1
+        )
+        sharpes[i], annualized_returns[i] = _from_sums(resampled, means, rf)
+    return sharpes, annualized_returns
+
+
+def _bootstrap_shared(shm_name: str, shape: tuple, *args):
+    """worker side, the returns are read from the parent's shared memory, not pickled"""
+    shm = SharedMemory(name=shm_name)
+    try:
+        return _bootstrap(np.ndarray(shape, dtype=np.float64, buffer=shm.buf), *args)
+    finally:
+        shm.close()
+
+
+def bootstrap_intervals(
+    returns: pd.DataFrame,
+    rf: float = 0.04,
+    n_resamples: int = 1000,
+    block_size: int = 21,
+    alpha: float = 0.05,
+    max_workers: Optional[int] = None,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """per scenario sharpe / annualized return with their 1 - alpha percentile
+    intervals. resamples are split in tasks of RESAMPLES_PER_TASK run in a process pool
+    over one shared copy of the returns, max_workers=1 runs them in process"""
+    values = np.ascontiguousarray(returns.to_numpy(dtype=np.float64))
+    tasks = [
+        (rf, block_size, min(RESAMPLES_PER_TASK, n_resamples - start), seed_sequence)
+        for start, seed_sequence in zip(
+            range(0, n_resamples, RESAMPLES_PER_TASK),
+            np.random.SeedSequence(seed).spawn(-(-n_resamples // RESAMPLES_PER_TASK)),
+        )
+    ]
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        results = [_bootstrap(values, *task) for task in tasks]
+    else:
+        shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(_bootstrap_shared, shm.name, values.shape, *task)
+                    for task in tasks
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    sharpes = np.concatenate([sharpe for sharpe, _ in results])
+    annualized_returns = np.concatenate([ar for _, ar in results])
+    sharpe, annualized_return = sharpe_and_return(values, rf)
+    quantiles = [alpha / 2, 1 - alpha / 2]
+    sharpe_lo, sharpe_hi = np.nanquantile(sharpes, quantiles, axis=0)
+    return_lo, return_hi = np.nanquantile(annualized_returns, quantiles, axis=0)
+    return pd.DataFrame(
+        {
+            "annualized_sharpe": sharpe,
+            "sharpe_lo": sharpe_lo,
+            "sharpe_hi": sharpe_hi,
+            "annualized_return": annualized_return,
+            "return_lo": return_lo,
+            "return_hi": return_hi,
+        },
+        index=returns.index,
+    )
+
+
+def deflated_sharpe(returns: pd.DataFrame, rf: float = 0.04) -> pd.Series:
+    """probability that each scenario's sharpe beats the best sharpe expected from as
+    many scenarios with no skill, given its track length, skew and kurtosis"""
+    values = returns.to_numpy(dtype=np.float64)
+    excess = values - rf / 252
+    counts = (~np.isnan(values)).sum(axis=1)
+    mean = np.nanmean(excess, axis=1)
+    std = np.nanstd(values, axis=1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = mean / std  # per day, not annualized
+        centered = values - np.nanmean(values, axis=1)[:, None]
+        z = centered / np.nanstd(values, axis=1)[:, None]
+    skew = np.nanmean(z**3, axis=1)
+    kurtosis = np.nanmean(z**4, axis=1)
+
+    normal = NormalDist()
+    trials = len(values)
+    if trials > 1:
+        # expected max of `trials` sharpes drawn around 0 with the grid's dispersion
+        expected_max = np.nanstd(sharpe, ddof=1) * (
+            (1 - EULER_GAMMA) * normal.inv_cdf(1 - 1 / trials)
+            + EULER_GAMMA * normal.inv_cdf(1 - 1 / (trials * np.e))
+        )
+    else:
+        expected_max = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_score = (
+            (sharpe - expected_max)
+            * np.sqrt(counts - 1)
+            / np.sqrt(1 - skew * sharpe + (kurtosis - 1) / 4 * sharpe**2)
+        )
+    return pd.Series(
+        [normal.cdf(z) if np.isfinite(z) else np.nan for z in z_score],
+        index=returns.index,
+        name="deflated_sharpe",
+    )
+
+
+def grid_significance(
+    returns: pd.DataFrame,
+    rf: float = 0.04,
+    n_resamples: int = 1000,
+    block_size: int = 21,
+    alpha: float = 0.05,
+    max_workers: Optional[int] = None,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """bootstrap intervals and deflated sharpe of every scenario, best sharpe first"""
+    significance = bootstrap_intervals(
+        returns, rf, n_resamples, block_size, alpha, max_workers, seed
+    )
+    significance["deflated_sharpe"] = deflated_sharpe(returns, rf)
+    return significance.sort_values(by="annualized_sharpe", ascending=False)
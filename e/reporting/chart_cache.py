@@ -0,0 +1,160 @@
+"""disk cache for rendered charts so a report re-generated with the same data and styling
+doesn't re-render them. keys hash the chart builder (code included), its arguments and
+the styling"""
+
+import hashlib
+import os
+from types import CodeType
+from typing import Optional
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from reportlab.lib.styles import ParagraphStyle
+
+DEFAULT_MAX_SIZE_BYTES = 256 * 1024**2  # 256MB
+EXTENSION = "png"  # the builders all save png
+
+
+def _update_code_hash(hasher, code) -> None:
+    """bytecode plus the constants and names it uses, a changed literal (say a color)
+    leaves co_code alone. nested functions and comprehensions are code constants"""
+    hasher.update(code.co_code)
+    hasher.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _update_code_hash(hasher, const)
+        else:
+            hasher.update(f"{type(const).__name__}:{const!r}".encode())
+
+
+def _update_hash(hasher, value) -> None:
+    """feed value to hasher by content, frames and arrays through their bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        hasher.update(f"{type(value).__name__}{value.shape}".encode())
+        if isinstance(value, pd.DataFrame):
+            hasher.update(repr((list(value.columns), list(value.dtypes))).encode())
+        try:
+            hashed = pd.util.hash_pandas_object(value, index=True).to_numpy()
+            hasher.update(hashed.tobytes())
+        except TypeError:  # unhashable cells, e.g. lists
+            hasher.update(repr(value.to_dict()).encode())
+    elif isinstance(value, np.ndarray):
+        hasher.update(f"ndarray{value.dtype}{value.shape}".encode())
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        hasher.update(b"{")
+        for k, v in value.items():  # insertion order, it's the plotting order
+            _update_hash(hasher, k)
+            _update_hash(hasher, v)
+        hasher.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b"[")
+        for v in value:
+            _update_hash(hasher, v)
+        hasher.update(b"]")
+    elif callable(value):  # formatters, their code and the values they close over
+        name = getattr(value, "__qualname__", type(value).__qualname__)
+        hasher.update(f"{getattr(value, '__module__', '')}.{name}".encode())
+        code = getattr(value, "__code__", None)
+        if code is not None:
+            _update_code_hash(hasher, code)
+        # defaults live outside the code, e.g. color=Colors.CHART_NAVY
+        _update_hash(hasher, getattr(value, "__defaults__", None))
+        _update_hash(hasher, getattr(value, "__kwdefaults__", None))
+        for cell in getattr(value, "__closure__", None) or ():
+            _update_hash(hasher, cell.cell_contents)
+    elif isinstance(value, ParagraphStyle):
+        # only styles the error paragraphs, which are never cached
+        hasher.update(b"ParagraphStyle")
+    else:
+        hasher.update(f"{type(value).__name__}:{value!r}".encode())
+
+
+def chart_key(name: str, *values) -> str:
+    """sha256 of the builder name, the matplotlib version and everything it draws from,
+    pass the builder itself (and its helpers) to key on their code too"""
+    hasher = hashlib.sha256(f"{name}:{matplotlib.__version__}".encode())
+    _update_hash(hasher, values)
+    return hasher.hexdigest()
+
+
+class ChartCache:
+    """one file per chart under cache_dir, file mtime doubles as the LRU clock so
+    report processes can share the same directory"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        verbose: bool = False,
+    ):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(__file__), "chart_cache")
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.verbose = verbose
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{EXTENSION}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                chart = f.read()
+            os.utime(path)  # touch for LRU
+            return chart
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading chart cache {key}: {e}")
+            return None
+
+    def put(self, key: str, chart: bytes) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(chart)
+            os.replace(tmp_path, path)  # atomic, other processes never see half a file
+        except Exception as e:
+            print(f"Error saving chart cache {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def _files(self) -> list:
+        return [
+            file
+            for file in os.listdir(self.cache_dir)
+            if file.endswith(f".{EXTENSION}")
+        ]
+
+    def evict(self) -> None:
+        """drop least recently used charts until the directory fits max_size_bytes"""
+        entries = []
+        for file in self._files():
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, file))
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, file in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, file))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if self.verbose:
+                print(f"Evicted chart cache entry {file}")
+
+    def clear(self) -> None:
+        for file in self._files():
+            os.remove(os.path.join(self.cache_dir, file))
@@ -17,7 +17,7 @@ from reporting.report_styling import Colors, ReportStyling, StyleUtility
 
 
 class SimpleReportGenerator:
-    def __init__(self, portfolio_analytics, dpi=300):
+    def __init__(self, portfolio_analytics, dpi=300, chart_cache=None):
         self.analytics = portfolio_analytics
         self.portfolio = portfolio_analytics.portfolio
         self.portfolio_name = self.portfolio.name or "Unnamed Portfolio"
@@ -26,7 +26,7 @@ class SimpleReportGenerator:
 
         # Initialize styling
         self.styles = getSampleStyleSheet()
-        self.styling = ReportStyling(dpi=self.dpi)
+        self.styling = ReportStyling(dpi=self.dpi, chart_cache=chart_cache)
         self.style_utility = StyleUtility()
 
         # order matters!
@@ -111,6 +111,7 @@ class SimpleReportGenerator:
         del trading_metrics
 
         self.contribution_metrics = self.analytics.contribution_metrics()
+        self.trading_dates = list(self.analytics.actual_trading_dates or [])
 
     def create_key_performance_data(self) -> dict[str, float]:
         """Create performance metrics for display"""
@@ -658,8 +659,7 @@ class SimpleReportGenerator:
                 trades_df.index = pd.to_datetime(list(trades_ts.keys()))
             else:
                 trades_df = pd.DataFrame(trades_ts)
-                holdings_dates = list(self.analytics.trading_dates)
-                trades_df.index = pd.to_datetime(holdings_dates[: len(trades_df)])
+                trades_df.index = pd.to_datetime(self.trading_dates[: len(trades_df)])
 
             trades_df = trades_df.sort_index()
 
@@ -1754,7 +1754,8 @@ def generate_simple_report(
     analytics,
     filename=None,
     dpi=300,
+    chart_cache=None,
 ) -> str:
     # Create report generator and generate report
-    generator = SimpleReportGenerator(analytics, dpi=dpi)
+    generator = SimpleReportGenerator(analytics, dpi=dpi, chart_cache=chart_cache)
     return generator.generate_report(filename=filename)
@@ -1,18 +1,125 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Optional
+
+import matplotlib
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.platypus import Image, PageBreak, Paragraph, Spacer, Table, TableStyle
 
+from reporting.chart_cache import ChartCache
 from reporting.report import SimpleReportGenerator
 from reporting.report_styling import Colors
 
+# section -> chart method, all rendered before the story is assembled
+CHARTS = {
+    "portfolio_performance": "create_portfolio_overview_page_performance",
+    "return_distribution": "create_monthly_return_distribution_chart",
+    "return_sharpe_ir": "create_monthly_sharpe_ir_chart",
+    "trading_ts": "create_trading_activity_chart",
+    "cashflow_ts": "create_cashflow_over_time_chart",
+    "pnl_ts": "create_pnl_over_time_chart",
+    "holding_ts": "create_holdings_analysis_chart",
+    "sector_ts": "create_sector_exposure_chart",
+    "sector_composition": "create_sector_composition_pie",
+    "sector_duration": "create_sector_duration_boxplot",
+    "sector_return": "create_sector_return_boxplot",
+    "sector_duration_return": "create_return_duration_scatter",
+}
+
+# everything the chart methods draw from, computed by the parent. workers get only this,
+# not the analytics and the portfolio (and its prices) behind the generator
+CHART_DATA = (
+    "curves",
+    "metrics",
+    "sector_ts",
+    "sector_trading_data",
+    "monthly_returns",
+    "monthly_portfolio_value",
+    "monthly_holdings",
+    "trading_dates",
+    "dpi",
+    "styling",
+    "normal_style",
+)
+
+_worker_generator = None
+
+
+def _init_chart_worker(chart_data: dict) -> None:
+    """a generator without __init__ (which runs the analytics), holding the chart data"""
+    global _worker_generator
+    matplotlib.use("Agg")
+    _worker_generator = object.__new__(ReportGenerator)
+    _worker_generator.__dict__.update(chart_data)
+
+
+def _render_chart(method_name: str):
+    return _to_png(getattr(_worker_generator, method_name)())
+
+
+def _to_png(chart):
+    """png bytes of a chart buffer, the error messages charts fall back to as is"""
+    return chart.getvalue() if isinstance(chart, BytesIO) else chart
+
 
 class ReportGenerator(SimpleReportGenerator):
-    def __init__(self, portfolio_analytics, dpi):
-        super().__init__(portfolio_analytics, dpi)
+    def __init__(
+        self,
+        portfolio_analytics,
+        dpi,
+        parallel: bool = True,
+        max_workers: Optional[int] = None,
+        chart_cache: Optional[ChartCache] = None,
+    ):
+        super().__init__(portfolio_analytics, dpi, chart_cache=chart_cache)
+        # parallel=False renders the charts one by one in process, to debug them
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.charts = {}
 
     def get_report_template(self):
         return super().generate_report_template()
 
+    def render_charts(self) -> dict:
+        """png bytes of every chart by section. charts are independent, so they're
+        rendered in a process pool (Agg backend), each worker getting the CHART_DATA
+        once"""
+        max_workers = self.max_workers
+        if max_workers is None:
+            max_workers = min(len(CHARTS), os.cpu_count() or 1)
+
+        if not self.parallel or max_workers <= 1:
+            self.charts = {
+                section: _to_png(getattr(self, method_name)())
+                for section, method_name in CHARTS.items()
+            }
+        else:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_chart_worker,
+                initargs=({name: getattr(self, name) for name in CHART_DATA},),
+            ) as executor:
+                futures = {
+                    section: executor.submit(_render_chart, method_name)
+                    for section, method_name in CHARTS.items()
+                }
+                self.charts = {
+                    section: future.result() for section, future in futures.items()
+                }
+        return self.charts
+
+    def get_chart_image(self, section, width, height):
+        if section not in self.charts:
+            self.charts[section] = _to_png(getattr(self, CHARTS[section])())
+        chart = self.charts[section]
+        if isinstance(chart, bytes):
+            return Image(BytesIO(chart), width=width, height=height)
+        if isinstance(chart, str):
+            return Paragraph(chart, self.normal_style)
+        return chart
+
     def add_title_page(self, story):
         title_page = self.create_title_page()
         story.extend(title_page)
@@ -31,20 +138,17 @@ class ReportGenerator(SimpleReportGenerator):
 
     def add_portfolio_performance(self, story, title):
         self.add_page_header(story, section_name=title)
-        chart = self.create_portfolio_overview_page_performance()
-        story.append(Image(chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("portfolio_performance", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_return_distribution(self, story, title):
         self.add_page_header(story, section_name=title)
-        distribution_chart = self.create_monthly_return_distribution_chart()
-        story.append(Image(distribution_chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("return_distribution", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_return_sharpe_ir(self, story, title):
         self.add_page_header(story, section_name=title)
-        sharpe_ir_chart = self.create_monthly_sharpe_ir_chart()
-        story.append(Image(sharpe_ir_chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("return_sharpe_ir", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_return_topn(self, story, title):
@@ -123,8 +227,7 @@ class ReportGenerator(SimpleReportGenerator):
 
     def add_holding_ts(self, story, title):
         self.add_page_header(story, section_name=title)
-        holdings_chart = self.create_holdings_analysis_chart()
-        story.append(Image(holdings_chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("holding_ts", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_holding_topn(self, story, title):
@@ -191,8 +294,7 @@ class ReportGenerator(SimpleReportGenerator):
 
     def add_trading_ts(self, story, title):
         self.add_page_header(story, section_name=title)
-        trading_activity_chart = self.create_trading_activity_chart(graph_type="D")
-        story.append(Image(trading_activity_chart, width=10 * inch, height=6.4 * inch))
+        story.append(self.get_chart_image("trading_ts", 10 * inch, 6.4 * inch))
         story.append(PageBreak())
 
     def add_trading_topn(self, story, title):
@@ -271,44 +373,39 @@ class ReportGenerator(SimpleReportGenerator):
 
     def add_cashflow_ts(self, story, title):
         self.add_page_header(story, section_name=title)
-        cashflow_chart = self.create_cashflow_over_time_chart(graph_type="D")
-        story.append(Image(cashflow_chart, width=10 * inch, height=6.4 * inch))
+        story.append(self.get_chart_image("cashflow_ts", 10 * inch, 6.4 * inch))
         story.append(PageBreak())
 
     def add_pnl_ts(self, story, title):
         self.add_page_header(story, section_name=title)
-        pnl_chart = self.create_pnl_over_time_chart(graph_type="D")
-        story.append(Image(pnl_chart, width=10 * inch, height=6.4 * inch))
+        story.append(self.get_chart_image("pnl_ts", 10 * inch, 6.4 * inch))
         story.append(PageBreak())
 
     def add_sector_ts(self, story, title):
         self.add_page_header(story, section_name=title)
-        sector_exposure_chart = self.create_sector_exposure_chart()
-        story.append(Image(sector_exposure_chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("sector_ts", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_sector_composition(self, story, title):
         self.add_page_header(story, section_name=title)
-        sector_composition_chart = self.create_sector_composition_pie()
-        story.append(Image(sector_composition_chart, width=8 * inch, height=6 * inch))
+        story.append(self.get_chart_image("sector_composition", 8 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_sector_duration(self, story, title):
         self.add_page_header(story, section_name=title)
-        sector_duration_chart = self.create_sector_duration_boxplot()
-        story.append(Image(sector_duration_chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("sector_duration", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_sector_return(self, story, title):
         self.add_page_header(story, section_name=title)
-        sector_return_chart = self.create_sector_return_boxplot()
-        story.append(Image(sector_return_chart, width=10 * inch, height=6 * inch))
+        story.append(self.get_chart_image("sector_return", 10 * inch, 6 * inch))
         story.append(PageBreak())
 
     def add_sector_duration_return(self, story, title):
         self.add_page_header(story, section_name=title)
-        return_duration_scatter = self.create_return_duration_scatter()
-        story.append(Image(return_duration_scatter, width=10 * inch, height=6 * inch))
+        story.append(
+            self.get_chart_image("sector_duration_return", 10 * inch, 6 * inch)
+        )
         story.append(PageBreak())
 
     def add_capital_contribution_analysis(self, story, title):
@@ -325,6 +422,7 @@ class ReportGenerator(SimpleReportGenerator):
         story.append(PageBreak())
 
     def generate_report_template(self):
+        self.render_charts()
         story = []
 
         self.add_title_page(story)
@@ -1,5 +1,7 @@
+import functools
 from enum import Enum
 from io import BytesIO
+from typing import Optional
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
@@ -10,6 +12,8 @@ from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
 
+from reporting.chart_cache import ChartCache, chart_key
+
 
 # Professional inspired color palette
 class Colors:
@@ -47,13 +51,51 @@ class Colors:
     CHART_WHITE = "#FFFFFF"
 
 
+def _colors() -> dict:
+    return {name: value for name, value in vars(Colors).items() if name.isupper()}
+
+
+def cached_chart(method):
+    """serve a generic chart from self.chart_cache when it was rendered before from the
+    same arguments and styling. the key covers the code of the builder and the styling
+    helpers it calls plus the Colors, so editing any of them re-renders. only rendered
+    charts are stored, not error messages"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.chart_cache is None:
+            return method(self, *args, **kwargs)
+        key = chart_key(
+            method.__name__,
+            method,
+            type(self).setup_matplotlib_style,
+            type(self).add_crisis_overlays,
+            _colors(),
+            self.dpi,
+            self.multi_color_theme.name,
+            self.crisis_periods,
+            args,
+            kwargs,
+        )
+        chart = self.chart_cache.get(key)
+        if chart is not None:
+            return BytesIO(chart)
+        chart = method(self, *args, **kwargs)
+        if isinstance(chart, BytesIO):
+            self.chart_cache.put(key, chart.getvalue())
+        return chart
+
+    return wrapper
+
+
 class ReportStyling:
     """Helper class containing styling and generic functions for report generation"""
 
-    def __init__(self, dpi=1000):
+    def __init__(self, dpi=1000, chart_cache: Optional[ChartCache] = None):
         self.styles = getSampleStyleSheet()
         self.custom_styles = StyleUtility()
         self.dpi = dpi
+        self.chart_cache = chart_cache
         # Multi-color theme for charts with multiple categories (sectors, etc.)
         self.multi_color_theme = plt.cm.Set2
 
@@ -220,6 +262,7 @@ class ReportStyling:
         table.setStyle(TableStyle(base_style))
         return table
 
+    @cached_chart
     def create_generic_line_chart(
         self,
         metrics=None,
@@ -608,6 +651,7 @@ class ReportStyling:
             else:
                 return f"Error creating {chart_name}: {str(e)}"
 
+    @cached_chart
     def create_generic_distribution_chart(
         self,
         metrics,
@@ -804,6 +848,7 @@ class ReportStyling:
 
         return Paragraph(title_text, custom_title_style)
 
+    @cached_chart
     def create_generic_pie_chart(
         self,
         data_dict,
@@ -935,6 +980,7 @@ class ReportStyling:
             else:
                 return f"Error creating {chart_name}: {str(e)}"
 
+    @cached_chart
     def create_generic_multiline_chart(
         self,
         data_df,
@@ -1122,6 +1168,7 @@ class ReportStyling:
             else:
                 return f"Error creating {chart_name}: {str(e)}"
 
+    @cached_chart
     def create_generic_boxplot(
         self,
         data_dict,
@@ -1226,6 +1273,7 @@ class ReportStyling:
             else:
                 return f"Error creating {chart_name}: {str(e)}"
 
+    @cached_chart
     def create_generic_scatter_plot(
         self,
         data_df,
@@ -1335,6 +1383,7 @@ class ReportStyling:
             chart_name = title.lower() if title else "chart"
             return f"Error creating {chart_name}: {str(e)}"
 
+    @cached_chart
     def create_generic_dual_axis_chart(
         self,
         data_dict_left=None,
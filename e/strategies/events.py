@@ -0,0 +1,72 @@
+"""sparse trading signals: most (date, ticker) cells are 0, so keep only the events
+stored csr style by date, indptr[i]:indptr[i + 1] are the events of dates[i] with
+ticker indices sorted, so a date's plan keeps the column order of the dense matrix"""
+
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class SignalEvents:
+    dates: pd.Index
+    tickers: pd.Index
+    indptr: np.ndarray  # len(dates) + 1, int64
+    indices: np.ndarray  # ticker index per event, int32
+    values: np.ndarray  # -1 / 1 per event, int8
+
+    @classmethod
+    def from_dense(cls, signals: np.ndarray, dates, tickers) -> "SignalEvents":
+        rows, cols = np.nonzero(signals)
+        return cls.from_coo(rows, cols, signals[rows, cols], dates, tickers)
+
+    @classmethod
+    def from_frame(cls, signals: pd.DataFrame) -> "SignalEvents":
+        return cls.from_dense(signals.to_numpy(), signals.index, signals.columns)
+
+    @classmethod
+    def from_coo(
+        cls, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, dates, tickers
+    ) -> "SignalEvents":
+        """rows/cols must already be sorted row major"""
+        counts = np.bincount(rows, minlength=len(dates))
+        indptr = np.zeros(len(dates) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(
+            dates=pd.Index(dates),
+            tickers=pd.Index(tickers),
+            indptr=indptr,
+            indices=cols.astype(np.int32),
+            values=values.astype(np.int8),
+        )
+
+    @property
+    def nnz(self) -> int:
+        return len(self.values)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.dates), len(self.tickers)
+
+    def rows(self) -> np.ndarray:
+        """date index per event"""
+        return np.repeat(np.arange(len(self.dates)), np.diff(self.indptr))
+
+    def row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.values[start:end]
+
+    def plan(self, i: int) -> Dict[str, int]:
+        """{ticker: signal} for dates[i], tickers without a signal are left out"""
+        indices, values = self.row(i)
+        return dict(zip(self.tickers[indices], values.tolist()))
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape, dtype=np.int8)
+        dense[self.rows(), self.indices] = self.values
+        return dense
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.to_dense(), index=self.dates, columns=self.tickers)
@@ -0,0 +1,159 @@
+"""fused signal generation: every strategy reads its indicators from one shared workspace
+over the dates x tickers close matrix, instead of each strategy running talib column by
+column. results follow talib conventions (leading nans skipped per column, a nan
+afterwards poisons the rest of the column, sma seeded emas), see ta_kernels"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ta_kernels
+from strategies.events import SignalEvents
+
+# fused strategies read indicators up to 2 rows back (macd crossover), so a resumed
+# workspace recomputes the last STATE_LAG rows of the run it resumes
+STATE_LAG = 2
+
+
+@dataclass(frozen=True)
+class IndicatorState:
+    """trailing ta_kernels state of every resumable indicator of a workspace, taken
+    STATE_LAG rows before the end of its prices. a workspace over later prices that
+    still contain `date` (plus the strategies' lookback before it) continues the
+    indicators from there instead of recomputing the whole history"""
+
+    date: Any
+    tickers: Tuple[str, ...]
+    dtype: np.dtype
+    kernels: Dict[tuple, np.ndarray]  # memo key -> (tickers, 1 + k) float64
+
+
+class SignalWorkspace:
+    """memoized indicator intermediates for one price matrix (dates x tickers), computed
+    by the shared ta_kernels. dtype float32 keeps prices and every output in float32,
+    see Precision. given a state, resumable indicators continue from it at resume_row"""
+
+    def __init__(
+        self,
+        prices: np.ndarray,
+        dtype=np.float64,
+        state: Optional[IndicatorState] = None,
+        resume_row: int = 0,
+    ):
+        self.dtype = np.dtype(dtype)
+        self.prices = np.ascontiguousarray(prices, dtype=self.dtype)
+        if state is not None and state.dtype != self.dtype:
+            raise ValueError(f"Indicator state is {state.dtype}, prices {self.dtype}")
+        self.state = state
+        self.resume_row = resume_row if state is not None else 0
+        self.capture_row = len(self.prices) - STATE_LAG
+        self._cache = {}
+        self._captured = {}
+
+    def _memo(self, key, fn):
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    def _resumable(self, key: tuple, name: str, x: np.ndarray, *params: int):
+        def compute():
+            state = None
+            if self.state is not None:
+                if key not in self.state.kernels:
+                    raise ValueError(f"No indicator state to resume {key} from")
+                state = self.state.kernels[key]
+            outputs, self._captured[key] = ta_kernels.resume(
+                name,
+                x,
+                *params,
+                state=state,
+                resume_row=self.resume_row,
+                capture_row=self.capture_row,
+            )
+            return outputs
+
+        return self._memo(key, compute)
+
+    def get_state(self, dates, tickers) -> Optional[IndicatorState]:
+        """state of the indicators computed so far, None if the prices are too short"""
+        if self.capture_row < max(self.resume_row, 1):
+            return None
+        return IndicatorState(
+            date=dates[self.capture_row],
+            tickers=tuple(tickers),
+            dtype=self.dtype,
+            kernels=dict(self._captured),
+        )
+
+    def sma(self, period: int) -> np.ndarray:
+        return self._resumable(("sma", period), "sma", self.prices, period)
+
+    def stddev(self, period: int) -> np.ndarray:
+        """population std like talib STDDEV/BBANDS, 0 when the variance is ~0"""
+        return self._resumable(("std", period), "stddev", self.prices, period)
+
+    def momentum(self, period: int) -> np.ndarray:
+        """price change over the last period rows, nan during warm up"""
+
+        def compute():
+            momentum = np.full_like(self.prices, np.nan)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                momentum[period:] = self.prices[period:] / self.prices[:-period] - 1
+            return np.where(np.isfinite(momentum), momentum, np.nan)
+
+        return self._memo(("momentum", period), compute)
+
+    def returns_stddev(self, period: int) -> np.ndarray:
+        """population std of daily returns over the last period rows"""
+        return self._resumable(
+            ("returns_std", period), "stddev", self.momentum(1), period
+        )
+
+    def macd_hist(self, fast: int, slow: int, signal: int) -> np.ndarray:
+        key = ("macd_hist", fast, slow, signal)
+        return self._resumable(key, "macd", self.prices, fast, slow, signal)[2]
+
+    def rsi(self, period: int) -> np.ndarray:
+        return self._resumable(("rsi", period), "rsi", self.prices, period)
+
+
+def generate_signal_cube(
+    strategies: list, data: pd.DataFrame, run_start_index: int, dtype=np.float64
+) -> np.ndarray:
+    """strategies x dates x tickers int8 signals for rows run_start_index onwards,
+    strategies without a fused implementation fall back to generate_signals_batch"""
+    workspace = SignalWorkspace(data.to_numpy(dtype=dtype), dtype)
+    cube = np.zeros(
+        (len(strategies), len(data) - run_start_index, data.shape[1]), dtype=np.int8
+    )
+    for i, strategy in enumerate(strategies):
+        if hasattr(strategy, "generate_signals_fused"):
+            cube[i] = strategy.generate_signals_fused(workspace)[run_start_index:]
+        else:
+            cube[i] = strategy.generate_signals_batch(data, run_start_index).to_numpy()
+    return cube
+
+
+def generate_signal_events(
+    strategies: list,
+    data: pd.DataFrame,
+    run_start_index: int,
+    dtype=np.float64,
+    workspace: Optional[SignalWorkspace] = None,
+) -> List[SignalEvents]:
+    """same as generate_signal_cube but one sparse SignalEvents per strategy, only one
+    dense dates x tickers matrix is alive at a time. pass the workspace over data to
+    resume it from an IndicatorState or read its state afterwards"""
+    if workspace is None:
+        workspace = SignalWorkspace(data.to_numpy(dtype=dtype), dtype)
+    dates, tickers = data.index[run_start_index:], data.columns
+    events = []
+    for strategy in strategies:
+        if hasattr(strategy, "generate_signals_fused"):
+            signals = strategy.generate_signals_fused(workspace)[run_start_index:]
+        else:
+            signals = strategy.generate_signals_batch(data, run_start_index).to_numpy()
+        events.append(SignalEvents.from_dense(signals, dates, tickers))
+    return events
@@ -1,46 +1,46 @@
 """actually do the math here, strategy will make the trading decisions based on the math here"""
 
 import numpy as np
-import talib
+
+import ta_kernels
 
 
 class TechnicalIndicators:
+    """every method takes a single series or a dates x tickers matrix"""
+
     @staticmethod
     def macd(prices: np.ndarray, fast_period=12, slow_period=26, signal_period=9):
-        _, _, histogram = talib.MACD(
+        """previous and current histogram values, per column for a matrix
+        macd needs a good warm up period for stabilization, 0 until both are valid"""
+        _, _, histogram = ta_kernels.macd(
             prices,
-            fastperiod=fast_period,
-            slowperiod=slow_period,
-            signalperiod=signal_period,
+            fast_period=fast_period,
+            slow_period=slow_period,
+            signal_period=signal_period,
         )
-        """macd needs a good warm up period for stabilization"""
-        # Handle insufficient data cases
-        if len(histogram) < 2 or np.isnan(histogram[-1]) or np.isnan(histogram[-2]):
-            return 0.0, 0.0
+        if len(histogram) < 2:
+            zeros = np.zeros(histogram.shape[1:])
+            return (0.0, 0.0) if histogram.ndim == 1 else (zeros, zeros)
 
-        return histogram[-2], histogram[-1]
+        prev, current = histogram[-2], histogram[-1]
+        missing = np.isnan(prev) | np.isnan(current)
+        if histogram.ndim == 1:
+            return (0.0, 0.0) if missing else (prev, current)
+        return np.where(missing, 0.0, prev), np.where(missing, 0.0, current)
 
     @staticmethod
     def rsi(prices: np.ndarray, period=14):
         """talib rsi use simple moving average for initial period then exponential smoothing
         the amount of data passed in in day one matters"""
-        return talib.RSI(prices, timeperiod=period)
+        return ta_kernels.rsi(prices, period)
 
     @staticmethod
     def bollinger_bands(prices: np.ndarray, period=20, std_dev=2):
-        upper_band, middle_band, lower_band = talib.BBANDS(
-            prices,
-            timeperiod=period,
-            nbdevup=std_dev,
-            nbdevdn=std_dev,
-            matype=0,  # Simple Moving Average
-        )
+        upper_band, middle_band, lower_band = ta_kernels.bbands(
+            prices, period, std_dev
+        )  # Simple Moving Average
         return upper_band, middle_band, lower_band
 
     @staticmethod
     def zscore(prices: np.ndarray, period=20):
-        rolling_mean = talib.SMA(prices, timeperiod=period)
-        rolling_std = talib.STDDEV(prices, timeperiod=period)
-        z_score = (prices - rolling_mean) / rolling_std
-        return z_score
-        return z_score
+        return ta_kernels.zscore(prices, period)
@@ -6,6 +6,8 @@ from typing import Any
 import numpy as np
 import pandas as pd
 
+from strategies.events import SignalEvents
+from strategies.fused import SignalWorkspace
 from strategies.indicators import TechnicalIndicators
 
 warnings.filterwarnings("ignore")
@@ -16,6 +18,9 @@ class StrategyTypes(Enum):
     RSI_CROSSOVER = "rsi_x"
     BOLLINGER_BANDS = "b_bands"
     Z_SCORE_MEAN_REVERSION = "z"
+    MOMENTUM_RANK = "mom_rank"
+    Z_SCORE_RANK = "z_rank"
+    VOLATILITY_SCALED_RANK = "vol_rank"
 
 
 class Strategy:
@@ -39,6 +44,12 @@ class Strategy:
             return BollingerBands(is_positive=is_positive)
         elif strategy_name == StrategyTypes.Z_SCORE_MEAN_REVERSION:
             return ZScoreMeanReversion(is_positive=is_positive)
+        elif strategy_name == StrategyTypes.MOMENTUM_RANK:
+            return MomentumRank(is_positive=is_positive)
+        elif strategy_name == StrategyTypes.Z_SCORE_RANK:
+            return ZScoreRank(is_positive=is_positive)
+        elif strategy_name == StrategyTypes.VOLATILITY_SCALED_RANK:
+            return VolatilityScaledRank(is_positive=is_positive)
         else:
             raise ValueError(f"Invalid strategy name: {strategy_name}")
 
@@ -86,6 +97,30 @@ class MACD(Strategy):
             signals, index=data.index[run_start_index:], columns=data.columns
         )
 
+    def generate_signals_fused(self, workspace: SignalWorkspace) -> np.ndarray:
+        """same as generate_signals_batch on the full history: row i only looks at
+        histogram values up to i-1"""
+        hist = workspace.macd_hist(
+            self.fast_period, self.slow_period, self.signal_period
+        )
+        prev = np.full_like(hist, np.nan)
+        current = np.full_like(hist, np.nan)
+        prev[2:] = hist[:-2]
+        current[1:] = hist[:-1]
+        # warm up rows count as 0, 0 like in TechnicalIndicators.macd
+        missing = np.isnan(prev) | np.isnan(current)
+        prev = np.where(missing, 0.0, prev)
+        current = np.where(missing, 0.0, current)
+        filter_signal = -1 if self.is_positive else 1
+        return (
+            np.where(
+                (prev <= 0) & (current > 0),
+                1,
+                np.where((prev >= 0) & (current < 0), -1, 0),
+            )
+            * filter_signal
+        ).astype(np.int8)
+
     def generate_signals_single_date(self, data: pd.DataFrame) -> dict[str, int]:
         """data only up to run date"""
         """most feasible for live trading, assumes the data passed is in right dates range"""
@@ -122,17 +157,22 @@ class RSI(Strategy):
     def generate_signals_batch(
         self, data: pd.DataFrame, start_index: int
     ) -> pd.DataFrame:
-        results = np.apply_along_axis(self.get_signals, arr=data.to_numpy(), axis=0)[
-            start_index:
-        ]
+        results = self.get_signals(data.to_numpy())[start_index:]
         return pd.DataFrame(
             results, index=data.index[start_index:], columns=data.columns
         )
 
+    def generate_signals_fused(self, workspace: SignalWorkspace) -> np.ndarray:
+        rsi = workspace.rsi(self.period)
+        filter_signal = -1 if self.is_positive else 1
+        return (
+            np.where(rsi < 30, 1, np.where(rsi > 70, -1, 0)) * filter_signal
+        ).astype(np.int8)
+
     def generate_signals_single_date(self, data: pd.DataFrame) -> dict[str, int]:
         if len(data) < self.period:
             return {ticker: 0 for ticker in data.columns}
-        results = np.apply_along_axis(self.get_signals, arr=data.to_numpy(), axis=0)[-1]
+        results = self.get_signals(data.to_numpy())[-1]
         return dict(zip(data.columns, results))
 
 
@@ -162,17 +202,26 @@ class BollingerBands(Strategy):
     def generate_signals_batch(
         self, data: pd.DataFrame, start_index: int
     ) -> pd.DataFrame:
-        results = np.apply_along_axis(self.get_signals, arr=data.to_numpy(), axis=0)[
-            start_index:
-        ]
+        results = self.get_signals(data.to_numpy())[start_index:]
         return pd.DataFrame(
             results, index=data.index[start_index:], columns=data.columns
         )
 
+    def generate_signals_fused(self, workspace: SignalWorkspace) -> np.ndarray:
+        """sma/stddev are shared with the z-score strategy for the same period"""
+        middle = workspace.sma(self.period)
+        band = self.std_dev * workspace.stddev(self.period)
+        prices = workspace.prices
+        filter_signal = -1 if self.is_positive else 1
+        return (
+            np.where(prices > middle + band, 1, np.where(prices < middle - band, -1, 0))
+            * filter_signal
+        ).astype(np.int8)
+
     def generate_signals_single_date(self, data: pd.DataFrame) -> dict[str, int]:
         if len(data) < self.period:
             return {ticker: 0 for ticker in data.columns}
-        results = np.apply_along_axis(self.get_signals, arr=data.to_numpy(), axis=0)[-1]
+        results = self.get_signals(data.to_numpy())[-1]
         return dict(zip(data.columns, results))
 
 
@@ -205,21 +254,149 @@ class ZScoreMeanReversion(Strategy):
     def generate_signals_batch(
         self, data: pd.DataFrame, start_index: int
     ) -> pd.DataFrame:
-        results = np.apply_along_axis(self.get_signals, arr=data.to_numpy(), axis=0)[
-            start_index:
-        ]
+        results = self.get_signals(data.to_numpy())[start_index:]
         return pd.DataFrame(
             results, index=data.index[start_index:], columns=data.columns
         )
 
+    def generate_signals_fused(self, workspace: SignalWorkspace) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_scores = (
+                workspace.prices - workspace.sma(self.lookback_period)
+            ) / workspace.stddev(self.lookback_period)
+        filter_signal = -1 if self.is_positive else 1
+        return (
+            np.where(
+                z_scores > self.entry_threshold,
+                -1,
+                np.where(z_scores < -self.entry_threshold, 1, 0),
+            )
+            * filter_signal
+        ).astype(np.int8)
+
     def generate_signals_single_date(self, data: pd.DataFrame) -> dict[str, int]:
         """most feasible for live trading, assumes the data passed is in right dates range"""
         if len(data) < self.lookback_period:
             return {ticker: 0 for ticker in data.columns}
-        results = np.apply_along_axis(self.get_signals, arr=data.to_numpy(), axis=0)[-1]
+        results = self.get_signals(data.to_numpy())[-1]
         return dict(zip(data.columns, results))
 
 
+def _top_k_mask(scores: np.ndarray, k: int, largest: bool = True) -> np.ndarray:
+    """dates x tickers bool mask of the k largest (or smallest) finite scores per date,
+    one argpartition over the whole matrix instead of sorting each date"""
+    n_tickers = scores.shape[1]
+    k = min(k, n_tickers)
+    mask = np.zeros(scores.shape, dtype=bool)
+    if k <= 0:
+        return mask
+    valid = np.isfinite(scores)
+    # invalid scores are pushed to the wrong end so they never get picked before a real one
+    keyed = np.where(valid, -scores if largest else scores, np.inf)
+    picked = np.argpartition(keyed, k - 1, axis=1)[:, :k]
+    np.put_along_axis(mask, picked, True, axis=1)
+    return mask & valid  # dates with fewer than k valid scores
+
+
+class CrossSectionalStrategy(Strategy):
+    """ranks the whole universe per date, buys the top_k scores and sells the bottom_k
+    scores are computed on the previous close so today's price is not used (like MACD)
+    """
+
+    def __init__(
+        self,
+        name: StrategyTypes,
+        lookback_period=20,
+        top_k=10,
+        bottom_k=10,
+        is_positive: bool = False,
+    ):
+        super().__init__(name, is_positive)
+        self.lookback_period = lookback_period
+        self.top_k = top_k
+        self.bottom_k = bottom_k
+        self.min_window = (lookback_period // 10 + 1) * 10
+
+    def get_scores(self, workspace: SignalWorkspace) -> np.ndarray:
+        """dates x tickers, higher is better, nan when the ticker can't be ranked"""
+        raise NotImplementedError
+
+    def generate_signals_fused(self, workspace: SignalWorkspace) -> np.ndarray:
+        scores = np.full_like(workspace.prices, np.nan)
+        scores[1:] = self.get_scores(workspace)[:-1]  # exclude current day price
+        top = _top_k_mask(scores, self.top_k, largest=True)
+        bottom = _top_k_mask(scores, self.bottom_k, largest=False)
+        filter_signal = -1 if self.is_positive else 1
+        # a ticker in both (tiny universe) cancels out to hold
+        return ((top.astype(np.int8) - bottom.astype(np.int8)) * filter_signal).astype(
+            np.int8
+        )
+
+    def generate_signals_batch(
+        self, data: pd.DataFrame, start_index: int
+    ) -> pd.DataFrame:
+        workspace = SignalWorkspace(data.to_numpy(dtype=np.float64))
+        results = self.generate_signals_fused(workspace)[start_index:]
+        return pd.DataFrame(
+            results, index=data.index[start_index:], columns=data.columns
+        )
+
+    def generate_signals_single_date(self, data: pd.DataFrame) -> dict[str, int]:
+        """data only up to run date"""
+        if len(data) <= self.lookback_period:
+            return {ticker: 0 for ticker in data.columns}
+        results = self.generate_signals_batch(data, len(data) - 1).iloc[-1]
+        return results.to_dict()
+
+
+class MomentumRank(CrossSectionalStrategy):
+    """cross sectional momentum - rank on lookback return"""
+
+    def __init__(self, lookback_period=20, top_k=10, bottom_k=10, is_positive=False):
+        super().__init__(
+            StrategyTypes.MOMENTUM_RANK, lookback_period, top_k, bottom_k, is_positive
+        )
+
+    def get_scores(self, workspace: SignalWorkspace) -> np.ndarray:
+        return workspace.momentum(self.lookback_period)
+
+
+class ZScoreRank(CrossSectionalStrategy):
+    """cross sectional mean reversion - most stretched below the mean ranks highest"""
+
+    def __init__(self, lookback_period=20, top_k=10, bottom_k=10, is_positive=False):
+        super().__init__(
+            StrategyTypes.Z_SCORE_RANK, lookback_period, top_k, bottom_k, is_positive
+        )
+
+    def get_scores(self, workspace: SignalWorkspace) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_scores = (
+                workspace.prices - workspace.sma(self.lookback_period)
+            ) / workspace.stddev(self.lookback_period)
+        return -z_scores
+
+
+class VolatilityScaledRank(CrossSectionalStrategy):
+    """cross sectional momentum - lookback return per unit of daily return volatility"""
+
+    def __init__(self, lookback_period=20, top_k=10, bottom_k=10, is_positive=False):
+        super().__init__(
+            StrategyTypes.VOLATILITY_SCALED_RANK,
+            lookback_period,
+            top_k,
+            bottom_k,
+            is_positive,
+        )
+
+    def get_scores(self, workspace: SignalWorkspace) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return workspace.momentum(self.lookback_period) / (
+                workspace.returns_stddev(self.lookback_period)
+                * np.sqrt(self.lookback_period)
+            )
+
+
 def vote_batch(
     strategies: Any, contains_filters: bool = False, tie_breaker: int = 0
 ) -> Any:
@@ -288,3 +465,60 @@ def sum_voting_single_date(strategies: list[int]) -> list[int]:
 
 def sum_voting_batch(strategies: list[pd.DataFrame]) -> pd.DataFrame:
     return np.sign(sum(strategies))
+
+
+def vote_cube(
+    signal_cube: np.ndarray, contains_filters: bool = False, tie_breaker: int = 0
+) -> np.ndarray:
+    """signal_cube: strategies x dates x tickers, returns dates x tickers int8"""
+    if contains_filters:
+        return np.sign(signal_cube.sum(axis=0, dtype=np.int16)).astype(np.int8)
+
+    # plurality: count each vote per cell, a shared max count is a tie
+    votes = np.array([-1, 0, 1], dtype=np.int8)
+    counts = np.stack([(signal_cube == v).sum(axis=0) for v in votes])
+    max_counts = counts.max(axis=0)
+    is_tie = (counts == max_counts).sum(axis=0) > 1
+    return np.where(is_tie, tie_breaker, votes[counts.argmax(axis=0)]).astype(np.int8)
+
+
+def vote_events(
+    events: list[SignalEvents], contains_filters: bool = False, tie_breaker: int = 0
+) -> SignalEvents:
+    """vote_cube on the sparse form, work is proportional to the number of events
+    a cell nobody signalled is a unanimous 0 and never shows up"""
+    n_dates, n_tickers = events[0].shape
+    for i, e in enumerate(events[1:], 1):
+        if not e.dates.equals(events[0].dates):
+            raise ValueError(
+                f"SignalEvents {i} has different dates than SignalEvents 0"
+            )
+        if not e.tickers.equals(events[0].tickers):
+            raise ValueError(
+                f"SignalEvents {i} has different tickers than SignalEvents 0"
+            )
+
+    keys = np.concatenate([e.rows() * n_tickers + e.indices for e in events])
+    values = np.concatenate([e.values for e in events])
+    cells, inverse = np.unique(keys, return_inverse=True)  # sorted row major
+    if contains_filters:
+        result = np.sign(np.bincount(inverse, weights=values, minlength=len(cells)))
+    else:
+        buys = np.bincount(inverse, weights=values == 1, minlength=len(cells))
+        sells = np.bincount(inverse, weights=values == -1, minlength=len(cells))
+        holds = len(events) - buys - sells
+        counts = np.stack([sells, holds, buys])
+        votes = np.array([-1, 0, 1])
+        max_counts = counts.max(axis=0)
+        is_tie = (counts == max_counts).sum(axis=0) > 1
+        result = np.where(is_tie, tie_breaker, votes[counts.argmax(axis=0)])
+
+    keep = result != 0
+    cells = cells[keep]
+    return SignalEvents.from_coo(
+        cells // n_tickers,
+        cells % n_tickers,
+        result[keep],
+        events[0].dates,
+        events[0].tickers,
+    )
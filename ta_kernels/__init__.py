@@ -0,0 +1,153 @@
+"""technical indicators for T x N matrices (dates x tickers / coins), shared by the
+backtester (e/) and the ds pipeline (ds/). every function also takes a 1-D series and
+hands back the same shape and float dtype it was given"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ta_kernels.kernels import (
+    atr_kernel,
+    ema_kernel,
+    macd_kernel,
+    mfi_kernel,
+    rolling_max_kernel,
+    rolling_min_kernel,
+    rsi_kernel,
+    sma_kernel,
+    stddev_kernel,
+    stoch_kernel,
+)
+
+
+def _as_2d(x: np.ndarray) -> np.ndarray:
+    """float32 input stays float32 (and so do the outputs), anything else is float64"""
+    dtype = np.float32 if np.asarray(x).dtype == np.float32 else np.float64
+    x = np.ascontiguousarray(x, dtype=dtype)
+    return x.reshape(-1, 1) if x.ndim == 1 else x
+
+
+def _like(x: np.ndarray, out: np.ndarray) -> np.ndarray:
+    return out.ravel() if np.ndim(x) == 1 else out
+
+
+_NO_STATE = np.empty((0, 0))
+
+# resumable kernels and how many parameters they take, see ta_kernels.kernels
+RESUMABLE = {
+    "sma": (sma_kernel, 1),
+    "stddev": (stddev_kernel, 1),
+    "rsi": (rsi_kernel, 1),
+    "macd": (macd_kernel, 3),
+}
+
+
+def resume(
+    name: str,
+    prices: np.ndarray,
+    *params: int,
+    state: Optional[np.ndarray] = None,
+    resume_row: int = 0,
+    capture_row: int = -1,
+):
+    """indicator `name` on a T x N matrix that can be picked up where a previous call
+    left off: returns the usual outputs plus the kernel state after row capture_row - 1
+    passing that state back with resume_row at the same date on a later (shorter) price
+    history continues every started column from there, see ta_kernels.kernels"""
+    if name not in RESUMABLE or len(params) != RESUMABLE[name][1]:
+        raise ValueError(f"Invalid resumable indicator: {name}{params}")
+    x = _as_2d(prices)
+    if state is None:
+        state, resume_row = _NO_STATE, 0
+    elif state.shape[0] != x.shape[1]:
+        raise ValueError(f"State has {state.shape[0]} columns, prices {x.shape[1]}")
+    *outputs, captured = RESUMABLE[name][0](x, *params, state, resume_row, capture_row)
+    return (outputs[0] if len(outputs) == 1 else tuple(outputs)), captured
+
+
+def sma(prices: np.ndarray, period: int = 30) -> np.ndarray:
+    return _like(prices, sma_kernel(_as_2d(prices), period, _NO_STATE, 0, -1)[0])
+
+
+def ema(prices: np.ndarray, period: int = 30) -> np.ndarray:
+    return _like(prices, ema_kernel(_as_2d(prices), period))
+
+
+def stddev(prices: np.ndarray, period: int = 5) -> np.ndarray:
+    return _like(prices, stddev_kernel(_as_2d(prices), period, _NO_STATE, 0, -1)[0])
+
+
+def rsi(prices: np.ndarray, period: int = 14) -> np.ndarray:
+    return _like(prices, rsi_kernel(_as_2d(prices), period, _NO_STATE, 0, -1)[0])
+
+
+def macd(
+    prices: np.ndarray, fast_period=12, slow_period=26, signal_period=9
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """returns macd line, signal line, histogram"""
+    line, signal, hist, _ = macd_kernel(
+        _as_2d(prices), fast_period, slow_period, signal_period, _NO_STATE, 0, -1
+    )
+    return _like(prices, line), _like(prices, signal), _like(prices, hist)
+
+
+def bbands(
+    prices: np.ndarray, period: int = 20, std_dev: float = 2
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """returns upper, middle, lower with an sma middle band"""
+    x = _as_2d(prices)
+    middle = sma_kernel(x, period, _NO_STATE, 0, -1)[0]
+    band = std_dev * stddev_kernel(x, period, _NO_STATE, 0, -1)[0]
+    return (
+        _like(prices, middle + band),
+        _like(prices, middle),
+        _like(prices, middle - band),
+    )
+
+
+def zscore(prices: np.ndarray, period: int = 20) -> np.ndarray:
+    x = _as_2d(prices)
+    mean = sma_kernel(x, period, _NO_STATE, 0, -1)[0]
+    std = stddev_kernel(x, period, _NO_STATE, 0, -1)[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_score = (x - mean) / std
+    return _like(prices, z_score)
+
+
+def stoch(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    k_period: int = 5,
+    d_period: int = 3,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """returns slow %K, slow %D (sma smoothed, slowk_period == slowd_period)"""
+    k, d = stoch_kernel(_as_2d(high), _as_2d(low), _as_2d(close), k_period, d_period)
+    return _like(high, k), _like(high, d)
+
+
+def mfi(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    period: int = 14,
+) -> np.ndarray:
+    out = mfi_kernel(_as_2d(high), _as_2d(low), _as_2d(close), _as_2d(volume), period)
+    return _like(high, out)
+
+
+def atr(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14
+) -> np.ndarray:
+    return _like(high, atr_kernel(_as_2d(high), _as_2d(low), _as_2d(close), period))
+
+
+def donchian(
+    high: np.ndarray, low: np.ndarray, period: int = 20
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """returns upper (highest high), middle, lower (lowest low)"""
+    upper = rolling_max_kernel(_as_2d(high), period)
+    lower = rolling_min_kernel(_as_2d(low), period)
+    middle = (upper + lower) / 2.0
+    return _like(high, upper), _like(high, middle), _like(high, lower)
@@ -0,0 +1,375 @@
+"""numba kernels, one column per prange iteration over a T x N float matrix
+conventions follow talib: leading nans are skipped per column, outputs are nan during
+the lookback, emas are seeded with the sma of their first window
+a nan after the first valid row is not skipped, it propagates through the running sums
+outputs have the dtype of the input (float32 or float64), running sums and emas are
+float64 scalars either way
+
+sma, stddev, macd and rsi are resumable: they also take a (N, 1 + k) float64 state, the
+row to resume it at and the row to capture it at, and return the state after row
+capture_row - 1 next to their outputs. column 0 flags columns whose indicator had
+started, k holds the running sums / emas. a flagged column continues from resume_row
+(rows before it may stay nan, x only has to reach back period rows), unflagged ones
+are computed from scratch on x. resume_row 0 and an empty state run from scratch
+"""
+
+import numpy as np
+from numba import njit, prange
+
+TA_EPSILON = 1e-8  # talib's TA_IS_ZERO / TA_IS_ZERO_OR_NEG threshold
+
+
+@njit(cache=True)
+def _first_valid(x: np.ndarray, j: int) -> int:
+    for i in range(x.shape[0]):
+        if not np.isnan(x[i, j]):
+            return i
+    return x.shape[0]
+
+
+@njit(cache=True)
+def _first_valid_all(high, low, close, volume, j: int) -> int:
+    """first row where every input is valid, volume may be an empty placeholder"""
+    for i in range(high.shape[0]):
+        if np.isnan(high[i, j]) or np.isnan(low[i, j]) or np.isnan(close[i, j]):
+            continue
+        if volume.shape[0] > 0 and np.isnan(volume[i, j]):
+            continue
+        return i
+    return high.shape[0]
+
+
+@njit(cache=True)
+def _resumed(state: np.ndarray, j: int, resume_row: int) -> bool:
+    """column j continues from state instead of starting over, see resumable kernels"""
+    return resume_row > 0 and state[j, 0] == 1.0
+
+
+@njit(parallel=True, cache=True)
+def sma_kernel(
+    x: np.ndarray, period: int, state: np.ndarray, resume_row: int, capture_row: int
+):
+    """state: running total of the last period - 1 values"""
+    T, N = x.shape
+    out = np.full_like(x, np.nan)
+    captured = np.zeros((N, 2))
+    for j in prange(N):
+        if _resumed(state, j, resume_row):
+            start = resume_row
+            total = state[j, 1]
+            if capture_row == resume_row:
+                captured[j] = state[j]
+        else:
+            start = _first_valid(x, j) + period - 1
+            if start >= T:
+                continue
+            total = 0.0
+            for i in range(start - period + 1, start):
+                total += x[i, j]
+        for i in range(start, T):
+            total += x[i, j]
+            out[i, j] = total / period
+            total -= x[i - period + 1, j]
+            if i == capture_row - 1:
+                captured[j, 0] = 1.0
+                captured[j, 1] = total
+    return out, captured
+
+
+@njit(parallel=True, cache=True)
+def stddev_kernel(
+    x: np.ndarray, period: int, state: np.ndarray, resume_row: int, capture_row: int
+):
+    """population std like talib STDDEV/BBANDS, 0 when the variance is ~0
+    state: running total and total of squares of the last period - 1 values"""
+    T, N = x.shape
+    out = np.full_like(x, np.nan)
+    captured = np.zeros((N, 3))
+    for j in prange(N):
+        if _resumed(state, j, resume_row):
+            start = resume_row
+            total = state[j, 1]
+            total_sq = state[j, 2]
+            if capture_row == resume_row:
+                captured[j] = state[j]
+        else:
+            start = _first_valid(x, j) + period - 1
+            if start >= T:
+                continue
+            total = 0.0
+            total_sq = 0.0
+            for i in range(start - period + 1, start):
+                total += x[i, j]
+                total_sq += x[i, j] * x[i, j]
+        for i in range(start, T):
+            total += x[i, j]
+            total_sq += x[i, j] * x[i, j]
+            mean = total / period
+            var = total_sq / period - mean * mean
+            out[i, j] = np.sqrt(var) if var >= TA_EPSILON else 0.0
+            out_idx = i - period + 1
+            total -= x[out_idx, j]
+            total_sq -= x[out_idx, j] * x[out_idx, j]
+            if i == capture_row - 1:
+                captured[j, 0] = 1.0
+                captured[j, 1] = total
+                captured[j, 2] = total_sq
+    return out, captured
+
+
+@njit(parallel=True, cache=True)
+def ema_kernel(x: np.ndarray, period: int) -> np.ndarray:
+    T, N = x.shape
+    out = np.full_like(x, np.nan)
+    k = 2.0 / (period + 1)
+    for j in prange(N):
+        start = _first_valid(x, j) + period - 1
+        if start >= T:
+            continue
+        ema = 0.0
+        for i in range(start - period + 1, start + 1):
+            ema += x[i, j]
+        ema /= period
+        out[start, j] = ema
+        for i in range(start + 1, T):
+            ema = (x[i, j] - ema) * k + ema
+            out[i, j] = ema
+    return out
+
+
+@njit(parallel=True, cache=True)
+def macd_kernel(
+    x: np.ndarray,
+    fast: int,
+    slow: int,
+    signal: int,
+    state: np.ndarray,
+    resume_row: int,
+    capture_row: int,
+):
+    """talib MACD: both emas start at the slow seed row, the fast one seeded with the sma
+    of its own window, the signal line seeded with the sma of the macd line
+    state: fast, slow and signal emas"""
+    if fast > slow:
+        fast, slow = slow, fast
+    T, N = x.shape
+    line = np.full_like(x, np.nan)
+    signal_line = np.full_like(x, np.nan)
+    hist = np.full_like(x, np.nan)
+    captured = np.zeros((N, 4))
+    k_fast = 2.0 / (fast + 1)
+    k_slow = 2.0 / (slow + 1)
+    k_signal = 2.0 / (signal + 1)
+    for j in prange(N):
+        if _resumed(state, j, resume_row):
+            signal_start = resume_row - 1
+            ema_fast = state[j, 1]
+            ema_slow = state[j, 2]
+            ema_signal = state[j, 3]
+        else:
+            seed = _first_valid(x, j) + slow - 1
+            signal_start = seed + signal - 1
+            if signal_start >= T:
+                continue
+            ema_fast = 0.0
+            for i in range(seed - fast + 1, seed + 1):
+                ema_fast += x[i, j]
+            ema_fast /= fast
+            ema_slow = 0.0
+            for i in range(seed - slow + 1, seed + 1):
+                ema_slow += x[i, j]
+            ema_slow /= slow
+
+            ema_signal = ema_fast - ema_slow
+            for i in range(seed + 1, signal_start + 1):
+                ema_fast = (x[i, j] - ema_fast) * k_fast + ema_fast
+                ema_slow = (x[i, j] - ema_slow) * k_slow + ema_slow
+                ema_signal += ema_fast - ema_slow
+            ema_signal /= signal
+        for i in range(signal_start, T):
+            if i > signal_start:
+                ema_fast = (x[i, j] - ema_fast) * k_fast + ema_fast
+                ema_slow = (x[i, j] - ema_slow) * k_slow + ema_slow
+                ema_signal = (ema_fast - ema_slow - ema_signal) * k_signal + ema_signal
+            line[i, j] = ema_fast - ema_slow
+            signal_line[i, j] = ema_signal
+            hist[i, j] = ema_fast - ema_slow - ema_signal
+            if i == capture_row - 1:
+                captured[j, 0] = 1.0
+                captured[j, 1] = ema_fast
+                captured[j, 2] = ema_slow
+                captured[j, 3] = ema_signal
+    return line, signal_line, hist, captured
+
+
+@njit(parallel=True, cache=True)
+def rsi_kernel(
+    x: np.ndarray, period: int, state: np.ndarray, resume_row: int, capture_row: int
+):
+    """talib RSI: simple average of the first period gains/losses, then wilder smoothing
+    state: average gain and average loss"""
+    T, N = x.shape
+    out = np.full_like(x, np.nan)
+    captured = np.zeros((N, 3))
+    for j in prange(N):
+        if _resumed(state, j, resume_row):
+            start = resume_row - 1
+            avg_gain = state[j, 1]
+            avg_loss = state[j, 2]
+        else:
+            begin = _first_valid(x, j)
+            start = begin + period
+            if start >= T:
+                continue
+            avg_gain = 0.0
+            avg_loss = 0.0
+            for i in range(begin + 1, start + 1):
+                delta = x[i, j] - x[i - 1, j]
+                if delta < 0:
+                    avg_loss -= delta
+                else:
+                    avg_gain += delta
+            avg_gain /= period
+            avg_loss /= period
+        for i in range(start, T):
+            if i > start:
+                delta = x[i, j] - x[i - 1, j]
+                gain = 0.0 if delta < 0 else delta
+                loss = -delta if delta < 0 else 0.0
+                avg_gain = (avg_gain * (period - 1) + gain) / period
+                avg_loss = (avg_loss * (period - 1) + loss) / period
+            total = avg_gain + avg_loss
+            out[i, j] = 0.0 if abs(total) < TA_EPSILON else 100.0 * avg_gain / total
+            if i == capture_row - 1:
+                captured[j, 0] = 1.0
+                captured[j, 1] = avg_gain
+                captured[j, 2] = avg_loss
+    return out, captured
+
+
+@njit(parallel=True, cache=True)
+def rolling_max_kernel(x: np.ndarray, period: int) -> np.ndarray:
+    T, N = x.shape
+    out = np.full_like(x, np.nan)
+    for j in prange(N):
+        start = _first_valid(x, j) + period - 1
+        for i in range(start, T):
+            out[i, j] = np.max(x[i - period + 1 : i + 1, j])
+    return out
+
+
+@njit(parallel=True, cache=True)
+def rolling_min_kernel(x: np.ndarray, period: int) -> np.ndarray:
+    T, N = x.shape
+    out = np.full_like(x, np.nan)
+    for j in prange(N):
+        start = _first_valid(x, j) + period - 1
+        for i in range(start, T):
+            out[i, j] = np.min(x[i - period + 1 : i + 1, j])
+    return out
+
+
+@njit(parallel=True, cache=True)
+def stoch_kernel(high, low, close, k_period: int, d_period: int):
+    """talib STOCH with sma smoothing, slowk_period == slowd_period == d_period"""
+    T, N = high.shape
+    slow_k = np.full_like(high, np.nan)
+    slow_d = np.full_like(high, np.nan)
+    empty = np.empty((0, N))
+    for j in prange(N):
+        begin = _first_valid_all(high, low, close, empty, j)
+        fast_start = begin + k_period - 1
+        start = fast_start + 2 * (d_period - 1)
+        if start >= T:
+            continue
+        fast_k = np.empty(T - fast_start)
+        for i in range(fast_start, T):
+            highest = np.max(high[i - k_period + 1 : i + 1, j])
+            lowest = np.min(low[i - k_period + 1 : i + 1, j])
+            diff = (highest - lowest) / 100.0
+            fast_k[i - fast_start] = (close[i, j] - lowest) / diff if diff != 0 else 0.0
+
+        # slow k is the sma of fast k, slow d the sma of slow k (rows offset by fast_start)
+        k_values = np.empty(T - fast_start)
+        total = 0.0
+        for i in range(len(fast_k)):
+            total += fast_k[i]
+            if i >= d_period:
+                total -= fast_k[i - d_period]
+            k_values[i] = total / d_period
+        total = 0.0
+        for i in range(d_period - 1, len(k_values)):
+            total += k_values[i]
+            if i >= 2 * d_period - 1:
+                total -= k_values[i - d_period]
+            if i >= 2 * (d_period - 1):
+                slow_k[i + fast_start, j] = k_values[i]
+                slow_d[i + fast_start, j] = total / d_period
+    return slow_k, slow_d
+
+
+@njit(parallel=True, cache=True)
+def mfi_kernel(high, low, close, volume, period: int) -> np.ndarray:
+    """talib MFI, 0 when the total money flow over the window is < 1"""
+    T, N = high.shape
+    out = np.full_like(high, np.nan)
+    for j in prange(N):
+        begin = _first_valid_all(high, low, close, volume, j)
+        start = begin + period
+        if start >= T:
+            continue
+        pos_flow = np.zeros(T)
+        neg_flow = np.zeros(T)
+        prev = (high[begin, j] + low[begin, j] + close[begin, j]) / 3.0
+        for i in range(begin + 1, T):
+            typical = (high[i, j] + low[i, j] + close[i, j]) / 3.0
+            change = typical - prev
+            prev = typical
+            if change < 0:
+                neg_flow[i] = typical * volume[i, j]
+            elif change > 0:
+                pos_flow[i] = typical * volume[i, j]
+        pos_sum = 0.0
+        neg_sum = 0.0
+        for i in range(begin + 1, start):
+            pos_sum += pos_flow[i]
+            neg_sum += neg_flow[i]
+        for i in range(start, T):
+            pos_sum += pos_flow[i]
+            neg_sum += neg_flow[i]
+            total = pos_sum + neg_sum
+            out[i, j] = 0.0 if total < 1.0 else 100.0 * (pos_sum / total)
+            pos_sum -= pos_flow[i - period + 1]
+            neg_sum -= neg_flow[i - period + 1]
+    return out
+
+
+@njit(parallel=True, cache=True)
+def atr_kernel(high, low, close, period: int) -> np.ndarray:
+    """talib ATR: true range from the second valid row, sma seed then wilder smoothing"""
+    T, N = high.shape
+    out = np.full_like(high, np.nan)
+    empty = np.empty((0, N))
+    for j in prange(N):
+        begin = _first_valid_all(high, low, close, empty, j)
+        start = begin + period
+        if start >= T:
+            continue
+        atr = 0.0
+        for i in range(begin + 1, T):
+            true_range = max(
+                high[i, j] - low[i, j],
+                abs(high[i, j] - close[i - 1, j]),
+                abs(low[i, j] - close[i - 1, j]),
+            )
+            if period == 1:
+                out[i, j] = true_range
+            elif i < start:
+                atr += true_range
+            elif i == start:
+                atr = (atr + true_range) / period
+                out[i, j] = atr
+            else:
+                atr = (atr * (period - 1) + true_range) / period
+                out[i, j] = atr
+    return out
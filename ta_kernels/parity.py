@@ -0,0 +1,135 @@
+"""compare every kernel against talib column by column on random ohlcv data, and the
+resumable kernels against a single pass over the whole history
+python -m ta_kernels.parity (from the repo root), talib only needed here"""
+
+from typing import Dict
+
+import numpy as np
+import talib
+
+import ta_kernels as ta
+
+
+def _random_ohlcv(T: int, N: int, seed: int, leading_nans: int):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (T, N)), axis=0))
+    spread = np.abs(rng.normal(0, 0.01, (T, N))) * close
+    high = close + spread
+    low = close - spread
+    volume = rng.integers(0, 10_000, (T, N)).astype(np.float64)
+    # columns listed late, like tickers ipo-ing inside the window
+    for j in range(0, N, 3):
+        for x in (high, low, close, volume):
+            x[: leading_nans * (j % 5), j] = np.nan
+    return high, low, close, volume
+
+
+def _per_column(fn, *arrays):
+    outputs = [fn(*(a[:, j] for a in arrays)) for j in range(arrays[0].shape[1])]
+    if isinstance(outputs[0], tuple):
+        return tuple(np.column_stack(o) for o in zip(*outputs))
+    return np.column_stack(outputs)
+
+
+def _max_diff(ours, theirs) -> float:
+    if not isinstance(ours, tuple):
+        ours, theirs = (ours,), (theirs,)
+    worst = 0.0
+    for a, b in zip(ours, theirs):
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            return np.inf
+        both = ~np.isnan(a)
+        if both.any():
+            worst = max(worst, float(np.abs(a[both] - b[both]).max()))
+    return worst
+
+
+def check_parity(
+    T: int = 1000, N: int = 12, seed: int = 0, leading_nans: int = 40
+) -> Dict[str, float]:
+    """max abs difference vs talib per indicator, inf if the nan patterns differ"""
+    high, low, close, volume = _random_ohlcv(T, N, seed, leading_nans)
+    return {
+        "sma": _max_diff(
+            ta.sma(close, 20), _per_column(lambda c: talib.SMA(c, 20), close)
+        ),
+        "ema": _max_diff(
+            ta.ema(close, 20), _per_column(lambda c: talib.EMA(c, 20), close)
+        ),
+        "stddev": _max_diff(
+            ta.stddev(close, 20), _per_column(lambda c: talib.STDDEV(c, 20), close)
+        ),
+        "rsi": _max_diff(
+            ta.rsi(close, 14), _per_column(lambda c: talib.RSI(c, 14), close)
+        ),
+        "macd": _max_diff(
+            ta.macd(close, 12, 26, 9),
+            _per_column(lambda c: talib.MACD(c, 12, 26, 9), close),
+        ),
+        "bbands": _max_diff(
+            ta.bbands(close, 20, 2),
+            _per_column(lambda c: talib.BBANDS(c, 20, 2, 2, 0), close),
+        ),
+        "stoch": _max_diff(
+            ta.stoch(high, low, close, 14, 3),
+            _per_column(
+                lambda h, l, c: talib.STOCH(h, l, c, 14, 3, 0, 3, 0), high, low, close
+            ),
+        ),
+        "mfi": _max_diff(
+            ta.mfi(high, low, close, volume, 14),
+            _per_column(
+                lambda h, l, c, v: talib.MFI(h, l, c, v, 14),
+                *(high, low, close, volume),
+            ),
+        ),
+        "atr": _max_diff(
+            ta.atr(high, low, close, 14),
+            _per_column(lambda h, l, c: talib.ATR(h, l, c, 14), high, low, close),
+        ),
+        "donchian": _max_diff(
+            ta.donchian(high, low, 20)[::2],
+            (
+                _per_column(lambda h: talib.MAX(h, 20), high),
+                _per_column(lambda l: talib.MIN(l, 20), low),
+            ),
+        ),
+    }
+
+
+def check_resume(
+    T: int = 1000, N: int = 12, seed: int = 0, leading_nans: int = 40
+) -> Dict[str, bool]:
+    """whether resuming each kernel halfway, on history starting `lookback` rows before
+    the resume row, reproduces the single pass outputs and end state bit for bit"""
+    _, _, close, _ = _random_ohlcv(T, N, seed, leading_nans)
+    close[T // 3, 1] = np.nan  # poisoned column, the nan has to carry over
+    params = {"sma": (20,), "stddev": (20,), "rsi": (14,), "macd": (12, 26, 9)}
+    row, lookback = T // 2, 100
+    results = {}
+    for name, args in params.items():
+        full, end_state = ta.resume(name, close, *args, capture_row=T)
+        _, state = ta.resume(name, close[: row + 5], *args, capture_row=row)
+        resumed, resumed_state = ta.resume(
+            name,
+            close[row - lookback :],
+            *args,
+            state=state,
+            resume_row=lookback,
+            capture_row=T - row + lookback,
+        )
+        if not isinstance(full, tuple):
+            full, resumed = (full,), (resumed,)
+        results[name] = all(
+            np.array_equal(a[row:], b[lookback:], equal_nan=True)
+            for a, b in zip(full, resumed)
+        ) and np.array_equal(end_state, resumed_state, equal_nan=True)
+    return results
+
+
+if __name__ == "__main__":
+    for name, diff in check_parity().items():
+        status = "ok" if diff < 1e-6 else "MISMATCH"
+        print(f"{name:<10} {diff:.2e} {status}")
+    for name, same in check_resume().items():
+        print(f"{name:<10} resume {'ok' if same else 'MISMATCH'}")